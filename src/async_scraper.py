@@ -0,0 +1,499 @@
+"""映画.comから非同期に映画情報を取得するモジュール"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+
+from rate_limiter import get_host_rate_limiter, parse_retry_after
+from resilience import CircuitOpenError, RetryPolicy, call_with_retry_async, get_circuit_breaker
+from scraper import MovieScraper
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+T = TypeVar('T')
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """送信前にホストごとのレートリミッターを通すhttpx用トランスポート
+    
+    開始待ちはリクエストのプールタイムアウトまでとし、超えた場合は
+    httpx.PoolTimeout を送出してリトライに任せる。
+    """
+    
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter_options: Optional[Dict] = None):
+        """
+        初期化
+        
+        Args:
+            transport: 実際に送信を行うトランスポート
+            limiter_options: レートリミッター作成時のオプション
+        """
+        self._transport = transport
+        self.limiter_options = limiter_options or {}
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.netloc.decode('ascii')
+        limiter = get_host_rate_limiter(host, **self.limiter_options)
+        wait_timeout = request.extensions.get('timeout', {}).get('pool')
+        if not await limiter.acquire_async(wait_timeout):
+            raise httpx.PoolTimeout(
+                f"レートリミッターの開始待ちが{wait_timeout}秒を超えました: {request.url}",
+                request=request
+            )
+        
+        start = time.monotonic()
+        status_code = None
+        retry_after = None
+        try:
+            response = await self._transport.handle_async_request(request)
+            status_code = response.status_code
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            return response
+        finally:
+            limiter.release(time.monotonic() - start, status_code, retry_after)
+    
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_client(limiter_options: Optional[Dict] = None) -> httpx.AsyncClient:
+    """
+    映画.com用の非同期HTTPクライアントを作成
+    
+    Keep-Aliveの接続プールを持ち、h2がインストールされていればHTTP/2で接続する。
+    送信はホストごとのレートリミッターを通す。
+    接続数は環境変数 SCRAPER_MAX_CONNECTIONS で調整可能。
+    
+    Args:
+        limiter_options: レートリミッター作成時のオプション
+    
+    Returns:
+        httpx.AsyncClient: 非同期HTTPクライアント
+    """
+    max_connections = int(os.getenv('SCRAPER_MAX_CONNECTIONS', '20'))
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=60.0
+    )
+    transport = httpx.AsyncHTTPTransport(http2=HTTP2_AVAILABLE, limits=limits)
+    return httpx.AsyncClient(
+        transport=RateLimitedTransport(transport, limiter_options),
+        headers={'User-Agent': MovieScraper.USER_AGENT},
+        follow_redirects=True
+    )
+
+
+class AsyncMovieScraper:
+    """映画.comから非同期に映画情報を取得するクラス
+    
+    MovieScraper と同じ取得メソッドをコルーチンとして提供する。
+    パース・フィルタ処理とHTTPキャッシュ・パースキャッシュは MovieScraper と共有する。
+    """
+    
+    BASE_URL = MovieScraper.BASE_URL
+    DEFAULT_TIMEOUT = MovieScraper.DEFAULT_TIMEOUT
+    
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        timeout: Optional[float] = None,
+        parser: Optional[MovieScraper] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            client: 使用するHTTPクライアント（Noneの場合は新規作成）
+            timeout: リクエストのタイムアウト（秒）
+            parser: パース処理に使用するMovieScraper（Noneの場合は新規作成）
+            retry_policy: 一時的な失敗時のリトライ設定（Noneの場合はparserの設定を使用）
+        """
+        self.parser = parser or MovieScraper()
+        self.client = client or create_client(self.parser.rate_limiter_options)
+        self.timeout = timeout or float(os.getenv('SCRAPER_TIMEOUT', self.DEFAULT_TIMEOUT))
+        self.retry_policy = retry_policy or self.parser.retry_policy
+        self.stage_timings = self.parser.stage_timings
+    
+    async def _get_text(self, endpoint: str, url: str, params: Optional[Dict] = None) -> str:
+        """
+        リトライ・サーキットブレーカーを通してページ本文を取得
+        
+        取得できない場合やブレーカーが開いている場合は、
+        期限切れでも前回取得できたキャッシュの本文を返す。
+        
+        Args:
+            endpoint: エンドポイント名（サーキットブレーカーの単位）
+            url: リクエストURL
+            params: クエリパラメータ
+        
+        Returns:
+            str: レスポンス本文
+        
+        Raises:
+            httpx.HTTPError: 取得できず、キャッシュも無い場合
+            CircuitOpenError: ブレーカーが開いていて、キャッシュも無い場合
+        """
+        breaker = get_circuit_breaker(endpoint, **self.parser.circuit_breaker_options)
+        full_url = str(httpx.URL(url, params=params))
+        
+        try:
+            return await call_with_retry_async(
+                lambda: self._fetch_text(url, full_url, params),
+                breaker,
+                self.retry_policy,
+                self._classify_error
+            )
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            html = await asyncio.to_thread(self.parser._read_stale, full_url)
+            if html is None:
+                raise
+            print(f"⚠️  取得に失敗したため前回取得したページを使用します: {url} - {e}")
+            return html
+    
+    async def _fetch_text(self, url: str, full_url: str, params: Optional[Dict]) -> str:
+        """
+        ページ本文を1回取得（HTTPキャッシュ対応）
+        
+        HTTPキャッシュの読み書きはディスクI/Oのため、共有イベントループを
+        止めないようスレッドで実行する。
+        
+        Args:
+            url: リクエストURL
+            full_url: クエリ文字列を含むURL（キャッシュのキー）
+            params: クエリパラメータ
+        
+        Returns:
+            str: レスポンス本文
+        
+        Raises:
+            httpx.HTTPError: 取得に失敗した場合
+        """
+        cache = self.parser.http_cache
+        entry = await asyncio.to_thread(cache.lookup, full_url) if cache else None
+        
+        if entry and cache.is_fresh(entry):
+            body = await asyncio.to_thread(cache.read_body, entry)
+            if body is not None:
+                cache.record('hits')
+                return self.parser._decode_body(body, entry.get('encoding'))
+        
+        headers = cache.conditional_headers(entry) if entry else {}
+        
+        response = await self.client.get(url, params=params, headers=headers, timeout=self.timeout)
+        
+        if response.status_code == 304 and entry:
+            body = await asyncio.to_thread(cache.read_body, entry)
+            if body is not None:
+                cache.record('revalidations')
+                await asyncio.to_thread(cache.mark_revalidated, entry)
+                return self.parser._decode_body(body, entry.get('encoding'))
+        
+        response.raise_for_status()
+        
+        if cache:
+            cache.record('misses')
+            await asyncio.to_thread(
+                cache.store, full_url, response.headers, response.content, response.encoding
+            )
+        
+        return response.text
+    
+    @staticmethod
+    def _classify_error(error: Exception) -> Tuple[bool, Optional[float]]:
+        """
+        取得エラーがリトライ対象かを判定
+        
+        Args:
+            error: 発生した例外
+        
+        Returns:
+            tuple: (リトライ対象か, Retry-Afterの秒数)
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            status_code = error.response.status_code
+            retry_after = parse_retry_after(error.response.headers.get('Retry-After'))
+            return status_code in MovieScraper.RETRYABLE_STATUS_CODES, retry_after
+        return isinstance(error, httpx.TransportError), None
+    
+    async def _parse(self, kind: str, html: str, parse_func) -> List[Dict]:
+        """パース処理をワーカースレッドで実行し、イベントループを塞がないようにする"""
+        return await asyncio.to_thread(self.parser._parse_html, kind, html, parse_func)
+    
+    async def fetch_upcoming_movies(self) -> List[Dict]:
+        """
+        今週公開の映画情報を取得
+        
+        Returns:
+            List[Dict]: 映画情報のリスト
+        """
+        url = f"{self.BASE_URL}/upcoming/"
+        
+        try:
+            print(f"映画情報を取得中: {url}")
+            html = await self._get_text('upcoming', url)
+            movies = await self._parse('upcoming', html, self.parser._parse_upcoming_movies)
+            
+            print(f"✓ {len(movies)}件の映画情報を取得しました")
+            return movies
+        
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"エラー: 映画情報の取得に失敗しました - {e}")
+            return []
+    
+    async def fetch_movies_released_in_past_week(self) -> List[Dict]:
+        """
+        過去1週間以内に公開された映画情報を取得
+        
+        Returns:
+            List[Dict]: 映画情報のリスト
+        """
+        url = f"{self.BASE_URL}/now/"
+        
+        try:
+            print(f"公開中の映画情報を取得中: {url}")
+            html = await self._get_text('now_showing', url)
+            movies = await self._parse('now_showing', html, self.parser._parse_now_showing_movies)
+            recent_movies = self.parser._filter_released_in_past_week(movies)
+            
+            print(f"✓ {len(recent_movies)}件の過去1週間以内の映画情報を取得しました")
+            return recent_movies
+        
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"エラー: 公開中映画情報の取得に失敗しました - {e}")
+            return []
+    
+    async def fetch_movies_coming_in_next_week(self) -> List[Dict]:
+        """
+        先1週間以内に公開予定の映画情報を取得
+        
+        Returns:
+            List[Dict]: 映画情報のリスト（上映館数情報も含む）
+        """
+        url = f"{self.BASE_URL}/upcoming/"
+        
+        try:
+            print(f"公開予定の映画情報を取得中: {url}")
+            html = await self._get_text('upcoming', url)
+            movies = await self._parse('upcoming', html, self.parser._parse_upcoming_movies)
+            upcoming_movies = self.parser._filter_coming_in_next_week(movies)
+            
+            await self._enrich_theater_counts(upcoming_movies)
+            
+            print(f"✓ {len(upcoming_movies)}件の先1週間以内の映画情報を取得しました")
+            return upcoming_movies
+        
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"エラー: 公開予定映画情報の取得に失敗しました - {e}")
+            return []
+    
+    async def search_movie_by_keyword(self, keyword: str) -> List[Dict]:
+        """
+        キーワードで映画を検索
+        
+        Args:
+            keyword: 検索キーワード
+        
+        Returns:
+            List[Dict]: マッチした映画情報のリスト
+        """
+        search_url = f"{self.BASE_URL}/search/"
+        
+        try:
+            print(f"映画を検索中: {keyword}")
+            
+            async def load() -> List[Dict]:
+                html = await self._get_text('search', search_url, params={'search': keyword})
+                return await self._parse('search', html, self.parser._parse_search_results)
+            
+            search_cache = self.parser.search_cache
+            movies = await (search_cache.get_or_load_async(keyword, load) if search_cache else load())
+            
+            print(f"✓ {len(movies)}件の検索結果を取得しました")
+            return movies
+        
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"エラー: 映画検索に失敗しました - {e}")
+            return []
+    
+    async def _enrich_theater_counts(self, movies: List[Dict]) -> List[Dict]:
+        """
+        映画リストに上映館数情報を並列に付与
+        
+        Args:
+            movies: 映画情報のリスト（その場で更新される）
+        
+        Returns:
+            List[Dict]: 上映館数情報を付与した映画情報のリスト
+        """
+        if not movies:
+            return movies
+        
+        start = time.perf_counter()
+        theater_counts = await asyncio.gather(
+            *(self._fetch_theater_count(movie['url']) for movie in movies)
+        )
+        
+        for movie, theater_count in zip(movies, theater_counts):
+            self.parser._apply_theater_count(movie, theater_count)
+        
+        elapsed = time.perf_counter() - start
+        self.stage_timings['theater_count_enrichment'] = elapsed
+        print(f"✓ 上映館数を取得しました: {len(movies)}件 / {elapsed:.2f}秒")
+        
+        return movies
+    
+    async def _fetch_theater_count(self, movie_url: str) -> Optional[int]:
+        """
+        映画の上映館数を取得
+        
+        Args:
+            movie_url: 映画の詳細ページURL
+        
+        Returns:
+            int: 上映館数、取得できない場合はNone
+        """
+        try:
+            html = await self._get_text('detail', movie_url)
+            return await asyncio.to_thread(self.parser._extract_theater_count, html)
+        
+        except Exception as e:
+            print(f"上映館数の取得に失敗: {movie_url} - {e}")
+        
+        return None
+    
+    async def aclose(self) -> None:
+        """HTTPクライアントを閉じる"""
+        await self.client.aclose()
+
+
+class _EventLoopThread:
+    """プロセス内で共有するイベントループを専用スレッドで動かすクラス"""
+    
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self._run,
+            name='async-scraper-loop',
+            daemon=True
+        )
+        self.thread.start()
+    
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def submit(self, coro: Awaitable[T]) -> "Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_loop_thread: Optional[_EventLoopThread] = None
+_shared_scraper: Optional[AsyncMovieScraper] = None
+_shared_lock = threading.Lock()
+
+
+def _get_loop_thread() -> _EventLoopThread:
+    global _loop_thread
+    with _shared_lock:
+        if _loop_thread is None:
+            _loop_thread = _EventLoopThread()
+        return _loop_thread
+
+
+def submit(coro: Awaitable[T]) -> "Future[T]":
+    """
+    共有イベントループでコルーチンの実行を開始
+    
+    Args:
+        coro: 実行するコルーチン
+    
+    Returns:
+        Future: 結果を受け取るFuture（スレッドから待機できる）
+    """
+    return _get_loop_thread().submit(coro)
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    共有イベントループでコルーチンを実行し、結果を待つ
+    
+    Flaskのハンドラーやバッチスクリプトなどの同期コードから
+    共有クライアントを使うための入口。
+    
+    Args:
+        coro: 実行するコルーチン
+        timeout: 待機する最大秒数（超えた場合はコルーチンをキャンセルする）
+    
+    Returns:
+        コルーチンの戻り値
+    
+    Raises:
+        concurrent.futures.TimeoutError: timeout 秒以内に終わらなかった場合
+    """
+    future = submit(coro)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+
+def get_shared_async_scraper() -> AsyncMovieScraper:
+    """
+    プロセス内で共有するAsyncMovieScraperを取得
+    
+    接続プール（Keep-Alive / HTTP/2）をプロセスの生存期間中使い回すため、
+    Webhookのリクエストごとに新しいスクレイパーを作らずにこちらを使う。
+    タイムアウトとリトライ回数は環境変数 WEBHOOK_SCRAPER_TIMEOUT /
+    WEBHOOK_SCRAPER_RETRY_ATTEMPTS で調整可能。
+    
+    Returns:
+        AsyncMovieScraper: 共有インスタンス
+    """
+    global _shared_scraper
+    _get_loop_thread()
+    with _shared_lock:
+        if _shared_scraper is None:
+            # 応答を待たせないよう、バッチ処理より短いタイムアウトと少ないリトライにする
+            _shared_scraper = AsyncMovieScraper(
+                timeout=float(os.getenv('WEBHOOK_SCRAPER_TIMEOUT', '10')),
+                retry_policy=RetryPolicy(
+                    max_attempts=int(os.getenv('WEBHOOK_SCRAPER_RETRY_ATTEMPTS', '2')),
+                    max_delay=2.0
+                )
+            )
+        return _shared_scraper
+
+
+def test_async_scraper():
+    """非同期スクレイパーのテスト"""
+    print("非同期スクレイパーのテスト...\n")
+    print(f"HTTP/2: {'有効' if HTTP2_AVAILABLE else '無効（h2未インストール）'}\n")
+    
+    scraper = get_shared_async_scraper()
+    
+    async def fetch_all():
+        return await asyncio.gather(
+            scraper.fetch_upcoming_movies(),
+            scraper.fetch_movies_released_in_past_week(),
+        )
+    
+    start = time.perf_counter()
+    upcoming, now_showing = run_sync(fetch_all())
+    print(f"\n今週公開: {len(upcoming)}件 / 上映中: {len(now_showing)}件 "
+          f"（{time.perf_counter() - start:.2f}秒）")
+
+
+if __name__ == "__main__":
+    test_async_scraper()
@@ -0,0 +1,257 @@
+"""Webhookサーバー内で今週公開・上映中の一覧と検索インデックスを定期的に更新するモジュール"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from async_scraper import get_shared_async_scraper, run_sync
+from line_notifier import LineNotifier
+from movie_database import extract_movie_id
+from movie_search import merge_search_results
+from reply_snapshot import ReplySnapshotStore, build_reply_messages
+from storage import MovieStorage
+
+
+class BackgroundRefresher:
+    """一定間隔（ゆらぎ付き）で映画一覧を取得し、応答スナップショットと検索インデックスを更新するクラス
+    
+    gunicornの複数ワーカーで同時に取得しないよう、data/background_refresh.lock の
+    ファイルロックを取れたワーカーだけが更新する。ロックファイルに書き込んだ
+    最終更新時刻を見て、他のワーカーが更新した直後は取得しない。
+    
+    更新結果はファイルの置き換え（os.replace）で反映するため、
+    読み取り側は常に更新前か更新後のどちらかの一覧を参照する。
+    """
+    
+    DEFAULT_INTERVAL = 30 * 60
+    DEFAULT_JITTER = 0.1
+    DEFAULT_TIMEOUT = 5 * 60
+    
+    def __init__(
+        self,
+        snapshots: ReplySnapshotStore,
+        storage: MovieStorage,
+        interval: Optional[float] = None,
+        jitter: Optional[float] = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            snapshots: 更新する応答スナップショット
+            storage: 更新する保存データ（検索インデックスもあわせて更新される）
+            interval: 更新間隔（秒、0以下で無効）
+                （Noneの場合は環境変数 BACKGROUND_REFRESH_INTERVAL、デフォルト30分）
+            jitter: 更新間隔のゆらぎ（間隔に対する割合）
+                （Noneの場合は環境変数 BACKGROUND_REFRESH_JITTER、デフォルト0.1）
+            timeout: 1回の取得を待つ最大秒数（超えた場合は取得をキャンセルして失敗とする）
+                （Noneの場合は環境変数 BACKGROUND_REFRESH_TIMEOUT、デフォルト5分）
+        """
+        if interval is None:
+            interval = float(os.getenv('BACKGROUND_REFRESH_INTERVAL', str(self.DEFAULT_INTERVAL)))
+        if jitter is None:
+            jitter = float(os.getenv('BACKGROUND_REFRESH_JITTER', str(self.DEFAULT_JITTER)))
+        if timeout is None:
+            timeout = float(os.getenv('BACKGROUND_REFRESH_TIMEOUT', str(self.DEFAULT_TIMEOUT)))
+        self.snapshots = snapshots
+        self.storage = storage
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.lock_file = Path(storage.data_dir) / "background_refresh.lock"
+        
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        self.refreshed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.last_refreshed_at: Optional[float] = None
+    
+    def start(self) -> bool:
+        """
+        更新スレッドを開始
+        
+        Returns:
+            bool: 開始した場合True（無効な場合・開始済みの場合はFalse）
+        """
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return False
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='background-refresh', daemon=True)
+        self._thread.start()
+        print(f"✓ バックグラウンド更新を開始しました（間隔: {self.interval:.0f}秒 ±{self.jitter:.0%}）")
+        return True
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        更新スレッドを停止
+        
+        Args:
+            timeout: スレッドの終了を待つ最大秒数
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def _next_delay(self) -> float:
+        """次の更新までの待ち時間（ワーカー間で更新のタイミングをずらす）"""
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+    
+    def _run(self) -> None:
+        """更新ループ"""
+        # 起動直後に全ワーカーが同時にロックを取りにいかないよう、最初の更新もずらす
+        delay = random.uniform(0, self.interval * self.jitter)
+        while not self._stop_event.wait(delay):
+            try:
+                self.refresh_if_leader()
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️  バックグラウンド更新に失敗しました - {e}")
+            delay = self._next_delay()
+    
+    def refresh_if_leader(self) -> bool:
+        """
+        他のワーカーが更新中・更新直後でなければ更新
+        
+        ロックファイルには最終更新時刻（UNIX時間）を書き込み、
+        前回の更新（他のワーカーを含む）から間隔の半分が経つまでは更新しない。
+        
+        Returns:
+            bool: 更新した場合True
+        """
+        with open(self.lock_file, 'a+') as lock:
+            # ファイルロックが使えない環境（Windows）では単一プロセスとみなす
+            if FCNTL_AVAILABLE:
+                try:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    self.skipped += 1
+                    return False
+            try:
+                lock.seek(0)
+                try:
+                    last_refreshed_at = float(lock.read().strip() or 0)
+                except ValueError:
+                    last_refreshed_at = 0.0
+                if time.time() - last_refreshed_at < self.interval / 2:
+                    self.skipped += 1
+                    return False
+                
+                self.refresh()
+                
+                lock.seek(0)
+                lock.truncate()
+                lock.write(str(self.last_refreshed_at))
+                lock.flush()
+                return True
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+    
+    def refresh(self) -> None:
+        """映画一覧を取得し、応答スナップショットと保存データを置き換え"""
+        start = time.perf_counter()
+        scraper = get_shared_async_scraper()
+        
+        async def fetch_all():
+            return await asyncio.gather(
+                scraper.fetch_upcoming_movies(),
+                scraper.fetch_movies_released_in_past_week(),
+            )
+        
+        # 取得が終わらないままロックを持ち続けないよう、待つ時間に上限を設ける
+        upcoming, past_week = run_sync(fetch_all(), timeout=self.timeout)
+        
+        # メッセージの整形に使うだけなので、未設定の環境変数はダミーの値で補う
+        notifier = LineNotifier(
+            channel_access_token=os.getenv('LINE_CHANNEL_ACCESS_TOKEN') or '-',
+            user_id=os.getenv('LINE_USER_ID') or '-'
+        )
+        # 取得に失敗して空の場合は、前回のスナップショット・保存データを残す
+        for name, movies in (('weekly_new', upcoming), ('now_showing', past_week)):
+            if movies:
+                self.snapshots.save(name, build_reply_messages(notifier, name, movies), len(movies))
+        
+        if upcoming:
+            next_week = scraper.parser._filter_coming_in_next_week(upcoming)
+            self.storage.save_movies(self._merge_with_stored(past_week + next_week))
+        
+        self.refreshed += 1
+        self.last_refreshed_at = time.time()
+        print(f"✓ バックグラウンド更新が完了しました（{time.perf_counter() - start:.2f}秒）")
+    
+    def _merge_with_stored(self, movies: List[Dict]) -> List[Dict]:
+        """
+        取得した映画一覧に、保存データにしかない項目（上映館数など）を補う
+        
+        Args:
+            movies: 取得した映画情報のリスト
+        
+        Returns:
+            List[Dict]: 保存する映画情報のリスト（取得した映画のみ）
+        """
+        stored = (self.storage.load_movies() or {}).get('movies', [])
+        fetched_ids = {extract_movie_id(movie) for movie in movies}
+        return [
+            movie for movie in merge_search_results(movies, stored)
+            if extract_movie_id(movie) in fetched_ids
+        ]
+    
+    def stats(self) -> Dict:
+        """
+        更新の統計情報を取得
+        
+        Returns:
+            Dict: 更新回数・スキップ回数・失敗回数・最終更新からの経過秒数
+        """
+        return {
+            'interval': self.interval,
+            'refreshed': self.refreshed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'last_refreshed_ago': (
+                round(time.time() - self.last_refreshed_at, 1) if self.last_refreshed_at else None
+            ),
+        }
+
+
+def test_background_refresh():
+    """バックグラウンド更新のテスト"""
+    import tempfile
+    
+    print("バックグラウンド更新のテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = MovieStorage(tmp_dir, backend='json')
+        snapshots = ReplySnapshotStore(tmp_dir)
+        workers = [BackgroundRefresher(snapshots, storage, interval=600) for _ in range(3)]
+        
+        print("1. 3ワーカーが同時に更新を試行")
+        threads = [threading.Thread(target=worker.refresh_if_leader) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        print("\n2. 更新直後に再度試行")
+        workers[0].refresh_if_leader()
+        
+        for i, worker in enumerate(workers, 1):
+            print(f"ワーカー{i}: {worker.stats()}")
+
+
+if __name__ == "__main__":
+    test_background_refresh()
@@ -0,0 +1,311 @@
+"""バッチパイプラインのステージごとのチェックポイントを保存するモジュール"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from data_paths import get_data_dir
+
+
+class Checkpoint:
+    """1回の実行の進捗をディスクに保存し、再実行時に途中から再開するためのクラス
+    
+    data/checkpoints/<run_key>/ 以下に次のファイルを保存する。
+    - state.json: 完了したステージ・各ステージの結果・上映館数・通知の送信状況
+    - page-<種類>.html: 取得したページの本文
+    """
+    
+    DEFAULT_KEEP_DAYS = 7
+    
+    def __init__(
+        self,
+        run_key: str,
+        checkpoint_dir: Optional[str] = None,
+        keep_days: int = DEFAULT_KEEP_DAYS
+    ):
+        """
+        初期化
+        
+        Args:
+            run_key: 実行を識別するキー（同じキーの再実行は途中から再開する）
+            checkpoint_dir: チェックポイントを保存するディレクトリ（Noneの場合は data/checkpoints）
+            keep_days: 古いチェックポイントを削除するまでの日数
+        """
+        self.run_key = run_key
+        self.base_dir = Path(checkpoint_dir) if checkpoint_dir else get_data_dir("checkpoints")
+        self.run_dir = self.base_dir / run_key
+        self.state_file = self.run_dir / "state.json"
+        
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._prune(keep_days)
+        
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = self._load()
+        
+        if self._state.get('completed_stages'):
+            print(f"✓ チェックポイントから再開します: {run_key} "
+                  f"（完了済み: {', '.join(self._state['completed_stages'])}）")
+    
+    def _load(self) -> Dict[str, Any]:
+        """state.jsonを読み込み"""
+        state = {
+            'run_key': self.run_key,
+            'created_at': datetime.now().isoformat(),
+            'completed_stages': [],
+            'results': {},
+            'theater_counts': {},
+            'notifications': {},
+        }
+        if not self.state_file.exists():
+            return state
+        
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+        except Exception as e:
+            print(f"警告: チェックポイントの読み込みに失敗 - {e}")
+        return state
+    
+    def _save(self) -> None:
+        """state.jsonをアトミックに書き込み（ロック取得済みで呼ぶこと）"""
+        self._state['updated_at'] = datetime.now().isoformat()
+        tmp_file = self.state_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.state_file)
+    
+    def _prune(self, keep_days: int) -> None:
+        """保持期間を過ぎたチェックポイントを削除"""
+        expire_before = time.time() - keep_days * 24 * 60 * 60
+        for path in self.base_dir.iterdir():
+            if path.is_dir() and path != self.run_dir and path.stat().st_mtime < expire_before:
+                shutil.rmtree(path, ignore_errors=True)
+    
+    def is_completed(self, stage: str) -> bool:
+        """
+        ステージが完了済みかどうかを判定
+        
+        Args:
+            stage: ステージ名
+        
+        Returns:
+            bool: 完了済みの場合True
+        """
+        with self._lock:
+            return stage in self._state['completed_stages']
+    
+    def complete(self, stage: str, result: Optional[Any] = None) -> None:
+        """
+        ステージの完了と結果を記録
+        
+        Args:
+            stage: ステージ名
+            result: 再開時に復元するステージの結果（JSONに変換できる値）
+        """
+        with self._lock:
+            if result is not None:
+                self._state['results'][stage] = result
+            if stage not in self._state['completed_stages']:
+                self._state['completed_stages'].append(stage)
+            self._save()
+    
+    def invalidate(self, stages: List[str]) -> List[str]:
+        """
+        ステージの完了と結果を取り消す（前のステージをやり直した場合に、後続の古い結果を使わないようにする）
+        
+        通知の送信状況は取り消さない（送信済みの通知を再送しないため）。
+        
+        Args:
+            stages: 取り消すステージ名のリスト
+        
+        Returns:
+            List[str]: 完了済みから取り消したステージ名のリスト
+        """
+        with self._lock:
+            invalidated = [stage for stage in stages if stage in self._state['completed_stages']]
+            if not invalidated:
+                return []
+            self._state['completed_stages'] = [
+                stage for stage in self._state['completed_stages'] if stage not in invalidated
+            ]
+            for stage in invalidated:
+                self._state['results'].pop(stage, None)
+            self._save()
+            return invalidated
+    
+    def result(self, stage: str) -> Any:
+        """
+        完了済みステージの結果を取得
+        
+        Args:
+            stage: ステージ名
+        
+        Returns:
+            記録した結果、無い場合はNone
+        """
+        with self._lock:
+            return self._state['results'].get(stage)
+    
+    def save_page(self, source: str, html: str) -> None:
+        """
+        取得したページの本文を保存
+        
+        Args:
+            source: ページの種類
+            html: ページの本文
+        """
+        path = self.run_dir / f"page-{source}.html"
+        tmp_path = path.with_suffix('.html.tmp')
+        tmp_path.write_text(html, encoding='utf-8')
+        os.replace(tmp_path, path)
+    
+    def load_page(self, source: str) -> Optional[str]:
+        """
+        保存したページの本文を読み込み
+        
+        Args:
+            source: ページの種類
+        
+        Returns:
+            str: ページの本文、無い場合はNone
+        """
+        path = self.run_dir / f"page-{source}.html"
+        if not path.exists():
+            return None
+        return path.read_text(encoding='utf-8')
+    
+    def theater_counts(self) -> Dict[str, Optional[int]]:
+        """
+        取得済みの上映館数を取得
+        
+        Returns:
+            Dict[str, Optional[int]]: 映画URL -> 上映館数（詳細ページに館数が無い場合はNone）
+        """
+        with self._lock:
+            return dict(self._state['theater_counts'])
+    
+    def record_theater_count(self, movie_url: str, theater_count: Optional[int]) -> None:
+        """
+        取得した上映館数を記録（1件ごとに保存する）
+        
+        詳細ページに館数が無い場合（None）も記録し、再開時に取得し直さない。
+        取得に失敗した映画は記録せず（呼び出し側で判断する）、再開時にもう一度取得する。
+        
+        Args:
+            movie_url: 映画の詳細ページURL
+            theater_count: 上映館数（館数が無い場合はNone）
+        """
+        with self._lock:
+            self._state['theater_counts'][movie_url] = theater_count
+            self._save()
+    
+    def retry_key(self, notification: str) -> str:
+        """
+        通知の再送防止キーを取得（初回は作成して保存する）
+        
+        送信前に保存しておくことで、送信直後に中断して再開した場合も
+        同じキーで送信し、LINE側で重複が排除される。
+        
+        Args:
+            notification: 通知の種類
+        
+        Returns:
+            str: X-Line-Retry-Key に使うUUID
+        """
+        with self._lock:
+            entry = self._state['notifications'].setdefault(notification, {})
+            if 'retry_key' not in entry:
+                entry['retry_key'] = str(uuid.uuid4())
+                entry['sent'] = False
+                self._save()
+            return entry['retry_key']
+    
+    def is_sent(self, notification: str) -> bool:
+        """
+        通知が送信済みかどうかを判定
+        
+        Args:
+            notification: 通知の種類
+        
+        Returns:
+            bool: 送信済みの場合True
+        """
+        with self._lock:
+            return self._state['notifications'].get(notification, {}).get('sent', False)
+    
+    def mark_sent(self, notification: str) -> None:
+        """
+        通知の送信完了を記録
+        
+        Args:
+            notification: 通知の種類
+        """
+        with self._lock:
+            entry = self._state['notifications'].setdefault(notification, {})
+            entry['sent'] = True
+            entry['sent_at'] = datetime.now().isoformat()
+            self._save()
+
+
+def create_checkpoint(name: str) -> Optional[Checkpoint]:
+    """
+    環境変数から実行IDを決めてチェックポイントを作成
+    
+    実行IDは PIPELINE_RUN_ID、なければ GITHUB_RUN_ID を使う
+    （GitHub Actions の再実行では同じ値になる）。
+    どちらも無い場合と PIPELINE_CHECKPOINT=0 の場合はチェックポイントを使わない。
+    
+    Args:
+        name: パイプラインの名前（同じ実行IDの別のパイプラインと区別する）
+    
+    Returns:
+        Checkpoint: チェックポイント、使わない場合はNone
+    """
+    if os.getenv('PIPELINE_CHECKPOINT', '1') == '0':
+        return None
+    
+    run_id = os.getenv('PIPELINE_RUN_ID') or os.getenv('GITHUB_RUN_ID')
+    if not run_id:
+        return None
+    
+    return Checkpoint(
+        f"{run_id}-{name}",
+        checkpoint_dir=os.getenv('PIPELINE_CHECKPOINT_DIR')
+    )
+
+
+def test_checkpoint():
+    """チェックポイントのテスト"""
+    import tempfile
+    
+    print("チェックポイントのテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("1. 途中まで実行")
+        checkpoint = Checkpoint('run-1', checkpoint_dir=tmp_dir)
+        checkpoint.save_page('upcoming', '<html>upcoming</html>')
+        checkpoint.complete('fetch')
+        checkpoint.record_theater_count('https://eiga.com/movie/1/', 300)
+        checkpoint.record_theater_count('https://eiga.com/movie/2/', None)
+        key = checkpoint.retry_key('daily')
+        print(f"   再送防止キー: {key}")
+        
+        print("\n2. 同じ実行IDで再開")
+        resumed = Checkpoint('run-1', checkpoint_dir=tmp_dir)
+        print(f"   fetch完了済み: {resumed.is_completed('fetch')}")
+        print(f"   保存したページ: {resumed.load_page('upcoming')}")
+        print(f"   上映館数: {resumed.theater_counts()}")
+        print(f"   同じ再送防止キー: {resumed.retry_key('daily') == key}")
+        print(f"   送信済み: {resumed.is_sent('daily')}")
+        resumed.mark_sent('daily')
+        print(f"   送信済み（記録後）: {Checkpoint('run-1', checkpoint_dir=tmp_dir).is_sent('daily')}")
+
+
+if __name__ == "__main__":
+    test_checkpoint()
@@ -0,0 +1,39 @@
+"""データの保存先（dataディレクトリ）を解決するモジュール"""
+
+import os
+from pathlib import Path
+
+# リポジトリ直下の data（このモジュールがある src の1つ上）
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def get_data_dir(*parts: str) -> Path:
+    """
+    dataディレクトリ（またはその中のパス）を取得
+    
+    GitHub Actionsのバッチ（リポジトリ直下で実行）とWebhookサーバー（gunicorn --chdir src）が
+    同じファイルを読み書きするよう、作業ディレクトリではなくモジュールの位置から解決する。
+    環境変数 DATA_DIR を設定した場合はそちらを使う。
+    
+    Args:
+        *parts: dataディレクトリからの相対パス
+    
+    Returns:
+        Path: 絶対パス
+    """
+    base = os.getenv('DATA_DIR')
+    data_dir = Path(base).resolve() if base else DEFAULT_DATA_DIR
+    return data_dir.joinpath(*parts)
+
+
+def test_data_paths():
+    """データの保存先のテスト"""
+    print("データの保存先のテスト...\n")
+    
+    print(f"作業ディレクトリ: {Path.cwd()}")
+    print(f"dataディレクトリ: {get_data_dir()}")
+    print(f"応答スナップショット: {get_data_dir('reply_snapshots.json')}")
+
+
+if __name__ == "__main__":
+    test_data_paths()
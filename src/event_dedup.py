@@ -0,0 +1,287 @@
+"""Webhookイベントの重複（LINEの再送）を検出するモジュール"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from data_paths import get_data_dir
+
+
+class EventDeduplicator:
+    """webhookEventId をキーに、処理済みのイベントを一定時間記録するクラス
+    
+    イベントは次の順に記録する。
+    1. claim: 処理を始める前に、処理中として確保する（処理済み・他で処理中の場合はFalse）
+    2. commit: 処理（またはキューへの投入）が終わったら、処理済みとして確定する
+    3. release: 503/500で応答する場合は確保を取り消し、LINEの再送を処理できるようにする
+    
+    - 処理済みのイベントはプロセス内のLRUの辞書でも判定し、gunicornの他のワーカーとは
+      data/webhook_events.db（SQLite）で共有する
+    - 確保は主キーでのUPSERT 1回で行い、未記録・期限切れ・処理中の期限（lease 秒）切れの
+      場合だけ新規とみなす（同じイベントを複数のワーカーが同時に受けても、確保できるのは1つだけ。
+      確保したワーカーが落ちた場合も、lease 秒後の再送は処理される）
+    - window 秒を過ぎた記録は一定件数ごとに削除する
+    """
+    
+    # lease_until: 処理中の期限（UNIX時間、処理済みの場合は0）
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS seen_events (
+            event_id TEXT PRIMARY KEY,
+            seen_at REAL NOT NULL,
+            lease_until REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_seen_events_seen_at ON seen_events(seen_at);
+    """
+    
+    DEFAULT_WINDOW = 24 * 60 * 60
+    DEFAULT_LEASE = 2 * 60
+    DEFAULT_MAX_ENTRIES = 10000
+    PURGE_INTERVAL = 1000
+    
+    def __init__(
+        self,
+        data_dir: Optional[str] = None,
+        window: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        lease: Optional[float] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            data_dir: データベースを保存するディレクトリ（Noneの場合はリポジトリ直下の data、環境変数 DATA_DIR で上書き可能）
+            window: 重複とみなす期間（秒）
+                （Noneの場合は環境変数 WEBHOOK_DEDUP_WINDOW、デフォルト24時間）
+            max_entries: プロセス内に保持する最大件数
+                （Noneの場合は環境変数 WEBHOOK_DEDUP_MAX_ENTRIES、デフォルト10000）
+            lease: 確保したイベントを処理中とみなす最大秒数
+                （Noneの場合は環境変数 WEBHOOK_DEDUP_LEASE、デフォルト2分）
+        """
+        if window is None:
+            window = float(os.getenv('WEBHOOK_DEDUP_WINDOW', str(self.DEFAULT_WINDOW)))
+        if max_entries is None:
+            max_entries = int(os.getenv('WEBHOOK_DEDUP_MAX_ENTRIES', str(self.DEFAULT_MAX_ENTRIES)))
+        if lease is None:
+            lease = float(os.getenv('WEBHOOK_DEDUP_LEASE', str(self.DEFAULT_LEASE)))
+        self.window = window
+        self.max_entries = max_entries
+        self.lease = lease
+        self.db_file = (Path(data_dir) if data_dir else get_data_dir()) / "webhook_events.db"
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # イベントID -> 記録した時刻
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        
+        self.checked = 0
+        self.redeliveries = 0
+        self.suppressed = 0
+        self.released = 0
+        self._inserts_since_purge = 0
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+            # 処理中の期限が無い以前のデータベースには列を追加する（既存の記録は処理済みとみなす）
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(seen_events)")}
+            if 'lease_until' not in columns:
+                conn.execute("ALTER TABLE seen_events ADD COLUMN lease_until REAL NOT NULL DEFAULT 0")
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """スレッドごとの接続を取得し、終了時にコミット
+        
+        すべてのイベントで使うため、接続を開き直さずにスレッドごとに使い回す
+        （WALでは最後の接続を閉じるたびにチェックポイントが走り、判定より時間がかかる）。
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            # 電源断で直前の記録が失われても再送を1回処理するだけなので、コミット時の同期を減らす
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        with conn:
+            yield conn
+    
+    def claim(self, event: Dict) -> bool:
+        """
+        未処理のイベントを処理中として確保
+        
+        確保したイベントは、処理後に commit、処理できなかった場合は release を呼ぶこと。
+        
+        Args:
+            event: LINEイベント
+        
+        Returns:
+            bool: 確保した場合True（処理済み・他で処理中の重複の場合はFalse）
+        """
+        event_id = event.get('webhookEventId')
+        if not event_id:
+            return True
+        
+        is_redelivery = bool(event.get('deliveryContext', {}).get('isRedelivery'))
+        now = time.time()
+        with self._lock:
+            self.checked += 1
+            if is_redelivery:
+                self.redeliveries += 1
+            
+            seen_at = self._seen.get(event_id)
+            if seen_at is not None and now - seen_at < self.window:
+                self._seen.move_to_end(event_id)
+                self.suppressed += 1
+                return False
+        
+        # 他のワーカーが処理済み・処理中かをSQLiteで判定（確保も同時に行う）
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO seen_events (event_id, seen_at, lease_until) VALUES (?, ?, ?)
+                ON CONFLICT(event_id) DO UPDATE SET
+                    seen_at = excluded.seen_at,
+                    lease_until = excluded.lease_until
+                WHERE seen_events.seen_at < ?
+                    OR (seen_events.lease_until > 0 AND seen_events.lease_until < ?)
+                """,
+                (event_id, now, now + self.lease, now - self.window, now)
+            )
+            is_new = cursor.rowcount == 1
+        
+        with self._lock:
+            if is_new:
+                self._inserts_since_purge += 1
+                purge = self._inserts_since_purge >= self.PURGE_INTERVAL
+                if purge:
+                    self._inserts_since_purge = 0
+            else:
+                self.suppressed += 1
+                purge = False
+        
+        if purge:
+            self.purge()
+        return is_new
+    
+    def commit(self, event: Dict) -> None:
+        """
+        確保したイベントを処理済みとして確定
+        
+        Args:
+            event: LINEイベント
+        """
+        event_id = event.get('webhookEventId')
+        if not event_id:
+            return
+        
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE seen_events SET seen_at = ?, lease_until = 0 WHERE event_id = ?",
+                (now, event_id)
+            )
+        with self._lock:
+            self._remember(event_id, now)
+    
+    def release(self, event: Dict) -> None:
+        """
+        確保したイベントを取り消し、再送されたときに処理できるようにする
+        
+        Args:
+            event: LINEイベント
+        """
+        event_id = event.get('webhookEventId')
+        if not event_id:
+            return
+        
+        with self._connect() as conn:
+            conn.execute("DELETE FROM seen_events WHERE event_id = ? AND lease_until > 0", (event_id,))
+        with self._lock:
+            self.released += 1
+    
+    def _remember(self, event_id: str, seen_at: float) -> None:
+        """プロセス内に記録し、上限を超えたら古いものから削除（ロック取得済みで呼ぶこと）"""
+        self._seen[event_id] = seen_at
+        self._seen.move_to_end(event_id)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+    
+    def purge(self) -> int:
+        """
+        期限切れの記録を削除
+        
+        Returns:
+            int: SQLiteから削除した件数
+        """
+        cutoff = time.time() - self.window
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM seen_events WHERE seen_at < ?", (cutoff,)).rowcount
+        return deleted
+    
+    def stats(self) -> Dict:
+        """
+        重複検出の統計情報を取得
+        
+        Returns:
+            Dict: 判定したイベント数・再送されたイベント数・破棄した重複の数・取り消した数・プロセス内の件数
+        """
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'redeliveries': self.redeliveries,
+                'suppressed': self.suppressed,
+                'released': self.released,
+                'entries': len(self._seen),
+                'window': self.window,
+            }
+
+
+def test_event_dedup():
+    """重複検出のテスト"""
+    import tempfile
+    
+    print("重複検出のテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 同じデータベースを使う2つのワーカー
+        worker_a = EventDeduplicator(tmp_dir, window=1, lease=0.5)
+        worker_b = EventDeduplicator(tmp_dir, window=1, lease=0.5)
+        
+        event = {'webhookEventId': '01TEST', 'deliveryContext': {'isRedelivery': False}}
+        redelivered = {'webhookEventId': '01TEST', 'deliveryContext': {'isRedelivery': True}}
+        
+        print(f"1. 初回の配信（ワーカーA）: 確保={worker_a.claim(event)}")
+        print(f"2. 処理中の再送（ワーカーB）: 確保={worker_b.claim(redelivered)}")
+        worker_a.commit(event)
+        print(f"3. 処理後の再送（ワーカーA）: 確保={worker_a.claim(redelivered)}")
+        print(f"4. 処理後の再送（ワーカーB）: 確保={worker_b.claim(redelivered)}")
+        
+        failed = {'webhookEventId': '02TEST'}
+        print(f"\n5. 503で応答するイベント（ワーカーA）: 確保={worker_a.claim(failed)}")
+        worker_a.release(failed)
+        print(f"6. 取り消し後の再送（ワーカーB）: 確保={worker_b.claim(failed)}")
+        time.sleep(0.6)
+        print(f"7. ワーカーBが確定しないまま期限切れ後の再送（ワーカーA）: 確保={worker_a.claim(failed)}")
+        
+        time.sleep(1.1)
+        print(f"\n8. 期間経過後（ワーカーB）: 確保={worker_b.claim(event)}")
+        
+        start = time.perf_counter()
+        for i in range(1000):
+            bulk = {'webhookEventId': f'bulk-{i}'}
+            if worker_a.claim(bulk):
+                worker_a.commit(bulk)
+        for i in range(1000):
+            worker_a.claim({'webhookEventId': f'bulk-{i}'})
+        print(f"\n2000件の判定: {(time.perf_counter() - start) * 1000:.1f}ms")
+        
+        print(f"\nワーカーA: {worker_a.stats()}")
+        print(f"ワーカーB: {worker_b.stats()}")
+
+
+if __name__ == "__main__":
+    test_event_dedup()
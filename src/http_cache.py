@@ -0,0 +1,506 @@
+"""HTTPレスポンスをディスクにキャッシュするモジュール"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from data_paths import get_data_dir
+
+
+class HttpCache:
+    """ETag/Last-Modifiedによる条件付きGETに対応したディスクキャッシュ
+    
+    gunicornの複数ワーカー・バッチが同じディレクトリを共有するため、インデックスは持たず、
+    エントリごとに本文（<key>.body）とメタデータ（<key>.meta）をそれぞれ os.replace で保存する。
+    本文の更新日時を最終アクセス時刻として使い、一定件数の保存ごとにディレクトリを走査して
+    合計サイズの上限を超えた分を古い順に削除する（他のプロセスが保存したエントリも対象になる）。
+    """
+    
+    # URLの種類ごとのTTL（秒）。先にマッチしたものを使用する
+    DEFAULT_TTL_RULES: List[Tuple[str, int]] = [
+        (r'/movie/\d+/?$', 6 * 60 * 60),           # 詳細ページ
+        (r'/(now|upcoming|search)/', 10 * 60),     # 一覧・検索ページ
+    ]
+    DEFAULT_TTL = 10 * 60
+    DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+    
+    # キャッシュに保持するレスポンスヘッダー
+    STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+    
+    # ディスクの古いエントリを削除する間隔（保存件数）
+    EVICT_INTERVAL = 32
+    # 書き込み中に終了したプロセスの一時ファイルを削除するまでの秒数
+    STALE_TMP_AGE = 60 * 60
+    
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_rules: Optional[List[Tuple[str, int]]] = None,
+        default_ttl: int = DEFAULT_TTL
+    ):
+        """
+        初期化
+        
+        Args:
+            cache_dir: キャッシュを保存するディレクトリ（Noneの場合は data/http_cache）
+            max_bytes: キャッシュ本体の合計サイズ上限（バイト）
+                （EVICT_INTERVAL 件の保存ごとに削除するため、一時的に超えることがある）
+            ttl_rules: (URLの正規表現, TTL秒) のリスト
+            default_ttl: どのルールにもマッチしない場合のTTL（秒）
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else get_data_dir("http_cache")
+        self.max_bytes = max_bytes
+        self.ttl_rules = [
+            (re.compile(pattern), ttl)
+            for pattern, ttl in (ttl_rules or self.DEFAULT_TTL_RULES)
+        ]
+        self.default_ttl = default_ttl
+        
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_fallbacks = 0
+        self._writes_since_evict = 0
+    
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+    
+    def _body_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.body"
+    
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.meta"
+    
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        """一時ファイルに書き込んでから置き換える（他のプロセスが書きかけのファイルを読まないように）"""
+        tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            raise
+    
+    def _read_meta(self, key: str) -> Optional[Dict]:
+        """
+        エントリのメタデータを読み込み
+        
+        Args:
+            key: キャッシュキー
+        
+        Returns:
+            Dict: エントリ情報、存在しないか読み込めない場合はNone
+        """
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"警告: HTTPキャッシュのメタデータ読み込みに失敗 - {e}")
+            return None
+    
+    def _write_meta(self, key: str, entry: Dict) -> None:
+        """エントリのメタデータを保存"""
+        self._write_atomic(self._meta_path(key), json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+    
+    def ttl_for(self, url: str) -> int:
+        """
+        URLに対応するTTLを取得
+        
+        Args:
+            url: リクエストURL
+        
+        Returns:
+            int: TTL（秒）
+        """
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+    
+    def lookup(self, url: str) -> Optional[Dict]:
+        """
+        キャッシュエントリを取得
+        
+        Args:
+            url: リクエストURL（クエリ文字列を含む）
+        
+        Returns:
+            Dict: エントリ情報、存在しない場合はNone
+        """
+        key = self._key(url)
+        entry = self._read_meta(key)
+        if entry is None:
+            return None
+        try:
+            # 本文の更新日時を最終アクセス時刻として使う（削除の順序に使う）
+            os.utime(self._body_path(key))
+        except OSError:
+            # 他のプロセスが削除した
+            return None
+        return dict(entry, key=key)
+    
+    def is_fresh(self, entry: Dict) -> bool:
+        """
+        エントリがTTL内かどうかを判定
+        
+        Args:
+            entry: lookup() で取得したエントリ
+        
+        Returns:
+            bool: 再検証せずに使える場合True
+        """
+        return time.time() - entry['stored_at'] < self.ttl_for(entry['url'])
+    
+    @staticmethod
+    def conditional_headers(entry: Dict) -> Dict[str, str]:
+        """
+        再検証用の条件付きリクエストヘッダーを作成
+        
+        Args:
+            entry: lookup() で取得したエントリ
+        
+        Returns:
+            Dict[str, str]: If-None-Match / If-Modified-Since ヘッダー
+        """
+        headers = {}
+        stored_headers = entry.get('headers', {})
+        if stored_headers.get('ETag'):
+            headers['If-None-Match'] = stored_headers['ETag']
+        if stored_headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = stored_headers['Last-Modified']
+        return headers
+    
+    def read_body(self, entry: Dict) -> Optional[bytes]:
+        """
+        エントリの本文を読み込み
+        
+        Args:
+            entry: lookup() で取得したエントリ
+        
+        Returns:
+            bytes: 本文、読み込めない場合はNone
+        """
+        try:
+            body = self._body_path(entry['key']).read_bytes()
+        except OSError:
+            return None
+        # 他のプロセスが本文だけを置き換えた直後など、メタデータと一致しない場合は使わない
+        if len(body) != entry.get('size'):
+            return None
+        return body
+    
+    def read_stale(self, url: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """
+        TTLに関係なく最後に取得できた本文を読み込み（取得失敗時のフォールバック用）
+        
+        Args:
+            url: リクエストURL（クエリ文字列を含む）
+        
+        Returns:
+            tuple: (本文, エンコーディング)、キャッシュが無い場合はNone
+        """
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        body = self.read_body(entry)
+        if body is None:
+            return None
+        self.record('stale_fallbacks')
+        return body, entry.get('encoding')
+    
+    def store(self, url: str, headers: Dict[str, str], body: bytes, encoding: Optional[str]) -> None:
+        """
+        レスポンスをキャッシュに保存
+        
+        Args:
+            url: リクエストURL（クエリ文字列を含む）
+            headers: レスポンスヘッダー
+            body: レスポンス本文
+            encoding: レスポンスのエンコーディング
+        """
+        key = self._key(url)
+        entry = {
+            'url': url,
+            'headers': {
+                name: headers[name] for name in self.STORED_HEADERS if name in headers
+            },
+            'encoding': encoding,
+            'size': len(body),
+            'stored_at': time.time(),
+        }
+        
+        # 本文を先に置き換え、メタデータが指す本文が必ず存在するようにする
+        try:
+            self._write_atomic(self._body_path(key), body)
+            self._write_meta(key, entry)
+        except OSError as e:
+            print(f"警告: HTTPキャッシュの保存に失敗 - {e}")
+            return
+        
+        # ディレクトリの走査は件数に比例するため、一定件数の保存ごとにまとめて削除する
+        with self._lock:
+            self._writes_since_evict += 1
+            evict = self._writes_since_evict >= self.EVICT_INTERVAL
+            if evict:
+                self._writes_since_evict = 0
+        if evict:
+            self._evict_if_needed()
+    
+    def mark_revalidated(self, entry: Dict) -> None:
+        """
+        304応答を受けたエントリの保存時刻を更新
+        
+        Args:
+            entry: lookup() で取得したエントリ
+        """
+        current = self._read_meta(entry['key'])
+        # 他のプロセスが新しいレスポンスを保存していた場合は上書きしない
+        if current is None or current.get('stored_at') != entry['stored_at']:
+            return
+        current['stored_at'] = time.time()
+        try:
+            self._write_meta(entry['key'], current)
+        except OSError as e:
+            print(f"警告: HTTPキャッシュの保存に失敗 - {e}")
+    
+    def _scan(self) -> Tuple[List[Tuple[float, int, str]], List[str], List[str]]:
+        """
+        キャッシュディレクトリを走査
+        
+        他のプロセス・スレッドが同時に削除・置き換えしたファイルは無視する。
+        
+        Returns:
+            tuple: ((最終アクセス時刻, サイズ, キー) のリスト, 本文が無いメタデータのキーのリスト,
+                古い一時ファイルのパスのリスト)
+        """
+        bodies = []
+        metas = set()
+        stale_tmp = []
+        tmp_cutoff = time.time() - self.STALE_TMP_AGE
+        with os.scandir(self.cache_dir) as it:
+            for dir_entry in it:
+                key, _, suffix = dir_entry.name.partition('.')
+                if suffix == 'meta':
+                    metas.add(key)
+                    continue
+                if suffix != 'body' and not suffix.endswith('.tmp'):
+                    continue
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                if suffix == 'body':
+                    bodies.append((stat.st_mtime, stat.st_size, key))
+                elif stat.st_mtime < tmp_cutoff:
+                    stale_tmp.append(dir_entry.path)
+        orphans = metas - {key for _, _, key in bodies}
+        return bodies, sorted(orphans), stale_tmp
+    
+    def _evict_if_needed(self) -> int:
+        """
+        合計サイズが上限を超えた場合、最終アクセスが古い順に削除
+        
+        Returns:
+            int: 削除した件数
+        """
+        try:
+            bodies, orphans, stale_tmp = self._scan()
+        except OSError as e:
+            print(f"警告: HTTPキャッシュの整理に失敗 - {e}")
+            return 0
+        
+        for path in stale_tmp:
+            self._unlink(Path(path))
+        # 本文が削除されたエントリのメタデータ（削除中に他のプロセスが保存したものを除くため、本文の有無を再確認する）
+        for key in orphans:
+            if not self._body_path(key).exists():
+                self._unlink(self._meta_path(key))
+        
+        total = sum(size for _, size, _ in bodies)
+        if total <= self.max_bytes:
+            return 0
+        
+        deleted = 0
+        for _, size, key in sorted(bodies):
+            if total <= self.max_bytes:
+                break
+            total -= size
+            # メタデータを先に削除し、本文の無いエントリを参照させない
+            self._unlink(self._meta_path(key))
+            # 他のプロセスが同時に削除した分は数えない
+            if self._unlink(self._body_path(key)):
+                deleted += 1
+        
+        with self._lock:
+            self.evictions += deleted
+        return deleted
+    
+    @staticmethod
+    def _unlink(path: Path) -> bool:
+        """ファイルを削除（削除した場合True）"""
+        try:
+            path.unlink()
+            return True
+        except OSError:
+            return False
+    
+    def record(self, event: str) -> None:
+        """
+        統計カウンターを加算
+        
+        Args:
+            event: 'hits' / 'revalidations' / 'misses' / 'stale_fallbacks' のいずれか
+        """
+        with self._lock:
+            setattr(self, event, getattr(self, event) + 1)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        キャッシュの統計情報を取得
+        
+        Returns:
+            Dict[str, int]: ヒット数・再検証数・ミス数・削除数・フォールバック数・エントリ数・合計サイズ
+                （エントリ数・合計サイズは他のプロセスが保存したものを含む）
+        """
+        try:
+            bodies, _, _ = self._scan()
+        except OSError:
+            bodies = []
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'stale_fallbacks': self.stale_fallbacks,
+                'entries': len(bodies),
+                'bytes': sum(size for _, size, _ in bodies),
+            }
+
+
+class CachedSession(requests.Session):
+    """GETリクエストをHttpCache経由で行うSession"""
+    
+    def __init__(self, cache: HttpCache):
+        """
+        初期化
+        
+        Args:
+            cache: 使用するHttpCache
+        """
+        super().__init__()
+        self.cache = cache
+    
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        if method.upper() != 'GET' or kwargs.get('stream'):
+            return super().request(method, url, params=params, headers=headers, **kwargs)
+        
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        entry = self.cache.lookup(full_url)
+        
+        if entry and self.cache.is_fresh(entry):
+            body = self.cache.read_body(entry)
+            if body is not None:
+                self.cache.record('hits')
+                return self._build_cached_response(entry, body)
+        
+        request_headers = dict(headers or {})
+        if entry:
+            request_headers.update(self.cache.conditional_headers(entry))
+        
+        response = super().request(method, url, params=params, headers=request_headers, **kwargs)
+        
+        if response.status_code == 304 and entry:
+            body = self.cache.read_body(entry)
+            if body is not None:
+                self.cache.record('revalidations')
+                self.cache.mark_revalidated(entry)
+                return self._build_cached_response(entry, body)
+        
+        self.cache.record('misses')
+        if response.status_code == 200:
+            self.cache.store(full_url, response.headers, response.content, response.encoding)
+        
+        return response
+    
+    @staticmethod
+    def _build_cached_response(entry: Dict, body: bytes) -> requests.Response:
+        """
+        キャッシュエントリからResponseを組み立て
+        
+        Args:
+            entry: キャッシュエントリ
+            body: レスポンス本文
+        
+        Returns:
+            requests.Response: ステータス200のレスポンス
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = entry['url']
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response.encoding = entry.get('encoding')
+        response._content = body
+        response.from_cache = True
+        return response
+
+
+def test_http_cache():
+    """HTTPキャッシュのテスト"""
+    import tempfile
+    
+    print("HTTPキャッシュのテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = HttpCache(cache_dir=tmp_dir, max_bytes=10)
+        
+        print("1. TTL判定テスト")
+        print(f"   詳細ページ: {cache.ttl_for('https://eiga.com/movie/12345/')}秒")
+        print(f"   一覧ページ: {cache.ttl_for('https://eiga.com/upcoming/')}秒")
+        
+        print("\n2. 保存・取得テスト")
+        cache.store('https://eiga.com/now/', {'ETag': '"abc"'}, b'12345678', 'utf-8')
+        entry = cache.lookup('https://eiga.com/now/')
+        print(f"   新鮮: {cache.is_fresh(entry)}")
+        print(f"   条件付きヘッダー: {cache.conditional_headers(entry)}")
+        print(f"   本文: {cache.read_body(entry)}")
+        
+        print("\n3. 別のプロセス（インスタンス）との共有テスト")
+        other = HttpCache(cache_dir=tmp_dir, max_bytes=10)
+        other.store('https://eiga.com/search/?q=a', {}, b'xy', 'utf-8')
+        print(f"   他で保存したエントリ: {cache.read_body(cache.lookup('https://eiga.com/search/?q=a'))}")
+        print(f"   元のエントリ: {other.read_body(other.lookup('https://eiga.com/now/'))}")
+        
+        print("\n4. サイズ上限による削除テスト")
+        cache.EVICT_INTERVAL = 1
+        time.sleep(0.01)
+        cache.lookup('https://eiga.com/now/')
+        cache.store('https://eiga.com/upcoming/', {}, b'ab', 'utf-8')
+        print(f"   残ったエントリ: {[url for url in ('https://eiga.com/now/', 'https://eiga.com/search/?q=a', 'https://eiga.com/upcoming/') if cache.lookup(url)]}")
+        print(f"   統計: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    test_http_cache()
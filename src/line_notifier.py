@@ -4,19 +4,33 @@ import base64
 import hashlib
 import hmac
 import os
-from typing import Dict, List, Optional
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
 class LineNotifier:
-    """LINE Messaging APIで通知を送信するクラス"""
+    """LINE Messaging APIで通知を送信するクラス
+    
+    api.line.me への接続はKeep-Aliveのセッションで使い回す。
+    セッションの接続プールはスレッドセーフなため、1つのインスタンスを
+    Webhookの複数スレッドから共有できる（get_line_notifier を参照）。
+    """
+    
+    DEFAULT_POOL_MAXSIZE = 10
+    DEFAULT_CONNECT_TIMEOUT = 5.0
+    DEFAULT_READ_TIMEOUT = 30.0
     
     def __init__(
         self,
         channel_access_token: Optional[str] = None,
         user_id: Optional[str] = None,
-        channel_secret: Optional[str] = None
+        channel_secret: Optional[str] = None,
+        pool_maxsize: Optional[int] = None,
+        timeout: Optional[Tuple[float, float]] = None
     ):
         """
         初期化
@@ -25,6 +39,9 @@ class LineNotifier:
             channel_access_token: LINEチャネルアクセストークン
             user_id: 通知先のユーザーID
             channel_secret: LINEチャネルシークレット（Webhook署名検証用）
+            pool_maxsize: 接続プールの最大接続数（Noneの場合は環境変数 LINE_POOL_MAXSIZE、デフォルト10）
+            timeout: (接続, 読み込み) のタイムアウト（秒）
+                （Noneの場合は環境変数 LINE_CONNECT_TIMEOUT / LINE_READ_TIMEOUT、デフォルト5秒/30秒）
         """
         self.channel_access_token = channel_access_token or os.getenv('LINE_CHANNEL_ACCESS_TOKEN')
         self.user_id = user_id or os.getenv('LINE_USER_ID')
@@ -36,21 +53,93 @@ class LineNotifier:
             raise ValueError("LINE_CHANNEL_ACCESS_TOKEN が設定されていません")
         if not self.user_id:
             raise ValueError("LINE_USER_ID が設定されていません")
+        
+        self.pool_maxsize = pool_maxsize or int(os.getenv('LINE_POOL_MAXSIZE', str(self.DEFAULT_POOL_MAXSIZE)))
+        self.timeout = timeout or (
+            float(os.getenv('LINE_CONNECT_TIMEOUT', str(self.DEFAULT_CONNECT_TIMEOUT))),
+            float(os.getenv('LINE_READ_TIMEOUT', str(self.DEFAULT_READ_TIMEOUT)))
+        )
+        
+        # 接続を使い回すセッション（認証ヘッダーもセッションに設定しておく）
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.channel_access_token}',
+            'Content-Type': 'application/json'
+        })
+        
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
     
-    def send_text_message(self, text: str) -> bool:
+    def _post(self, url: str, data: Dict, headers: Optional[Dict] = None) -> requests.Response:
+        """
+        Messaging APIにPOSTし、所要時間を記録
+        
+        Args:
+            url: APIのURL
+            data: リクエストボディ
+            headers: セッションのヘッダーに追加するヘッダー
+        
+        Returns:
+            requests.Response: レスポンス
+        """
+        start = time.perf_counter()
+        try:
+            return self.session.post(url, headers=headers, json=data, timeout=self.timeout)
+        except requests.RequestException:
+            with self._stats_lock:
+                self._errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self._requests += 1
+                self._latency_total += elapsed
+                self._latency_max = max(self._latency_max, elapsed)
+    
+    def stats(self) -> Dict:
+        """
+        Messaging APIへのリクエストの統計情報を取得
+        
+        Returns:
+            Dict: リクエスト数・エラー数・平均と最大の所要時間（ミリ秒）・新規接続数・接続の再利用数
+        """
+        # urllib3の接続プールが新規接続数とリクエスト数を数えている
+        pools = self.session.get_adapter('https://').poolmanager.pools
+        connection_pools = [pool for pool in map(pools.get, pools.keys()) if pool is not None]
+        opened = sum(pool.num_connections for pool in connection_pools)
+        pooled_requests = sum(pool.num_requests for pool in connection_pools)
+        with self._stats_lock:
+            return {
+                'requests': self._requests,
+                'errors': self._errors,
+                'avg_ms': round(self._latency_total / self._requests * 1000, 2) if self._requests else 0.0,
+                'max_ms': round(self._latency_max * 1000, 2),
+                'connections_opened': opened,
+                'connections_reused': max(0, pooled_requests - opened),
+                'pool_maxsize': self.pool_maxsize,
+            }
+    
+    def send_text_message(self, text: str, retry_key: Optional[str] = None) -> bool:
         """
         テキストメッセージを送信
         
         Args:
             text: 送信するテキスト
+            retry_key: 再送防止キー（X-Line-Retry-Key）。同じキーでの再送は
+                LINE側で重複として扱われ、メッセージは1回だけ届く
             
         Returns:
-            bool: 送信が成功したかどうか
+            bool: 送信が成功したかどうか（送信済みの場合も含む）
         """
-        headers = {
-            'Authorization': f'Bearer {self.channel_access_token}',
-            'Content-Type': 'application/json'
-        }
+        headers = {}
+        if retry_key:
+            headers['X-Line-Retry-Key'] = retry_key
         
         data = {
             'to': self.user_id,
@@ -63,7 +152,11 @@ class LineNotifier:
         }
         
         try:
-            response = requests.post(self.push_api_url, headers=headers, json=data, timeout=30)
+            response = self._post(self.push_api_url, data, headers)
+            if retry_key and response.status_code == 409:
+                # 同じ再送防止キーのリクエストが受理済み
+                print("✓ LINE通知は送信済みのため再送しませんでした")
+                return True
             response.raise_for_status()
             print("✓ LINE通知を送信しました")
             return True
@@ -123,7 +216,8 @@ class LineNotifier:
     def send_weekly_notification(
         self,
         past_week_movies: List[Dict],
-        next_week_movies: List[Dict]
+        next_week_movies: List[Dict],
+        retry_key: Optional[str] = None
     ) -> bool:
         """
         週次通知を送信（過去1週間と先1週間の映画情報）
@@ -131,12 +225,13 @@ class LineNotifier:
         Args:
             past_week_movies: 過去1週間以内に公開された映画リスト
             next_week_movies: 先1週間以内に公開予定の映画リスト
+            retry_key: 再送防止キー
             
         Returns:
             bool: 送信が成功したかどうか
         """
         message = self._format_weekly_message(past_week_movies, next_week_movies)
-        return self.send_text_message(message)
+        return self.send_text_message(message, retry_key=retry_key)
     
     def _format_weekly_message(
         self,
@@ -210,11 +305,6 @@ class LineNotifier:
         Returns:
             bool: 送信が成功したかどうか
         """
-        headers = {
-            'Authorization': f'Bearer {self.channel_access_token}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
             'replyToken': reply_token,
             'messages': [
@@ -230,7 +320,7 @@ class LineNotifier:
             print(f"  [Reply API] Reply Token: {reply_token[:20]}...")
             print(f"  [Reply API] テキスト長: {len(text)}文字")
             
-            response = requests.post(self.reply_api_url, headers=headers, json=data, timeout=30)
+            response = self._post(self.reply_api_url, data)
             
             print(f"  [Reply API] ステータスコード: {response.status_code}")
             print(f"  [Reply API] レスポンス: {response.text if response.text else '(empty)'}")
@@ -252,13 +342,19 @@ class LineNotifier:
                     pass
             return False
     
-    def reply_movie_info(self, reply_token: str, movies: List[Dict]) -> bool:
+    def reply_movie_info(
+        self,
+        reply_token: str,
+        movies: List[Dict],
+        suggestions: Optional[List[str]] = None
+    ) -> bool:
         """
         映画情報をReply（Quick Reply付き）
         
         Args:
             reply_token: リプライトークン
             movies: 映画情報のリスト
+            suggestions: Quick Replyに追加するタイトルの補完候補
             
         Returns:
             bool: 送信が成功したかどうか
@@ -266,19 +362,65 @@ class LineNotifier:
         print(f"  [reply_movie_info] 映画情報Reply処理開始")
         print(f"  [reply_movie_info] 映画数: {len(movies)}件")
         
+        messages = self.build_movie_info_messages(movies, suggestions)
+        print(f"  [reply_movie_info] メッセージ長: {len(messages[0]['text'])}文字")
+        
+        result = self.reply_messages(reply_token, messages)
+        
+        print(f"  [reply_movie_info] Reply結果: {'成功' if result else '失敗'}")
+        return result
+    
+    def build_movie_info_messages(
+        self,
+        movies: List[Dict],
+        suggestions: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        映画情報のReply用メッセージを作成（Quick Reply付き）
+        
+        送信せずにメッセージオブジェクトだけを作るため、事前に作成して保存しておき
+        reply_messages() でそのまま送信できる。
+        
+        Args:
+            movies: 映画情報のリスト
+            suggestions: Quick Replyに追加するタイトルの補完候補（メインメニューの前に並べる）
+            
+        Returns:
+            List[Dict]: Messaging APIのメッセージオブジェクトのリスト
+        """
         if not movies:
             message = "該当する映画が見つかりませんでした。"
         else:
             message = self._format_search_result_message(movies)
         
-        print(f"  [reply_movie_info] メッセージ長: {len(message)}文字")
-        
-        # Quick Replyを追加
+        # Quick Replyを追加（補完候補がある場合は先頭に並べ、Quick Replyの上限13件に収める）
         quick_reply_items = self._get_main_menu_quick_reply_items()
-        result = self.reply_text_message_with_quick_reply(reply_token, message, quick_reply_items)
+        if suggestions:
+            quick_reply_items = (
+                self._get_title_suggestion_quick_reply_items(suggestions) + quick_reply_items
+            )[:13]
+        return [self.build_text_message(message, quick_reply_items)]
+    
+    def build_text_message(self, text: str, quick_reply_items: Optional[List[Dict]] = None) -> Dict:
+        """
+        テキストメッセージのオブジェクトを作成
         
-        print(f"  [reply_movie_info] Reply結果: {'成功' if result else '失敗'}")
-        return result
+        Args:
+            text: 送信するテキスト
+            quick_reply_items: Quick Replyアイテムのリスト（Noneの場合は付けない）
+            
+        Returns:
+            Dict: Messaging APIのメッセージオブジェクト
+        """
+        message = {
+            'type': 'text',
+            'text': text
+        }
+        if quick_reply_items:
+            message['quickReply'] = {
+                'items': quick_reply_items
+            }
+        return message
     
     def _format_search_result_message(self, movies: List[Dict]) -> str:
         """
@@ -338,18 +480,23 @@ class LineNotifier:
         
         return signature == expected_signature
     
-    def send_weekly_new_movies_notification(self, movies: List[Dict]) -> bool:
+    def send_weekly_new_movies_notification(
+        self,
+        movies: List[Dict],
+        retry_key: Optional[str] = None
+    ) -> bool:
         """
         今週公開映画の週次通知を送信
         
         Args:
             movies: 今週公開の映画リスト
+            retry_key: 再送防止キー
             
         Returns:
             bool: 送信が成功したかどうか
         """
         message = self._format_weekly_new_movies_message(movies)
-        return self.send_text_message(message)
+        return self.send_text_message(message, retry_key=retry_key)
     
     def _format_weekly_new_movies_message(self, movies: List[Dict]) -> str:
         """
@@ -383,18 +530,23 @@ class LineNotifier:
         
         return "\n".join(lines)
     
-    def send_weekly_now_showing_notification(self, movies: List[Dict]) -> bool:
+    def send_weekly_now_showing_notification(
+        self,
+        movies: List[Dict],
+        retry_key: Optional[str] = None
+    ) -> bool:
         """
         上映中映画の週次通知を送信
         
         Args:
             movies: 上映中の映画リスト
+            retry_key: 再送防止キー
             
         Returns:
             bool: 送信が成功したかどうか
         """
         message = self._format_weekly_now_showing_message(movies)
-        return self.send_text_message(message)
+        return self.send_text_message(message, retry_key=retry_key)
     
     def _format_weekly_now_showing_message(self, movies: List[Dict]) -> str:
         """
@@ -456,11 +608,6 @@ class LineNotifier:
         theater_search = TheaterSearchManager()
         search_url = theater_search.generate_google_search_url(theater_name)
         
-        headers = {
-            'Authorization': f'Bearer {self.channel_access_token}',
-            'Content-Type': 'application/json'
-        }
-        
         # ボタンテンプレートメッセージ
         data = {
             'replyToken': reply_token,
@@ -484,7 +631,7 @@ class LineNotifier:
         }
         
         try:
-            response = requests.post(self.reply_api_url, headers=headers, json=data, timeout=30)
+            response = self._post(self.reply_api_url, data)
             response.raise_for_status()
             print("✓ 映画館検索結果をReplyしました")
             return True
@@ -535,42 +682,44 @@ class LineNotifier:
         Returns:
             bool: 送信が成功したかどうか
         """
-        headers = {
-            'Authorization': f'Bearer {self.channel_access_token}',
-            'Content-Type': 'application/json'
-        }
+        print(f"  [Reply API] Quick Reply付きReplyを送信中...")
+        print(f"  [Reply API] テキスト長: {len(text)}文字")
+        print(f"  [Reply API] Quick Replyアイテム数: {len(quick_reply_items)}")
+        
+        return self.reply_messages(reply_token, [self.build_text_message(text, quick_reply_items)])
+    
+    def reply_messages(self, reply_token: str, messages: List[Dict]) -> bool:
+        """
+        作成済みのメッセージオブジェクトをReply
         
+        Args:
+            reply_token: リプライトークン
+            messages: Messaging APIのメッセージオブジェクトのリスト（最大5件）
+            
+        Returns:
+            bool: 送信が成功したかどうか
+        """
         data = {
             'replyToken': reply_token,
-            'messages': [
-                {
-                    'type': 'text',
-                    'text': text,
-                    'quickReply': {
-                        'items': quick_reply_items
-                    }
-                }
-            ]
+            'messages': messages
         }
         
         try:
-            print(f"  [Reply API] Quick Reply付きReplyを送信中...")
             print(f"  [Reply API] Reply Token: {reply_token[:20]}...")
-            print(f"  [Reply API] テキスト長: {len(text)}文字")
-            print(f"  [Reply API] Quick Replyアイテム数: {len(quick_reply_items)}")
+            print(f"  [Reply API] メッセージ数: {len(messages)}")
             print(f"  [Reply API] URL: {self.reply_api_url}")
             
-            response = requests.post(self.reply_api_url, headers=headers, json=data, timeout=30)
+            response = self._post(self.reply_api_url, data)
             
             print(f"  [Reply API] ステータスコード: {response.status_code}")
             print(f"  [Reply API] レスポンス: {response.text if response.text else '(empty)'}")
             
             response.raise_for_status()
-            print("  [Reply API] ✓ Quick Reply付きLINE Replyを送信しました")
+            print("  [Reply API] ✓ LINE Replyを送信しました")
             return True
             
         except requests.RequestException as e:
-            print(f"  [Reply API] ❌ エラー: Quick Reply付きLINE Replyの送信に失敗")
+            print(f"  [Reply API] ❌ エラー: LINE Replyの送信に失敗")
             print(f"  [Reply API] エラー詳細: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 print(f"  [Reply API] ステータスコード: {e.response.status_code}")
@@ -584,6 +733,31 @@ class LineNotifier:
             traceback.print_exc()
             return False
     
+    def _get_title_suggestion_quick_reply_items(self, titles: List[str]) -> List[Dict]:
+        """
+        タイトルの補完候補のQuick Replyアイテムを取得
+        
+        ボタンを押すとタイトル全体がメッセージとして送信される。
+        
+        Args:
+            titles: 補完候補のタイトルのリスト
+            
+        Returns:
+            List[Dict]: Quick Replyアイテムのリスト
+        """
+        # labelは最大20文字、Quick Replyは最大13件
+        return [
+            {
+                'type': 'action',
+                'action': {
+                    'type': 'message',
+                    'label': title if len(title) <= 20 else title[:19] + '…',
+                    'text': title[:300]
+                }
+            }
+            for title in titles[:13]
+        ]
+    
     def _get_main_menu_quick_reply_items(self) -> List[Dict]:
         """
         メインメニューのQuick Replyアイテムを取得
@@ -645,6 +819,30 @@ class LineNotifier:
         return self.send_text_message(test_message)
 
 
+_shared_notifier: Optional[LineNotifier] = None
+_shared_lock = threading.Lock()
+
+
+def get_line_notifier() -> LineNotifier:
+    """
+    プロセス内で共有するLineNotifierを取得
+    
+    Webhookのリクエストごとに作り直さず、環境変数の読み込みと
+    api.line.me への接続（TLSハンドシェイク）をプロセス内で使い回す。
+    
+    Returns:
+        LineNotifier: 共有インスタンス
+    
+    Raises:
+        ValueError: 必要な環境変数が設定されていない場合
+    """
+    global _shared_notifier
+    with _shared_lock:
+        if _shared_notifier is None:
+            _shared_notifier = LineNotifier()
+        return _shared_notifier
+
+
 def test_notifier():
     """通知機能のテスト"""
     print("LINE通知機能のテスト...\n")
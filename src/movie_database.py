@@ -0,0 +1,323 @@
+"""映画情報をSQLiteに保存するモジュール（MovieStorage のSQLiteバックエンド）"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from data_paths import get_data_dir
+from scraper import parse_release_date
+
+
+def extract_movie_id(movie: Dict) -> str:
+    """
+    映画情報から一意なIDを取得
+    
+    Args:
+        movie: 映画情報
+    
+    Returns:
+        str: 映画.comの作品ID（URLから取得できない場合はURL、URLも無い場合はタイトル）
+    """
+    url = movie.get('url') or ''
+    match = re.search(r'/movie/(\d+)', url)
+    if match:
+        return match.group(1)
+    return url or f"title:{movie.get('title', '')}"
+
+
+class MovieDatabase:
+    """映画情報をSQLiteで管理するクラス
+    
+    - 作品ID（主キー）・URL・タイトル・公開日（ISO形式）にインデックスを張る
+    - 保存は作品IDでのUPSERTで、内容が変わっていない行は書き換えない
+    - 保存した一覧に含まれない行は削除する（JSON保存と同じく最新の一覧を保持する）
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS movies (
+            movie_id TEXT PRIMARY KEY,
+            url TEXT,
+            title TEXT NOT NULL,
+            release_date TEXT,
+            release_on TEXT,
+            position INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_movies_url ON movies(url);
+        CREATE INDEX IF NOT EXISTS idx_movies_title ON movies(title);
+        CREATE INDEX IF NOT EXISTS idx_movies_release_on ON movies(release_on);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    
+    def __init__(self, db_file: Optional[str] = None):
+        """
+        初期化
+        
+        Args:
+            db_file: データベースファイルのパス（Noneの場合は data/movies.db）
+        """
+        self.db_file = Path(db_file) if db_file else get_data_dir("movies.db")
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """接続を開き、終了時にコミットして閉じる"""
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _content_hash(movie: Dict) -> str:
+        """取得時刻を除いた内容のハッシュ（変更検知用）"""
+        content = {k: v for k, v in movie.items() if k != 'scraped_at'}
+        return hashlib.sha256(
+            json.dumps(content, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+    
+    def upsert_movies(self, movies: List[Dict], replace: bool = True) -> Dict[str, int]:
+        """
+        映画情報を保存（作品IDでUPSERT）
+        
+        Args:
+            movies: 映画情報のリスト
+            replace: Trueの場合、一覧に含まれない行を削除する
+        
+        Returns:
+            Dict[str, int]: 追加・更新・変更なし・削除の件数
+        """
+        now = datetime.now().isoformat()
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        
+        with self._write_lock, self._connect() as conn:
+            existing = {
+                row['movie_id']: row['content_hash']
+                for row in conn.execute("SELECT movie_id, content_hash FROM movies")
+            }
+            
+            seen = set()
+            for position, movie in enumerate(movies):
+                movie_id = extract_movie_id(movie)
+                if movie_id in seen:
+                    continue
+                seen.add(movie_id)
+                
+                content_hash = self._content_hash(movie)
+                if existing.get(movie_id) == content_hash:
+                    # 内容が同じ行は並び順だけ更新する
+                    conn.execute(
+                        "UPDATE movies SET position = ? WHERE movie_id = ? AND position != ?",
+                        (position, movie_id, position)
+                    )
+                    counts['unchanged'] += 1
+                    continue
+                
+                release_on = parse_release_date(movie.get('release_date', ''))
+                conn.execute(
+                    """
+                    INSERT INTO movies
+                        (movie_id, url, title, release_date, release_on, position,
+                         content_hash, data, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(movie_id) DO UPDATE SET
+                        url = excluded.url,
+                        title = excluded.title,
+                        release_date = excluded.release_date,
+                        release_on = excluded.release_on,
+                        position = excluded.position,
+                        content_hash = excluded.content_hash,
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                    """,
+                    (
+                        movie_id,
+                        movie.get('url'),
+                        movie.get('title', ''),
+                        movie.get('release_date'),
+                        release_on.date().isoformat() if release_on else None,
+                        position,
+                        content_hash,
+                        json.dumps(movie, ensure_ascii=False),
+                        now,
+                    )
+                )
+                counts['updated' if movie_id in existing else 'inserted'] += 1
+            
+            if replace:
+                stale = [movie_id for movie_id in existing if movie_id not in seen]
+                conn.executemany("DELETE FROM movies WHERE movie_id = ?", [(m,) for m in stale])
+                counts['deleted'] = len(stale)
+            
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)",
+                (now,)
+            )
+        
+        return counts
+    
+    def load_all(self) -> Optional[Dict]:
+        """
+        保存されている映画情報をすべて読み込み
+        
+        Returns:
+            Dict: 映画情報（updated_at, count, moviesを含む）。1度も保存していない場合はNone
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'updated_at'").fetchone()
+            if row is None:
+                return None
+            movies = [
+                json.loads(r['data'])
+                for r in conn.execute("SELECT data FROM movies ORDER BY position")
+            ]
+        return {'updated_at': row['value'], 'count': len(movies), 'movies': movies}
+    
+    def updated_at(self) -> Optional[str]:
+        """
+        最終保存時刻を取得
+        
+        Returns:
+            str: ISO形式の最終保存時刻、1度も保存していない場合はNone
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'updated_at'").fetchone()
+        return row['value'] if row else None
+    
+    def titles(self) -> set:
+        """
+        映画タイトルのセットを取得
+        
+        Returns:
+            set: 映画タイトルのセット
+        """
+        with self._connect() as conn:
+            return {row['title'] for row in conn.execute("SELECT title FROM movies")}
+    
+    def count(self) -> int:
+        """保存されている映画の件数"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+    
+    def find_by_id(self, movie_id: str) -> Optional[Dict]:
+        """
+        作品IDで映画を取得
+        
+        Args:
+            movie_id: 作品ID
+        
+        Returns:
+            Dict: 映画情報、見つからない場合はNone
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM movies WHERE movie_id = ?", (movie_id,)).fetchone()
+        return json.loads(row['data']) if row else None
+    
+    def find_by_url(self, url: str) -> Optional[Dict]:
+        """
+        URLで映画を取得
+        
+        Args:
+            url: 映画の詳細ページURL
+        
+        Returns:
+            Dict: 映画情報、見つからない場合はNone
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM movies WHERE url = ?", (url,)).fetchone()
+        return json.loads(row['data']) if row else None
+    
+    def find_by_title(self, title: str, prefix: bool = False, limit: int = 20) -> List[Dict]:
+        """
+        タイトルで映画を検索（インデックスを使う完全一致・前方一致）
+        
+        Args:
+            title: タイトル
+            prefix: Trueの場合は前方一致
+            limit: 最大件数
+        
+        Returns:
+            List[Dict]: 映画情報のリスト
+        """
+        with self._connect() as conn:
+            if prefix:
+                # LIKE は大文字小文字を無視する照合でインデックスを使えないため範囲検索にする
+                rows = conn.execute(
+                    "SELECT data FROM movies WHERE title >= ? AND title < ? ORDER BY title LIMIT ?",
+                    (title, title + '\U0010ffff', limit)
+                )
+            else:
+                rows = conn.execute(
+                    "SELECT data FROM movies WHERE title = ? LIMIT ?",
+                    (title, limit)
+                )
+            return [json.loads(row['data']) for row in rows]
+    
+    def find_by_release_date(self, start: date, end: date) -> List[Dict]:
+        """
+        公開日の範囲で映画を検索
+        
+        Args:
+            start: 開始日（含む）
+            end: 終了日（含む）
+        
+        Returns:
+            List[Dict]: 公開日順の映画情報のリスト
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM movies WHERE release_on BETWEEN ? AND ? ORDER BY release_on, position",
+                (start.isoformat(), end.isoformat())
+            )
+            return [json.loads(row['data']) for row in rows]
+
+
+def test_movie_database():
+    """SQLiteバックエンドのテスト"""
+    import tempfile
+    
+    print("SQLiteバックエンドのテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = MovieDatabase(f"{tmp_dir}/movies.db")
+        movies = [
+            {'title': 'テスト映画1', 'url': 'https://eiga.com/movie/12345/', 'release_date': '10月10日'},
+            {'title': 'テスト映画2', 'url': 'https://eiga.com/movie/12346/', 'release_date': '10月11日'},
+        ]
+        
+        print("1. 初回保存")
+        print(f"   {db.upsert_movies(movies)}")
+        
+        print("\n2. 1件変更・1件追加して保存")
+        movies[0] = dict(movies[0], theater_count=300)
+        movies.append({'title': '別の映画', 'url': 'https://eiga.com/movie/12347/', 'release_date': '未定'})
+        print(f"   {db.upsert_movies(movies)}")
+        
+        print("\n3. 検索")
+        print(f"   作品ID: {db.find_by_id('12345')}")
+        print(f"   前方一致: {[m['title'] for m in db.find_by_title('テスト', prefix=True)]}")
+        release_on = parse_release_date('10月10日').date()
+        print(f"   公開日: {[m['title'] for m in db.find_by_release_date(release_on, release_on)]}")
+        print(f"   件数: {db.count()}")
+
+
+if __name__ == "__main__":
+    test_movie_database()
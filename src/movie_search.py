@@ -0,0 +1,249 @@
+"""映画検索（保存済みデータを優先し、足りない場合だけ映画.comを検索する）"""
+
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
+
+from async_scraper import get_shared_async_scraper, submit
+from movie_database import extract_movie_id
+from storage import MovieStorage
+from text_normalize import normalize_text
+
+
+def _richness(movie: Dict) -> int:
+    """映画情報のうち値が入っている項目の数"""
+    return sum(1 for value in movie.values() if value not in (None, '', [], {}))
+
+
+def merge_search_results(*sources: List[Dict]) -> List[Dict]:
+    """
+    複数の検索結果を作品ID（映画.comのURL）で重複排除して結合
+    
+    先に渡した結果の順序を優先し、同じ作品が複数の結果にある場合は
+    項目の多い方（上映館数などを持つ方）を残して、足りない項目をもう一方から補う。
+    ハッシュで照合するため、件数の合計に対して線形時間で結合できる。
+    
+    Args:
+        *sources: 検索結果のリスト（優先度の高い順）
+    
+    Returns:
+        List[Dict]: 結合した映画情報のリスト
+    """
+    merged: Dict[str, Dict] = {}
+    for movies in sources:
+        for movie in movies:
+            movie_id = extract_movie_id(movie)
+            existing = merged.get(movie_id)
+            if existing is None:
+                merged[movie_id] = movie
+                continue
+            
+            richer, poorer = (movie, existing) if _richness(movie) > _richness(existing) else (existing, movie)
+            combined = dict(richer)
+            for key, value in poorer.items():
+                if combined.get(key) in (None, '', [], {}):
+                    combined[key] = value
+            # 最初に出現した位置を保ったまま置き換える
+            merged[movie_id] = combined
+    return list(merged.values())
+
+
+class TieredMovieSearch:
+    """ローカルの検索インデックス -> 映画.com の順に検索するクラス
+    
+    - local: 保存済みデータの検索インデックスだけで答える
+    - remote: 常に映画.comを検索し、保存済みデータの結果を後ろに足す（従来の動作）
+    - tiered: 確度の高いローカルの一致が十分ある場合は映画.comに問い合わせない。
+      足りない場合は映画.comを検索するが、待ち時間の上限を超えたらローカルの結果で返す
+    """
+    
+    MODES = ('tiered', 'local', 'remote')
+    
+    # 部分一致以上（スコア2以上）を確度の高い一致とみなす
+    CONFIDENT_SCORE = 2.0
+    # 完全一致（スコア4）があればその1件で十分とみなす
+    EXACT_SCORE = 4.0
+    # 誤字を許容した一致のうち、誤字がクエリの2割以下のもの（タイトルの打ち間違い）も1件で十分とみなす
+    TYPO_SCORE = 0.8
+    
+    # Quick Replyで提示する補完候補の最大数（LINEのQuick Replyは最大13件）
+    SUGGESTION_LIMIT = 5
+    
+    DEFAULT_MIN_LOCAL_HITS = 3
+    DEFAULT_REMOTE_BUDGET = 3.0
+    
+    def __init__(
+        self,
+        storage: Optional[MovieStorage] = None,
+        mode: Optional[str] = None,
+        min_local_hits: Optional[int] = None,
+        remote_budget: Optional[float] = None,
+        limit: int = 10
+    ):
+        """
+        初期化
+        
+        Args:
+            storage: 保存済みデータ（Noneの場合はデフォルトのMovieStorage）
+            mode: 検索モード（Noneの場合は環境変数 MOVIE_SEARCH_MODE、デフォルト tiered）
+            min_local_hits: 映画.comを検索せずに返すのに必要な確度の高い一致の件数
+                （Noneの場合は環境変数 MOVIE_SEARCH_MIN_LOCAL_HITS）
+            remote_budget: 映画.comの検索を待つ最大秒数
+                （Noneの場合は環境変数 MOVIE_SEARCH_REMOTE_BUDGET）
+            limit: ローカル検索の最大件数
+        """
+        self.storage = storage or MovieStorage()
+        self.mode = mode or os.getenv('MOVIE_SEARCH_MODE', 'tiered')
+        if self.mode not in self.MODES:
+            raise ValueError(f"不明な検索モードです: {self.mode}（{', '.join(self.MODES)} のいずれか）")
+        
+        if min_local_hits is None:
+            min_local_hits = int(os.getenv('MOVIE_SEARCH_MIN_LOCAL_HITS', str(self.DEFAULT_MIN_LOCAL_HITS)))
+        if remote_budget is None:
+            remote_budget = float(os.getenv('MOVIE_SEARCH_REMOTE_BUDGET', str(self.DEFAULT_REMOTE_BUDGET)))
+        self.min_local_hits = min_local_hits
+        self.remote_budget = remote_budget
+        self.limit = limit
+        
+        self._lock = threading.Lock()
+        self._counts = {'local': 0, 'remote': 0, 'timeout': 0}
+        self._latencies: Dict[str, float] = {'local': 0.0, 'remote': 0.0, 'timeout': 0.0}
+    
+    def is_confident(self, scored: List) -> bool:
+        """
+        ローカルの結果だけで答えられるかを判定
+        
+        Args:
+            scored: ローカル検索の（映画情報, スコア）のリスト
+        
+        Returns:
+            bool: 完全一致・打ち間違いの一致がある、または確度の高い一致が十分ある場合True
+        """
+        if scored:
+            top_score = scored[0][1]
+            if top_score >= self.EXACT_SCORE or self.TYPO_SCORE <= top_score < self.CONFIDENT_SCORE:
+                return True
+        confident = [movie for movie, score in scored if score >= self.CONFIDENT_SCORE]
+        return len(confident) >= self.min_local_hits
+    
+    def suggest_titles(self, query: str) -> List[str]:
+        """
+        入力途中のタイトルの補完候補を取得（映画.comには問い合わせない）
+        
+        候補が1件以下の場合と、入力がタイトルと完全に一致する場合は
+        補完の必要がないため空のリストを返す。
+        
+        Args:
+            query: 入力途中のタイトル
+        
+        Returns:
+            List[str]: 補完候補のタイトルのリスト
+        """
+        completions = self.storage.complete_titles(query, limit=self.SUGGESTION_LIMIT)
+        if len(completions) < 2 or normalize_text(completions[0]['title']) == normalize_text(query):
+            return []
+        return [movie['title'] for movie in completions]
+    
+    def search(self, query: str) -> List[Dict]:
+        """
+        映画を検索
+        
+        Args:
+            query: 検索クエリ
+        
+        Returns:
+            List[Dict]: 映画情報のリスト（映画.comの結果、保存済みデータの結果の順）
+        """
+        start = time.perf_counter()
+        scored = self.storage.search_index().search_with_scores(query, limit=self.limit)
+        local_results = [movie for movie, _ in scored]
+        
+        if self.mode == 'local' or (self.mode == 'tiered' and self.is_confident(scored)):
+            print(f"✓ 保存済みデータで回答します: {len(local_results)}件")
+            self._record('local', start)
+            return local_results
+        
+        # 映画.comを検索（共有イベントループで実行し、待ち時間に上限を設ける）
+        scraper = get_shared_async_scraper()
+        future = submit(scraper.search_movie_by_keyword(query))
+        try:
+            remote_results = future.result(self.remote_budget if self.mode == 'tiered' else None)
+        except FutureTimeoutError:
+            # 検索自体は続行させ、HTTPキャッシュに残して次回の検索に使う
+            print(f"⚠️  映画.comの検索が{self.remote_budget}秒以内に終わらなかったため、"
+                  f"保存済みデータの結果で回答します: {len(local_results)}件")
+            self._record('timeout', start)
+            return local_results
+        
+        results = merge_search_results(remote_results, local_results)
+        
+        self._record('remote', start)
+        return results
+    
+    def _record(self, source: str, start: float) -> None:
+        """回答元ごとの件数と所要時間を記録"""
+        with self._lock:
+            self._counts[source] += 1
+            self._latencies[source] += time.perf_counter() - start
+    
+    def stats(self) -> Dict[str, Dict]:
+        """
+        回答元ごとの統計情報を取得
+        
+        Returns:
+            Dict[str, Dict]: 回答元 -> 件数・平均所要時間（ミリ秒）
+        """
+        with self._lock:
+            return {
+                source: {
+                    'count': count,
+                    'avg_ms': round(self._latencies[source] / count * 1000, 2) if count else 0.0,
+                }
+                for source, count in self._counts.items()
+            }
+
+
+_shared_search: Optional[TieredMovieSearch] = None
+_shared_lock = threading.Lock()
+
+
+def get_movie_search() -> TieredMovieSearch:
+    """
+    プロセス内で共有するTieredMovieSearchを取得
+    
+    Returns:
+        TieredMovieSearch: 共有インスタンス
+    """
+    global _shared_search
+    with _shared_lock:
+        if _shared_search is None:
+            _shared_search = TieredMovieSearch()
+        return _shared_search
+
+
+def test_movie_search():
+    """映画検索のテスト"""
+    import tempfile
+    
+    print("映画検索のテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = MovieStorage(tmp_dir, backend='json')
+        storage.save_movies([
+            {'title': '名探偵コナン 100万ドルの五稜星', 'url': 'https://eiga.com/movie/1/'},
+            {'title': '名探偵コナン 黒鉄の魚影', 'url': 'https://eiga.com/movie/2/'},
+            {'title': '名探偵コナン ハロウィンの花嫁', 'url': 'https://eiga.com/movie/3/'},
+        ])
+        search = TieredMovieSearch(storage=storage, mode='tiered', remote_budget=2.0)
+        
+        for query in ['名探偵コナン', '名探偵コナン 黒鉄の魚影', '存在しない映画']:
+            results = search.search(query)
+            print(f"'{query}': {[movie['title'] for movie in results]}\n")
+        
+        print(f"統計: {search.stats()}")
+
+
+if __name__ == "__main__":
+    test_movie_search()
@@ -0,0 +1,283 @@
+"""HTMLのパース結果をキャッシュするモジュール"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from data_paths import get_data_dir
+
+# Noneはメモリのみを表すため、デフォルトの保存先はインポート時に解決する
+DEFAULT_CACHE_DIR = str(get_data_dir("parse_cache"))
+
+
+class ParseCache:
+    """レスポンス本文のハッシュをキーにパース結果を保持するキャッシュ"""
+    
+    DEFAULT_MAX_ENTRIES = 256
+    # ディスクの古いエントリを削除する間隔（保存件数）
+    EVICT_INTERVAL = 32
+    
+    def __init__(
+        self,
+        parser_version: str,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        """
+        初期化
+        
+        Args:
+            parser_version: パーサーのバージョン。変わると既存のキャッシュは無効になる
+            cache_dir: キャッシュを保存するディレクトリ（Noneの場合はメモリのみ）
+            max_entries: メモリ・ディスクそれぞれに保持する最大件数
+                （ディスクは EVICT_INTERVAL 件の保存ごとに削除するため、一時的に超えることがある）
+        """
+        self.parser_version = parser_version
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_entries = max_entries
+        
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_evict = 0
+    
+    def _key(self, kind: str, html: str) -> str:
+        """
+        キャッシュキーを作成
+        
+        Args:
+            kind: ページの種類（'upcoming', 'now_showing', 'search' など）
+            html: レスポンス本文
+        
+        Returns:
+            str: パーサーバージョン・種類・本文から求めたハッシュ
+        """
+        digest = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        return f"{kind}-{self.parser_version}-{digest}"
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+    
+    def get(self, kind: str, html: str) -> Optional[List[Dict]]:
+        """
+        パース結果を取得
+        
+        Args:
+            kind: ページの種類
+            html: レスポンス本文
+        
+        Returns:
+            List[Dict]: パース結果のコピー、キャッシュがない場合はNone
+        """
+        key = self._key(kind, html)
+        
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(self._memory[key])
+        
+        movies = self._read_disk(key)
+        
+        with self._lock:
+            if movies is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, movies)
+            return copy.deepcopy(movies)
+    
+    def put(self, kind: str, html: str, movies: List[Dict]) -> None:
+        """
+        パース結果を保存
+        
+        Args:
+            kind: ページの種類
+            html: レスポンス本文
+            movies: パース結果
+        """
+        key = self._key(kind, html)
+        movies = copy.deepcopy(movies)
+        
+        with self._lock:
+            self._remember(key, movies)
+        
+        self._write_disk(key, movies)
+    
+    def _remember(self, key: str, movies: List[Dict]) -> None:
+        """メモリ上のLRUに追加（ロック取得済みで呼ぶこと）"""
+        self._memory[key] = movies
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def _read_disk(self, key: str) -> Optional[List[Dict]]:
+        """
+        ディスクからパース結果を読み込み
+        
+        Args:
+            key: キャッシュキー
+        
+        Returns:
+            List[Dict]: パース結果、存在しない場合はNone
+        """
+        if not self.cache_dir:
+            return None
+        
+        path = self._path(key)
+        if not path.exists():
+            return None
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('parser_version') != self.parser_version:
+                return None
+            return data['movies']
+        except Exception as e:
+            print(f"警告: パースキャッシュの読み込みに失敗 - {e}")
+            return None
+    
+    def _write_disk(self, key: str, movies: List[Dict]) -> None:
+        """
+        パース結果をディスクに保存し、古いエントリを削除
+        
+        Args:
+            key: キャッシュキー
+            movies: パース結果
+        """
+        if not self.cache_dir:
+            return
+        
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'parser_version': self.parser_version, 'movies': movies}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"警告: パースキャッシュの保存に失敗 - {e}")
+            return
+        
+        # ディレクトリの走査は件数に比例するため、一定件数の保存ごとにまとめて削除する
+        with self._lock:
+            self._writes_since_evict += 1
+            evict = self._writes_since_evict >= self.EVICT_INTERVAL
+            if evict:
+                self._writes_since_evict = 0
+        if evict:
+            self._evict_disk()
+    
+    def _evict_disk(self) -> int:
+        """
+        最大件数を超えた分を更新日時の古い順に削除
+        
+        他のプロセス・スレッドが同時に削除・置き換えしたファイルは無視する。
+        
+        Returns:
+            int: 削除した件数
+        """
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith('.json'):
+                        continue
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"警告: パースキャッシュの整理に失敗 - {e}")
+            return 0
+        
+        if len(entries) <= self.max_entries:
+            return 0
+        
+        entries.sort()
+        deleted = 0
+        for _, old_path in entries[:-self.max_entries]:
+            try:
+                os.unlink(old_path)
+                deleted += 1
+            except OSError:
+                pass
+        return deleted
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        キャッシュの統計情報を取得
+        
+        Returns:
+            Dict[str, int]: ヒット数・ミス数・メモリ上のエントリ数
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._memory),
+            }
+
+
+_shared_caches: Dict[tuple, ParseCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_parse_cache(parser_version: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> ParseCache:
+    """
+    プロセス内で共有するParseCacheを取得
+    
+    Webhookのようにリクエストごとにスクレイパーを作る場合でも
+    メモリ上のキャッシュを使い回せるようにする。
+    
+    Args:
+        parser_version: パーサーのバージョン
+        cache_dir: キャッシュを保存するディレクトリ
+    
+    Returns:
+        ParseCache: 共有インスタンス
+    """
+    key = (parser_version, cache_dir)
+    with _shared_caches_lock:
+        if key not in _shared_caches:
+            _shared_caches[key] = ParseCache(parser_version, cache_dir)
+        return _shared_caches[key]
+
+
+def test_parse_cache():
+    """パースキャッシュのテスト"""
+    import tempfile
+    
+    print("パースキャッシュのテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        html = "<ul class='slide-menu'><li>テスト</li></ul>"
+        movies = [{'title': 'テスト映画', 'url': 'https://eiga.com/movie/1/'}]
+        
+        cache = ParseCache("1", tmp_dir)
+        print(f"1. 保存前の取得: {cache.get('upcoming', html)}")
+        
+        cache.put('upcoming', html, movies)
+        print(f"2. 保存後の取得: {cache.get('upcoming', html)}")
+        
+        disk_cache = ParseCache("1", tmp_dir)
+        print(f"3. ディスクからの取得: {disk_cache.get('upcoming', html)}")
+        
+        new_version_cache = ParseCache("2", tmp_dir)
+        print(f"4. バージョン変更後の取得: {new_version_cache.get('upcoming', html)}")
+        
+        print(f"\n統計: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    test_parse_cache()
@@ -0,0 +1,523 @@
+"""映画情報の取得から通知までをまとめて行うバッチパイプライン
+
+fetch → parse → enrich → persist → notify の順にステージを実行する。
+各ページは1回の実行につき1回だけ取得・パースし、
+すべての通知はメモリ上で共有する結果から作成する。
+
+GitHub Actions 上（または PIPELINE_RUN_ID 指定時）はステージごとに
+チェックポイントを保存し、同じ実行の再実行では完了済みのステージを飛ばして再開する。
+
+使い方:
+    python src/pipeline.py                                   # 日次通知
+    python src/pipeline.py weekly_new weekly_now_showing     # 週次通知
+"""
+
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from checkpoint import Checkpoint, create_checkpoint
+from line_notifier import LineNotifier
+from reply_snapshot import ReplySnapshotStore, build_reply_messages
+from resilience import CircuitOpenError, get_circuit_breaker_stats
+from scraper import MovieScraper
+from storage import MovieStorage
+
+
+def report_stage_timings(stage_timings: Dict[str, float]) -> None:
+    """
+    ステージごとの処理時間を出力
+    
+    GitHub Actions上で実行されている場合はジョブサマリーにも書き出す。
+    
+    Args:
+        stage_timings: ステージ名と所要時間（秒）の辞書
+    """
+    if not stage_timings:
+        return
+    
+    print("--- 処理時間 ---")
+    for stage, seconds in stage_timings.items():
+        print(f"  {stage}: {seconds:.2f}秒")
+    print()
+    
+    summary_file = os.getenv('GITHUB_STEP_SUMMARY')
+    if summary_file:
+        with open(summary_file, 'a', encoding='utf-8') as f:
+            f.write("### 処理時間\n\n")
+            f.write("| ステージ | 所要時間（秒） |\n")
+            f.write("| --- | ---: |\n")
+            for stage, seconds in stage_timings.items():
+                f.write(f"| {stage} | {seconds:.2f} |\n")
+            f.write("\n")
+
+
+def _theater_info(movie: Dict) -> str:
+    """ログ表示用の上映館数情報"""
+    if movie.get('is_limited_release'):
+        return " ⚠️ 限定公開"
+    if movie.get('theater_count'):
+        return f" ({movie['theater_count']}館)"
+    return ""
+
+
+def _print_movies(heading: str, movies: List[Dict], limit: int, with_theaters: bool = False) -> None:
+    """ログに映画リストを表示"""
+    print(heading)
+    for i, movie in enumerate(movies[:limit], 1):
+        theater_info = _theater_info(movie) if with_theaters else ""
+        print(f"  {i}. {movie['title']} ({movie['release_date']}){theater_info}")
+    if len(movies) > limit:
+        print(f"  ...他 {len(movies) - limit}件")
+    print()
+
+
+class BatchPipeline:
+    """取得・パース・上映館数付与・保存・通知を1回の実行で行うクラス"""
+    
+    STAGES = ('fetch', 'parse', 'enrich', 'persist', 'notify')
+    
+    # 取得元ページ: ページ種類 -> パスとパース関数名
+    SOURCES = {
+        'upcoming': ('/upcoming/', '_parse_upcoming_movies'),
+        'now_showing': ('/now/', '_parse_now_showing_movies'),
+    }
+    
+    # 通知の種類 -> 必要な取得元ページ
+    #   daily: 過去1週間・先1週間の映画（check-movies.yml）
+    #   weekly_new: 今週公開の映画（weekly-notifications.yml）
+    #   weekly_now_showing: 過去1週間以内に公開された上映中の映画（weekly-notifications.yml）
+    NOTIFICATIONS = {
+        'daily': ('now_showing', 'upcoming'),
+        'weekly_new': ('upcoming',),
+        'weekly_now_showing': ('now_showing',),
+    }
+    
+    def __init__(
+        self,
+        notifications: List[str],
+        scraper: Optional[MovieScraper] = None,
+        storage: Optional[MovieStorage] = None,
+        checkpoint: Optional[Checkpoint] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            notifications: 送信する通知の種類（NOTIFICATIONS のキー）
+            scraper: 使用するMovieScraper（Noneの場合は新規作成）
+            storage: 使用するMovieStorage（Noneの場合は新規作成）
+            checkpoint: 進捗を保存するチェックポイント（Noneの場合は保存しない）
+        """
+        unknown = [name for name in notifications if name not in self.NOTIFICATIONS]
+        if unknown:
+            raise ValueError(f"未対応の通知です: {', '.join(unknown)}")
+        
+        self.notifications = list(notifications)
+        self.scraper = scraper or MovieScraper()
+        self.storage = storage
+        self.checkpoint = checkpoint
+        
+        self.sources = [
+            source for source in self.SOURCES
+            if any(source in self.NOTIFICATIONS[name] for name in self.notifications)
+        ]
+        
+        # ステージ間で共有する結果
+        self.pages: Dict[str, str] = {}
+        self.movies: Dict[str, List[Dict]] = {}
+        self.past_week_movies: List[Dict] = []
+        self.next_week_movies: List[Dict] = []
+        self.notification_results: Dict[str, bool] = {}
+        
+        self.stage_timings: Dict[str, float] = {}
+    
+    def run(self) -> Dict[str, bool]:
+        """
+        すべてのステージを順に実行
+        
+        Returns:
+            Dict[str, bool]: 通知の種類 -> 送信できたかどうか
+        """
+        # ここまでのステージがすべて完了しているか（完了済みの復元を含む）
+        upstream_completed = True
+        for i, stage in enumerate(self.STAGES):
+            if upstream_completed and self.checkpoint and self.checkpoint.is_completed(stage):
+                self._restore(stage)
+                print(f"✓ 完了済みのためスキップしました: {stage}")
+                print()
+                continue
+            
+            # 前のステージをやり直した場合、後続の古い結果は使わない
+            if self.checkpoint:
+                invalidated = self.checkpoint.invalidate(list(self.STAGES[i + 1:]))
+                if invalidated:
+                    print(f"ℹ️  {stage} をやり直すため、後続のチェックポイントを取り消しました: "
+                          f"{', '.join(invalidated)}")
+            
+            stage_func: Callable[[], bool] = getattr(self, f"_{stage}")
+            start = time.perf_counter()
+            completed = stage_func()
+            self.stage_timings[stage] = time.perf_counter() - start
+            
+            # 一部が失敗したステージと、入力が揃っていないステージは完了扱いにせず、再実行時にやり直す
+            upstream_completed = upstream_completed and completed
+            if self.checkpoint and upstream_completed:
+                self.checkpoint.complete(stage, self._stage_result(stage))
+        
+        return self.notification_results
+    
+    def _stage_result(self, stage: str) -> Optional[Dict]:
+        """
+        チェックポイントに保存するステージの結果
+        
+        Args:
+            stage: ステージ名
+        
+        Returns:
+            Dict: 再開時に復元する結果（保存するものが無い場合はNone）
+        """
+        if stage == 'parse':
+            return self.movies
+        if stage == 'enrich':
+            return {
+                'past_week_movies': self.past_week_movies,
+                'next_week_movies': self.next_week_movies,
+            }
+        return None
+    
+    def _restore(self, stage: str) -> None:
+        """
+        完了済みステージの結果をチェックポイントから復元
+        
+        Args:
+            stage: ステージ名
+        """
+        if stage == 'fetch':
+            for source in self.sources:
+                html = self.checkpoint.load_page(source)
+                if html is not None:
+                    self.pages[source] = html
+        elif stage == 'parse':
+            self.movies = self.checkpoint.result('parse') or {}
+        elif stage == 'enrich':
+            result = self.checkpoint.result('enrich') or {}
+            self.past_week_movies = result.get('past_week_movies', [])
+            self.next_week_movies = result.get('next_week_movies', [])
+        elif stage == 'notify':
+            self.notification_results = {name: True for name in self.notifications}
+    
+    def _fetch(self) -> bool:
+        """取得元ページを1回ずつ取得"""
+        completed = True
+        for source in self.sources:
+            path, _ = self.SOURCES[source]
+            url = f"{self.scraper.BASE_URL}{path}"
+            print(f"--- ページの取得: {url} ---")
+            try:
+                self.pages[source] = self.scraper._get_html(source, url)
+                if self.checkpoint:
+                    self.checkpoint.save_page(source, self.pages[source])
+            except (requests.RequestException, CircuitOpenError) as e:
+                print(f"エラー: ページの取得に失敗しました - {e}")
+                completed = False
+            print()
+        return completed
+    
+    def _has_sources(self, notification: str) -> bool:
+        """
+        通知に必要な取得元ページをすべてパースできているかを判定
+        
+        Args:
+            notification: 通知の種類
+        
+        Returns:
+            bool: すべてパースできている場合True
+        """
+        return all(source in self.movies for source in self.NOTIFICATIONS[notification])
+    
+    def _parse(self) -> bool:
+        """取得したページを1回ずつパース（取得できなかったページは結果に含めない）"""
+        completed = True
+        for source in self.sources:
+            _, parse_func_name = self.SOURCES[source]
+            html = self.pages.get(source)
+            if html is None:
+                print(f"⚠️  {source}: ページを取得できなかったためパースをスキップしました")
+                completed = False
+                continue
+            parse_func = getattr(self.scraper, parse_func_name)
+            self.movies[source] = self.scraper._parse_html(source, html, parse_func)
+            print(f"✓ {source}: {len(self.movies[source])}件の映画情報をパースしました")
+        print()
+        return completed
+    
+    def _enrich(self) -> bool:
+        """期間で絞り込み、先1週間の映画に上映館数を付与"""
+        completed = all(source in self.movies for source in self.sources)
+        if 'now_showing' in self.movies:
+            self.past_week_movies = self.scraper._filter_released_in_past_week(
+                self.movies['now_showing']
+            )
+            print(f"過去1週間以内に公開された映画: {len(self.past_week_movies)}件")
+        
+        if 'upcoming' in self.movies:
+            self.next_week_movies = self.scraper._filter_coming_in_next_week(
+                self.movies['upcoming']
+            )
+            print(f"先1週間以内に公開予定の映画: {len(self.next_week_movies)}件")
+            
+            # 上映館数を表示するのは日次通知のみ
+            if 'daily' in self.notifications:
+                completed = self._enrich_theater_counts() and completed
+        print()
+        return completed
+    
+    def _enrich_theater_counts(self) -> bool:
+        """
+        先1週間の映画に上映館数を付与（チェックポイントに記録済みの映画は取得しない）
+        
+        Returns:
+            bool: すべての映画の上映館数を取得できた場合True
+        """
+        known_counts = self.checkpoint.theater_counts() if self.checkpoint else {}
+        
+        pending = []
+        for movie in self.next_week_movies:
+            if movie['url'] in known_counts:
+                self.scraper._apply_theater_count(movie, known_counts[movie['url']])
+            else:
+                pending.append(movie)
+        
+        if len(pending) < len(self.next_week_movies):
+            print(f"✓ チェックポイントの上映館数を使用しました: "
+                  f"{len(self.next_week_movies) - len(pending)}件")
+        
+        failed = []
+        
+        def record(movie: Dict, theater_count: Optional[int], error: Optional[Exception]) -> None:
+            # 404など再実行しても変わらない失敗は、公開前で館数が無いページと同じく館数なしとして記録する
+            if error is not None and not self._is_permanent_error(error):
+                failed.append(movie['url'])
+                return
+            if self.checkpoint:
+                self.checkpoint.record_theater_count(movie['url'], theater_count)
+        
+        self.scraper._enrich_theater_counts(pending, on_result=record)
+        if failed:
+            print(f"⚠️  上映館数を取得できなかった映画: {len(failed)}件（再実行時にもう一度取得します）")
+        return not failed
+    
+    @staticmethod
+    def _is_permanent_error(error: Exception) -> bool:
+        """
+        再実行しても結果が変わらない取得エラー（404などリトライ対象外のHTTPエラー）かを判定
+        
+        Args:
+            error: 発生した例外
+        
+        Returns:
+            bool: 再実行しても結果が変わらない場合True
+        """
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return not MovieScraper._classify_error(error)[0]
+        return False
+    
+    def _persist(self) -> bool:
+        """日次通知の対象を検索用に保存し、リッチメニューの応答スナップショットを作成"""
+        success = True
+        if 'daily' in self.notifications:
+            print("--- データの保存 ---")
+            if self._has_sources('daily'):
+                storage = self.storage or MovieStorage()
+                success = storage.save_movies(self.past_week_movies + self.next_week_movies)
+            else:
+                # 一部のページしか取得できていない一覧で、保存済みのデータを上書きしない
+                print("⚠️  取得できなかったページがあるため、データの保存をスキップしました")
+                success = False
+            print()
+        
+        self._save_reply_snapshots()
+        return success
+    
+    def _save_reply_snapshots(self) -> None:
+        """取得した映画一覧から、Webhookがそのまま返す応答メッセージを作成して保存"""
+        # postbackの応答と同じ一覧: 今週公開はupcomingの全件、上映中は過去1週間以内の公開
+        # 取得に失敗して空の場合は、前回のスナップショットを残す
+        snapshots = {}
+        if self.movies.get('upcoming'):
+            snapshots['weekly_new'] = self.movies['upcoming']
+        if self.past_week_movies:
+            snapshots['now_showing'] = self.past_week_movies
+        if not snapshots:
+            return
+        
+        print("--- 応答スナップショットの保存 ---")
+        try:
+            # メッセージの整形に使うだけなので、未設定の環境変数はダミーの値で補う
+            notifier = LineNotifier(
+                channel_access_token=os.getenv('LINE_CHANNEL_ACCESS_TOKEN') or '-',
+                user_id=os.getenv('LINE_USER_ID') or '-'
+            )
+            store = ReplySnapshotStore(self.storage.data_dir if self.storage else None)
+            for name, movies in snapshots.items():
+                store.save(name, build_reply_messages(notifier, name, movies), len(movies))
+        except Exception as e:
+            # スナップショットはWebhookの高速化のためのもので、失敗しても通知は続行する
+            print(f"警告: 応答スナップショットの保存に失敗しました - {e}")
+        print()
+    
+    def _notify(self) -> bool:
+        """各種通知を送信（送信済みの通知は再送しない）"""
+        print("--- LINE通知 ---")
+        if not (os.getenv('LINE_CHANNEL_ACCESS_TOKEN') and os.getenv('LINE_USER_ID')):
+            print("ℹ️  LINE通知は環境変数が設定されていないためスキップされました")
+            print("   以下の環境変数を設定してください:")
+            print("   - LINE_CHANNEL_ACCESS_TOKEN")
+            print("   - LINE_USER_ID")
+            print()
+            return False
+        
+        try:
+            notifier = LineNotifier()
+        except Exception as e:
+            print(f"エラー: LINE通知の初期化に失敗しました - {e}")
+            return False
+        
+        for name in self.notifications:
+            if self.checkpoint and self.checkpoint.is_sent(name):
+                print(f"✓ 送信済みのためスキップしました: {name}")
+                self.notification_results[name] = True
+                continue
+            
+            # 取得できなかったページがある場合は、空の一覧で通知しない
+            if not self._has_sources(name):
+                print(f"エラー: 取得できなかったページがあるため通知しませんでした（{name}）")
+                self.notification_results[name] = False
+                continue
+            
+            # 再送防止キーは送信前に保存し、中断後の再送でも同じキーを使う
+            retry_key = self.checkpoint.retry_key(name) if self.checkpoint else None
+            try:
+                success = getattr(self, f"_notify_{name}")(notifier, retry_key)
+            except Exception as e:
+                print(f"エラー: LINE通知でエラーが発生しました（{name}） - {e}")
+                import traceback
+                traceback.print_exc()
+                success = False
+            
+            self.notification_results[name] = success
+            if success and self.checkpoint:
+                self.checkpoint.mark_sent(name)
+        print()
+        return all(self.notification_results.values())
+    
+    def _notify_daily(self, notifier: LineNotifier, retry_key: Optional[str]) -> bool:
+        """過去1週間・先1週間の映画を通知"""
+        success = notifier.send_weekly_notification(
+            self.past_week_movies,
+            self.next_week_movies,
+            retry_key=retry_key
+        )
+        if not success:
+            print("⚠️  LINE通知の送信に失敗しました")
+            return False
+        
+        print("✓ LINE週次通知を送信しました")
+        print()
+        _print_movies("【過去1週間の映画】", self.past_week_movies, 5)
+        _print_movies("【先1週間の映画】", self.next_week_movies, 5, with_theaters=True)
+        return True
+    
+    def _notify_weekly_new(self, notifier: LineNotifier, retry_key: Optional[str]) -> bool:
+        """今週公開の映画を通知（映画がない場合はスキップ）"""
+        movies = self.movies.get('upcoming', [])
+        if not movies:
+            print("ℹ️  今週公開の映画がないため、通知をスキップします")
+            return True
+        
+        success = notifier.send_weekly_new_movies_notification(movies, retry_key=retry_key)
+        if not success:
+            print("⚠️  今週公開映画の通知送信に失敗しました")
+            return False
+        
+        print("✓ 今週公開映画の通知を送信しました")
+        print()
+        _print_movies("【今週公開の映画】", movies, 10)
+        return True
+    
+    def _notify_weekly_now_showing(self, notifier: LineNotifier, retry_key: Optional[str]) -> bool:
+        """上映中の映画を通知（映画がない場合も情報提供として送信）"""
+        movies = self.past_week_movies
+        if not movies:
+            print("ℹ️  上映中の映画が見つかりませんでした")
+            print("   空の通知を送信します")
+        
+        success = notifier.send_weekly_now_showing_notification(movies, retry_key=retry_key)
+        if not success:
+            print("⚠️  上映中映画の通知送信に失敗しました")
+            return False
+        
+        print("✓ 上映中映画の通知を送信しました")
+        print()
+        if movies:
+            _print_movies("【上映中の映画】", movies, 10, with_theaters=True)
+        else:
+            print("  現在上映中の映画はありません")
+            print()
+        return True
+    
+    def report(self) -> None:
+        """処理時間とキャッシュ・ブレーカーの状態を出力"""
+        report_stage_timings({**self.stage_timings, **self.scraper.stage_timings})
+        
+        if self.scraper.http_cache:
+            print(f"HTTPキャッシュ: {self.scraper.http_cache.stats()}")
+            print()
+        if self.scraper.parse_cache:
+            print(f"パースキャッシュ: {self.scraper.parse_cache.stats()}")
+            print()
+        breaker_stats = get_circuit_breaker_stats()
+        if breaker_stats:
+            print(f"サーキットブレーカー: {breaker_stats}")
+            print()
+
+
+def run_pipeline(notifications: List[str], title: str) -> Dict[str, bool]:
+    """
+    パイプラインを実行して結果を出力
+    
+    Args:
+        notifications: 送信する通知の種類
+        title: ログに表示する処理名
+    
+    Returns:
+        Dict[str, bool]: 通知の種類 -> 送信できたかどうか
+    """
+    print("=" * 60)
+    print(f"{title} - 実行開始")
+    print("=" * 60)
+    print()
+    
+    pipeline = BatchPipeline(notifications, checkpoint=create_checkpoint('_'.join(notifications)))
+    results = pipeline.run()
+    pipeline.report()
+    
+    print("=" * 60)
+    print("処理が完了しました")
+    print("=" * 60)
+    
+    return results
+
+
+def main():
+    """メイン処理（引数で通知の種類を指定、省略時は日次通知）"""
+    notifications = sys.argv[1:] or ['daily']
+    run_pipeline(notifications, f"映画情報バッチ（{', '.join(notifications)}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+"""ホストごとのレート制限と同時実行数の自動調整を行うモジュール"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-Afterヘッダーを秒数に変換
+    
+    Args:
+        value: ヘッダーの値（秒数またはHTTP日付）
+    
+    Returns:
+        float: 待機秒数、解釈できない場合はNone
+    """
+    if not value:
+        return None
+    
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """トークンバケットとAIMDでリクエストレート・同時実行数を調整するクラス
+    
+    - リクエストの開始はトークンバケット（rate件/秒、burst件まで）で制限する
+    - 同時実行数は concurrency_limit までに制限する
+    - 成功してレイテンシが目標以下なら、レートと同時実行数を少しずつ増やす（加算増加）
+    - 429/5xx・通信エラー・目標超過のレイテンシでは半分に減らす（乗算減少）
+    - Retry-After を受け取ったら、その時刻まで新しいリクエストを開始しない
+      （最大 max_block 秒。サーバーが長い時間を返しても全スレッドが止まり続けないようにする）
+    """
+    
+    # 乗算減少の対象とするステータスコード
+    BACKOFF_STATUS_CODES = (429, 500, 502, 503, 504)
+    
+    def __init__(
+        self,
+        rate: float = 4.0,
+        burst: int = 4,
+        min_rate: float = 0.5,
+        max_rate: float = 20.0,
+        concurrency: int = 4,
+        max_concurrency: int = 8,
+        target_latency: float = 3.0,
+        rate_step: float = 0.5,
+        decrease_factor: float = 0.5,
+        max_block: float = 8.0
+    ):
+        """
+        初期化
+        
+        Args:
+            rate: 初期レート（件/秒）
+            burst: バケットに貯められるトークン数
+            min_rate: レートの下限
+            max_rate: レートの上限
+            concurrency: 同時実行数の初期値
+            max_concurrency: 同時実行数の上限
+            target_latency: 目標レイテンシ（秒）。超えたら減速する
+            rate_step: 成功1件あたりのレート増加量
+            decrease_factor: 減速時に掛ける係数
+            max_block: Retry-After で新しいリクエストの開始を止める最大秒数
+                （RetryPolicy の max_delay のデフォルトと同じ8秒）
+        """
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max(1, max_concurrency)
+        self.target_latency = target_latency
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+        self.max_block = max_block
+        
+        self._concurrency = float(min(max(1, concurrency), self.max_concurrency))
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        
+        self._condition = threading.Condition()
+        
+        self.successes = 0
+        self.throttled = 0
+        self.errors = 0
+    
+    @property
+    def concurrency_limit(self) -> int:
+        """現在の同時実行数の上限"""
+        return max(1, int(self._concurrency))
+    
+    @property
+    def current_rate(self) -> float:
+        """現在のレート（件/秒）"""
+        return self.rate
+    
+    @property
+    def queue_depth(self) -> int:
+        """開始待ちのリクエスト数"""
+        return self._waiting
+    
+    @property
+    def in_flight(self) -> int:
+        """実行中のリクエスト数"""
+        return self._in_flight
+    
+    def _refill(self, now: float) -> None:
+        """経過時間に応じてトークンを補充（ロック取得済みで呼ぶこと）"""
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+    
+    def _try_acquire(self) -> Optional[float]:
+        """
+        リクエストの開始を試みる（ロック取得済みで呼ぶこと）
+        
+        Returns:
+            float: 0なら開始可能、正の値ならその秒数後に再試行、
+                Noneなら実行中のリクエストの完了待ち
+        """
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        
+        if self._in_flight >= self.concurrency_limit:
+            return None
+        
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self._in_flight += 1
+            return 0.0
+        
+        return (1 - self._tokens) / self.rate
+    
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        リクエストを開始できるまで待機
+        
+        Args:
+            timeout: 待機する最大秒数（Noneの場合は無制限）
+        
+        Returns:
+            bool: 開始できた場合True、タイムアウトした場合False
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    wait = self._try_acquire()
+                    if wait == 0.0:
+                        return True
+                    
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    
+                    self._condition.wait(wait)
+            finally:
+                self._waiting -= 1
+    
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """
+        リクエストを開始できるまでイベントループを塞がずに待機
+        
+        Args:
+            timeout: 待機する最大秒数（Noneの場合は無制限）
+        
+        Returns:
+            bool: 開始できた場合True、タイムアウトした場合False
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        
+        with self._condition:
+            self._waiting += 1
+        
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_acquire()
+                if wait == 0.0:
+                    return True
+                
+                # 完了待ちの場合は短い間隔で再確認する
+                wait = 0.05 if wait is None else wait
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                await asyncio.sleep(wait)
+        finally:
+            with self._condition:
+                self._waiting -= 1
+    
+    def release(
+        self,
+        latency: float,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ) -> None:
+        """
+        リクエストの完了を記録し、レートと同時実行数を調整
+        
+        Args:
+            latency: レスポンスまでの秒数
+            status_code: HTTPステータスコード（通信エラーの場合はNone）
+            retry_after: Retry-Afterヘッダーの秒数
+        """
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            
+            if status_code is None:
+                self.errors += 1
+                self._decrease()
+            elif status_code in self.BACKOFF_STATUS_CODES:
+                self.throttled += 1
+                self._decrease()
+            elif latency > self.target_latency:
+                self.successes += 1
+                self._decrease()
+            else:
+                self.successes += 1
+                self._increase()
+            
+            if retry_after is not None and status_code is not None:
+                block = min(retry_after, self.max_block)
+                self._blocked_until = max(self._blocked_until, time.monotonic() + block)
+            
+            self._condition.notify_all()
+    
+    def _increase(self) -> None:
+        """加算増加（ロック取得済みで呼ぶこと）"""
+        self.rate = min(self.max_rate, self.rate + self.rate_step)
+        # 同時実行数は1往復分の成功ごとに1増える程度に緩やかに増やす
+        self._concurrency = min(self.max_concurrency, self._concurrency + 1 / self._concurrency)
+    
+    def _decrease(self) -> None:
+        """乗算減少（ロック取得済みで呼ぶこと）"""
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self._concurrency = max(1.0, self._concurrency * self.decrease_factor)
+        self._tokens = min(self._tokens, 1.0)
+    
+    def stats(self) -> Dict:
+        """
+        現在の状態を取得
+        
+        Returns:
+            Dict: レート・同時実行数・待機数・実行中数・各種カウンター
+        """
+        with self._condition:
+            return {
+                'rate': round(self.rate, 2),
+                'concurrency_limit': self.concurrency_limit,
+                'queue_depth': self._waiting,
+                'in_flight': self._in_flight,
+                'blocked_for': round(max(0.0, self._blocked_until - time.monotonic()), 2),
+                'successes': self.successes,
+                'throttled': self.throttled,
+                'errors': self.errors,
+            }
+
+
+_host_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_rate_limiter(host: str, **options) -> AdaptiveRateLimiter:
+    """
+    ホストごとのレートリミッターを取得（プロセス内で共有）
+    
+    Args:
+        host: ホスト名（ポートを含む）
+        **options: 初回作成時に AdaptiveRateLimiter に渡すオプション
+    
+    Returns:
+        AdaptiveRateLimiter: ホストに対応するレートリミッター
+    """
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = AdaptiveRateLimiter(**options)
+        return _host_limiters[host]
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict]:
+    """
+    すべてのホストのレートリミッターの状態を取得
+    
+    Returns:
+        Dict[str, Dict]: ホスト名 -> 状態
+    """
+    with _host_limiters_lock:
+        limiters = dict(_host_limiters)
+    return {host: limiter.stats() for host, limiter in limiters.items()}
+
+
+class RateLimitTimeout(requests.exceptions.Timeout):
+    """レートリミッターの開始待ちがリクエストのタイムアウトを超えた場合の例外（リトライ対象）"""
+
+
+def connect_timeout(timeout) -> Optional[float]:
+    """
+    requests の timeout 引数から接続タイムアウトの秒数を取り出す
+    
+    Args:
+        timeout: 秒数、(接続, 読み込み) のタプル、またはNone
+    
+    Returns:
+        float: 接続タイムアウトの秒数、指定が無い場合はNone
+    """
+    if isinstance(timeout, tuple):
+        timeout = timeout[0]
+    return None if timeout is None else float(timeout)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """送信前にホストごとのレートリミッターを通すrequests用アダプター
+    
+    開始待ちはリクエストの接続タイムアウトまでとし、超えた場合は
+    RateLimitTimeout（requests.Timeout）を送出してリトライに任せる。
+    """
+    
+    def __init__(self, limiter_options: Optional[Dict] = None, **kwargs):
+        """
+        初期化
+        
+        Args:
+            limiter_options: レートリミッター作成時のオプション
+            **kwargs: HTTPAdapter に渡すオプション
+        """
+        self.limiter_options = limiter_options or {}
+        super().__init__(**kwargs)
+    
+    def send(self, request, **kwargs):
+        limiter = get_host_rate_limiter(urlparse(request.url).netloc, **self.limiter_options)
+        wait_timeout = connect_timeout(kwargs.get('timeout'))
+        if not limiter.acquire(wait_timeout):
+            raise RateLimitTimeout(
+                f"レートリミッターの開始待ちが{wait_timeout}秒を超えました: {request.url}",
+                request=request
+            )
+        
+        start = time.monotonic()
+        status_code = None
+        retry_after = None
+        try:
+            response = super().send(request, **kwargs)
+            status_code = response.status_code
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            return response
+        finally:
+            limiter.release(time.monotonic() - start, status_code, retry_after)
+
+
+def test_rate_limiter():
+    """レートリミッターのテスト（遅延と429を返すローカルのスタブサーバーを使用）"""
+    import http.server
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    
+    import requests
+    
+    print("レートリミッターのテスト...\n")
+    
+    class StubHandler(http.server.BaseHTTPRequestHandler):
+        request_count = 0
+        lock = threading.Lock()
+        
+        def do_GET(self):
+            with StubHandler.lock:
+                StubHandler.request_count += 1
+                count = StubHandler.request_count
+            
+            time.sleep(random.uniform(0.05, 0.3))
+            if count % 7 == 0:
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.end_headers()
+                return
+            
+            body = b'OK'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/movie/1/"
+    host = f"127.0.0.1:{server.server_port}"
+    
+    session = requests.Session()
+    session.mount('http://', RateLimitedAdapter(
+        limiter_options={'rate': 5.0, 'burst': 5, 'concurrency': 2, 'max_concurrency': 8}
+    ))
+    
+    def fetch(_):
+        return session.get(url, timeout=10).status_code
+    
+    stop = threading.Event()
+    
+    def report():
+        while not stop.wait(0.5):
+            print(f"   状態: {get_rate_limiter_stats()[host]}")
+    
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        statuses = list(executor.map(fetch, range(40)))
+    stop.set()
+    
+    print(f"\n完了: {len(statuses)}件 / {time.monotonic() - start:.2f}秒")
+    print(f"   200: {statuses.count(200)}件 / 429: {statuses.count(429)}件")
+    print(f"   最終状態: {get_rate_limiter_stats()[host]}")
+    
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    test_rate_limiter()
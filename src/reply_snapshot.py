@@ -0,0 +1,175 @@
+"""リッチメニューの応答（今週公開・上映中）を事前に作成して保存するモジュール"""
+
+import copy
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from data_paths import get_data_dir
+from line_notifier import LineNotifier
+
+# スナップショット名（postbackのaction）-> 映画が無い場合のメッセージ
+REPLY_SNAPSHOTS = {
+    'weekly_new': "今週公開予定の映画はありません",
+    'now_showing': "現在上映中の映画はありません",
+}
+
+
+def build_reply_messages(notifier: LineNotifier, name: str, movies: List[Dict]) -> List[Dict]:
+    """
+    リッチメニューの応答メッセージを作成
+    
+    Args:
+        notifier: メッセージの整形に使うLineNotifier
+        name: スナップショット名（REPLY_SNAPSHOTS のキー）
+        movies: 映画情報のリスト
+    
+    Returns:
+        List[Dict]: そのままReplyできるメッセージオブジェクトのリスト
+    """
+    if movies:
+        return notifier.build_movie_info_messages(movies)
+    return [notifier.build_text_message(REPLY_SNAPSHOTS[name], notifier._get_main_menu_quick_reply_items())]
+
+
+class ReplySnapshotStore:
+    """作成済みの応答メッセージを data/reply_snapshots.json に保存するクラス
+    
+    バッチ処理（またはWebhookでの取得時）に作成したメッセージを保存し、
+    postbackのたびに映画.comを取得せずにそのまま返せるようにする。
+    作成から max_age 秒を過ぎたスナップショットは古いものとして扱う。
+    """
+    
+    DEFAULT_MAX_AGE = 6 * 60 * 60
+    
+    def __init__(self, data_dir: Optional[str] = None, max_age: Optional[float] = None):
+        """
+        初期化
+        
+        Args:
+            data_dir: スナップショットを保存するディレクトリ（Noneの場合はリポジトリ直下の data、環境変数 DATA_DIR で上書き可能）
+            max_age: スナップショットを使う最大の経過時間（秒）
+                （Noneの場合は環境変数 REPLY_SNAPSHOT_MAX_AGE、デフォルト6時間）
+        """
+        self.data_dir = Path(data_dir) if data_dir else get_data_dir()
+        self.snapshot_file = self.data_dir / "reply_snapshots.json"
+        if max_age is None:
+            max_age = float(os.getenv('REPLY_SNAPSHOT_MAX_AGE', str(self.DEFAULT_MAX_AGE)))
+        self.max_age = max_age
+        
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        # ファイルの更新時刻が変わった場合だけ読み直す
+        self._snapshots: Dict[str, Dict] = {}
+        self._mtime_ns: Optional[int] = None
+    
+    def _load(self) -> Dict[str, Dict]:
+        """スナップショットを読み込み（ロック取得済みで呼ぶこと）"""
+        try:
+            mtime_ns = self.snapshot_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._snapshots, self._mtime_ns = {}, None
+            return self._snapshots
+        
+        if mtime_ns != self._mtime_ns:
+            try:
+                with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                    self._snapshots = json.load(f)
+                self._mtime_ns = mtime_ns
+            except Exception as e:
+                print(f"警告: 応答スナップショットの読み込みに失敗 - {e}")
+                self._snapshots = {}
+        return self._snapshots
+    
+    def save(self, name: str, messages: List[Dict], movie_count: int) -> None:
+        """
+        スナップショットを保存
+        
+        Args:
+            name: スナップショット名
+            messages: そのままReplyできるメッセージオブジェクトのリスト
+            movie_count: メッセージに含まれる映画の件数（ログ表示用）
+        """
+        with self._lock:
+            snapshots = dict(self._load())
+            snapshots[name] = {
+                'built_at': datetime.now().isoformat(),
+                'movie_count': movie_count,
+                'messages': messages,
+            }
+            
+            tmp_file = self.snapshot_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshots, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.snapshot_file)
+            
+            self._snapshots = snapshots
+            self._mtime_ns = self.snapshot_file.stat().st_mtime_ns
+        
+        print(f"✓ 応答スナップショットを保存しました: {name}（{movie_count}件）")
+    
+    def age(self, name: str) -> Optional[float]:
+        """
+        スナップショットの経過時間を取得
+        
+        Args:
+            name: スナップショット名
+        
+        Returns:
+            float: 作成からの経過秒数、スナップショットが無い場合はNone
+        """
+        with self._lock:
+            entry = self._load().get(name)
+        if entry is None:
+            return None
+        return (datetime.now() - datetime.fromisoformat(entry['built_at'])).total_seconds()
+    
+    def get(self, name: str, allow_stale: bool = False) -> Optional[List[Dict]]:
+        """
+        スナップショットのメッセージを取得
+        
+        Args:
+            name: スナップショット名
+            allow_stale: Trueの場合は max_age を過ぎたスナップショットも返す
+        
+        Returns:
+            List[Dict]: メッセージオブジェクトのリスト、無いか古い場合はNone
+        """
+        with self._lock:
+            entry = self._load().get(name)
+        if entry is None:
+            return None
+        
+        age = (datetime.now() - datetime.fromisoformat(entry['built_at'])).total_seconds()
+        if age > self.max_age and not allow_stale:
+            return None
+        return copy.deepcopy(entry['messages'])
+
+
+def test_reply_snapshot():
+    """応答スナップショットのテスト"""
+    import tempfile
+    import time
+    
+    print("応答スナップショットのテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = ReplySnapshotStore(tmp_dir, max_age=1)
+        messages = [{'type': 'text', 'text': '🎬 検索結果 (1件)'}]
+        
+        print(f"1. 保存前: {store.get('weekly_new')}")
+        store.save('weekly_new', messages, 1)
+        print(f"2. 保存後: {store.get('weekly_new')}")
+        print(f"3. 別のインスタンスから: {ReplySnapshotStore(tmp_dir, max_age=1).get('weekly_new')}")
+        
+        time.sleep(1.1)
+        print(f"4. 期限切れ: {store.get('weekly_new')}")
+        print(f"5. 期限切れ（allow_stale）: {store.get('weekly_new', allow_stale=True)}")
+
+
+if __name__ == "__main__":
+    test_reply_snapshot()
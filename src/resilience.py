@@ -0,0 +1,334 @@
+"""リトライ・バックオフとサーキットブレーカーを提供するモジュール"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# 例外を (リトライ可能か, Retry-Afterの秒数) に分類する関数
+Classifier = Callable[[Exception], Tuple[bool, Optional[float]]]
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているためリクエストを送らなかったことを示す例外"""
+
+
+class RetryPolicy:
+    """ジッター付き指数バックオフのリトライ設定"""
+    
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        初期化
+        
+        Args:
+            max_attempts: 最大試行回数（初回を含む）
+            base_delay: 待機時間の基準（秒）
+            max_delay: 待機時間の上限（秒）
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        次の試行までの待機時間を計算（フルジッター）
+        
+        Args:
+            attempt: 失敗した試行の番号（0始まり）
+            retry_after: サーバーから指定された待機秒数
+        
+        Returns:
+            float: 待機秒数
+        """
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            return min(self.max_delay, max(backoff, retry_after))
+        return backoff
+
+
+class CircuitBreaker:
+    """連続した失敗でリクエストを一時的に止めるサーキットブレーカー
+    
+    - closed: 通常状態。連続失敗が failure_threshold に達すると open へ
+      （call_with_retry ではリトライを含めた1回の呼び出しを1回の失敗と数える）
+    - open: reset_timeout 秒間はリクエストを送らずに即座に失敗させる
+    - half_open: 経過後に1件だけ試し、成功すれば closed、失敗すれば再び open へ
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        """
+        初期化
+        
+        Args:
+            name: ブレーカー名（エンドポイント名）
+            failure_threshold: open にする連続失敗回数
+            reset_timeout: open を維持する秒数
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        """現在の状態（'closed' / 'open' / 'half_open'）"""
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return self._state
+    
+    def allow_request(self) -> bool:
+        """
+        リクエストを送ってよいかを判定
+        
+        Returns:
+            bool: 送ってよい場合True
+        """
+        with self._lock:
+            if self._state == 'closed':
+                return True
+            
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            
+            # half_open: 同時に1件だけ試す
+            if self._trial_in_progress:
+                return False
+            self._state = 'half_open'
+            self._trial_in_progress = True
+            return True
+    
+    def record_success(self) -> None:
+        """成功を記録"""
+        with self._lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._trial_in_progress = False
+    
+    def record_failure(self) -> None:
+        """失敗を記録"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    print(f"⚠️  サーキットブレーカーを開きました: {self.name}（{self.reset_timeout:.0f}秒間）")
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+    
+    def release_trial(self) -> None:
+        """成功・失敗を記録せずに終わったリクエスト（キャンセルなど）の half_open の試行枠を戻す"""
+        with self._lock:
+            if self._state == 'half_open':
+                self._trial_in_progress = False
+    
+    def stats(self) -> Dict:
+        """
+        現在の状態を取得
+        
+        Returns:
+            Dict: 状態と連続失敗回数
+        """
+        return {'state': self.state, 'failures': self._failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, **options) -> CircuitBreaker:
+    """
+    エンドポイントごとのサーキットブレーカーを取得（プロセス内で共有）
+    
+    Args:
+        name: エンドポイント名
+        **options: 初回作成時に CircuitBreaker に渡すオプション
+    
+    Returns:
+        CircuitBreaker: エンドポイントに対応するブレーカー
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **options)
+        return _breakers[name]
+
+
+def get_circuit_breaker_stats() -> Dict[str, Dict]:
+    """
+    すべてのサーキットブレーカーの状態を取得
+    
+    Returns:
+        Dict[str, Dict]: エンドポイント名 -> 状態
+    """
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+def call_with_retry(
+    func: Callable[[], T],
+    breaker: CircuitBreaker,
+    policy: RetryPolicy,
+    classify: Classifier
+) -> T:
+    """
+    サーキットブレーカーとリトライを適用して関数を呼び出す
+    
+    Args:
+        func: 呼び出す関数
+        breaker: 使用するサーキットブレーカー
+        policy: リトライ設定
+        classify: 例外を (リトライ可能か, Retry-After秒) に分類する関数
+    
+    Returns:
+        関数の戻り値
+    
+    Raises:
+        CircuitOpenError: ブレーカーが開いている場合
+        Exception: リトライしても失敗した場合は最後の例外
+    """
+    # リトライ中に half_open の試行枠を失わないよう、許可は呼び出しごとに1回だけ取る
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"サーキットブレーカーが開いています: {breaker.name}")
+    
+    try:
+        for attempt in range(policy.max_attempts):
+            try:
+                result = func()
+            except Exception as e:
+                retryable, retry_after = classify(e)
+                if not retryable:
+                    # 404など、オリジンの不調ではない失敗はブレーカーの対象外（連続失敗回数も変えない）
+                    raise
+                if attempt + 1 >= policy.max_attempts:
+                    # 1つのURLの遅延で共有のブレーカーが開かないよう、リトライを使い切った時点で1回と数える
+                    breaker.record_failure()
+                    raise
+                delay = policy.delay(attempt, retry_after)
+                print(f"  リトライします（{attempt + 1}/{policy.max_attempts - 1}、{delay:.1f}秒後）: {e}")
+                time.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+    except BaseException:
+        # 成功・失敗を記録せずに終わった場合（404・KeyboardInterrupt など）は half_open の試行枠だけを戻す
+        breaker.release_trial()
+        raise
+    
+    raise RuntimeError("unreachable")
+
+
+async def call_with_retry_async(
+    func: Callable[[], Awaitable[T]],
+    breaker: CircuitBreaker,
+    policy: RetryPolicy,
+    classify: Classifier
+) -> T:
+    """
+    サーキットブレーカーとリトライを適用してコルーチン関数を呼び出す
+    
+    Args:
+        func: 呼び出すコルーチン関数
+        breaker: 使用するサーキットブレーカー
+        policy: リトライ設定
+        classify: 例外を (リトライ可能か, Retry-After秒) に分類する関数
+    
+    Returns:
+        コルーチンの戻り値
+    
+    Raises:
+        CircuitOpenError: ブレーカーが開いている場合
+        Exception: リトライしても失敗した場合は最後の例外
+    """
+    # リトライ中に half_open の試行枠を失わないよう、許可は呼び出しごとに1回だけ取る
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"サーキットブレーカーが開いています: {breaker.name}")
+    
+    try:
+        for attempt in range(policy.max_attempts):
+            try:
+                result = await func()
+            except Exception as e:
+                retryable, retry_after = classify(e)
+                if not retryable:
+                    # 404など、オリジンの不調ではない失敗はブレーカーの対象外（連続失敗回数も変えない）
+                    raise
+                if attempt + 1 >= policy.max_attempts:
+                    # 1つのURLの遅延で共有のブレーカーが開かないよう、リトライを使い切った時点で1回と数える
+                    breaker.record_failure()
+                    raise
+                delay = policy.delay(attempt, retry_after)
+                print(f"  リトライします（{attempt + 1}/{policy.max_attempts - 1}、{delay:.1f}秒後）: {e}")
+                await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+    except BaseException:
+        # 成功・失敗を記録せずに終わった場合（404・タイムアウトによるキャンセルなど）は half_open の試行枠だけを戻す
+        breaker.release_trial()
+        raise
+    
+    raise RuntimeError("unreachable")
+
+
+def test_resilience():
+    """リトライとサーキットブレーカーのテスト"""
+    print("リトライ・サーキットブレーカーのテスト...\n")
+    
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.05)
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=0.2)
+    calls = {'count': 0}
+    
+    def flaky():
+        calls['count'] += 1
+        if calls['count'] < 3:
+            raise ConnectionError("一時的なエラー")
+        return "OK"
+    
+    def classify(e):
+        return isinstance(e, ConnectionError), None
+    
+    print("1. 2回失敗してから成功する呼び出し")
+    print(f"   結果: {call_with_retry(flaky, breaker, policy, classify)}（呼び出し回数: {calls['count']}）")
+    
+    print("\n2. 失敗し続けてブレーカーが開くケース")
+    
+    def always_fail():
+        raise ConnectionError("オリジン停止中")
+    
+    for i in range(4):
+        try:
+            call_with_retry(always_fail, breaker, policy, classify)
+        except Exception as e:
+            print(f"   {i + 1}回目: {type(e).__name__} - {e}")
+    print(f"   状態: {breaker.stats()}")
+    
+    print("\n3. reset_timeout 経過後の試行")
+    time.sleep(0.25)
+    print(f"   状態: {breaker.state}")
+    calls['count'] = 2
+    print(f"   結果: {call_with_retry(flaky, breaker, policy, classify)}")
+    print(f"   状態: {breaker.stats()}")
+    
+    print("\n4. リトライしない失敗（404など）は連続失敗回数を変えない")
+    
+    def not_found():
+        raise ValueError("404 Not Found")
+    
+    for func in (always_fail, not_found, always_fail):
+        try:
+            call_with_retry(func, breaker, policy, classify)
+        except Exception as e:
+            print(f"   {type(e).__name__} - {e}: {breaker.stats()}")
+
+
+if __name__ == "__main__":
+    test_resilience()
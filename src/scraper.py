@@ -1,11 +1,65 @@
 """映画情報をスクレイピングするモジュール"""
 
+import os
 import re
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+from data_paths import get_data_dir
+from http_cache import CachedSession, HttpCache
+from parse_cache import ParseCache, get_parse_cache
+from rate_limiter import AdaptiveRateLimiter, RateLimitedAdapter, get_host_rate_limiter, parse_retry_after
+from resilience import CircuitOpenError, RetryPolicy, call_with_retry, get_circuit_breaker
+from search_cache import SearchResultCache, get_search_cache
+
+
+def parse_release_date(date_str: str) -> Optional[datetime]:
+    """
+    公開日文字列をdatetimeオブジェクトに変換
+    
+    MovieScraper とストレージ（公開日のインデックス）で共通に使う。
+    
+    Args:
+        date_str: 公開日文字列（例: "10月18日", "2025年10月18日"）
+        
+    Returns:
+        datetime: 変換された日付、パースできない場合はNone
+    """
+    if not date_str or date_str == "未定":
+        return None
+    
+    try:
+        # パターン1: "10月18日"
+        match = re.search(r'(\d{1,2})月(\d{1,2})日', date_str)
+        if match:
+            month = int(match.group(1))
+            day = int(match.group(2))
+            year = datetime.now().year
+            
+            # 月が現在の月より小さい場合は翌年とする
+            if month < datetime.now().month:
+                year += 1
+            
+            return datetime(year, month, day)
+        
+        # パターン2: "2025年10月18日"
+        match = re.search(r'(\d{4})年(\d{1,2})月(\d{1,2})日', date_str)
+        if match:
+            year = int(match.group(1))
+            month = int(match.group(2))
+            day = int(match.group(3))
+            return datetime(year, month, day)
+        
+    except Exception as e:
+        print(f"日付のパースに失敗: {date_str} - {e}")
+    
+    return None
 
 
 class MovieScraper:
@@ -19,12 +73,136 @@ class MovieScraper:
         f"{BASE_URL}/movie/",
         f"{BASE_URL}/ranking/",
     ]
+    USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+    # 詳細ページ取得の並列数（環境変数 SCRAPER_MAX_WORKERS で上書き可能）
+    DEFAULT_MAX_WORKERS = 8
+    # 同一ホストへの同時リクエスト数の初期値（環境変数 SCRAPER_PER_HOST_LIMIT で上書き可能）
+    # 実際の同時実行数とリクエストレートはレートリミッターが応答状況に応じて調整する
+    DEFAULT_PER_HOST_LIMIT = 4
+    # 同一ホストへのリクエストレートの初期値（件/秒、環境変数 SCRAPER_RATE_LIMIT で上書き可能）
+    DEFAULT_RATE_LIMIT = 4.0
+    # リクエストのタイムアウト（秒、環境変数 SCRAPER_TIMEOUT で上書き可能）
+    DEFAULT_TIMEOUT = 30.0
+    # 一時的な失敗時の最大試行回数（環境変数 SCRAPER_RETRY_ATTEMPTS で上書き可能）
+    DEFAULT_RETRY_ATTEMPTS = 3
+    # リトライ対象のステータスコード（それ以外の4xxはリトライもブレーカーの失敗計上もしない）
+    RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+    # パース処理を変更したら更新する（パースキャッシュが無効になる）
+    PARSER_VERSION = "1"
+    # パーサーバックエンド
+    #   full: ページ全体のBeautifulSoupツリーを構築する（リファレンス実装）
+    #   strainer: 映画リスト部分のサブツリーのみを構築し、見つからなければfullで再パースする
+    PARSER_BACKENDS = ('full', 'strainer')
+    DEFAULT_PARSER_BACKEND = 'strainer'
+    # strainerバックエンドでページ種類ごとに構築する要素
+    PARSE_ONLY = {
+        'upcoming': SoupStrainer('ul', class_='slide-menu'),
+        'now_showing': SoupStrainer('ul', class_='slide-menu'),
+        'search': SoupStrainer(['div', 'li'], class_=['search-item', 'movie-item']),
+    }
+    # 詳細ページで上映館数を探す公開情報ブロックのクラス
+    RELEASE_INFO_CLASSES = [
+        'date-published', 'movie-details', 'movie-spec', 'movie-info', 'release-info', 'theater-info'
+    ]
+    THEATER_INFO_ONLY = SoupStrainer(class_=RELEASE_INFO_CLASSES + ['theater-list'])
+    # 「全国XX館」（全角数字はNFKCで半角に揃えてから照合する）
+    NATIONWIDE_THEATER_PATTERN = re.compile(r'全国\s*約?\s*(\d[\d,]*)\s*館')
+    # 「XX館」（公開情報ブロック内でのみ使用）
+    THEATER_PATTERN = re.compile(r'(\d[\d,]*)\s*館')
+    # 公開情報ブロックが無いページで「全国XX館」を探す本文の要素
+    MAIN_CONTENT_ONLY = SoupStrainer(['main', 'article'])
+    # 本文の要素内でも対象外にする要素（ヘッダーのお知らせやサイドバーのニュースなど）
+    NON_CONTENT_TAGS = ['header', 'nav', 'aside', 'footer']
     
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        per_host_limit: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        parser_backend: Optional[str] = None,
+        timeout: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            max_workers: 詳細ページ取得の並列数
+            per_host_limit: 同一ホストへの同時リクエスト数の初期値
+            cache_dir: HTTPキャッシュの保存先（環境変数 SCRAPER_CACHE_DIR で上書き可能、
+                SCRAPER_HTTP_CACHE=0 でキャッシュを無効化）
+            parser_backend: パーサーバックエンド（'full' / 'strainer'、
+                環境変数 SCRAPER_PARSER_BACKEND で上書き可能）
+            timeout: リクエストのタイムアウト（秒）
+            retry_policy: 一時的な失敗時のリトライ設定
+        """
+        self.max_workers = max(1, max_workers or int(
+            os.getenv('SCRAPER_MAX_WORKERS', self.DEFAULT_MAX_WORKERS)
+        ))
+        self.per_host_limit = max(1, per_host_limit or int(
+            os.getenv('SCRAPER_PER_HOST_LIMIT', self.DEFAULT_PER_HOST_LIMIT)
+        ))
+        self.parser_backend = parser_backend or os.getenv(
+            'SCRAPER_PARSER_BACKEND', self.DEFAULT_PARSER_BACKEND
+        )
+        if self.parser_backend not in self.PARSER_BACKENDS:
+            raise ValueError(f"未対応のパーサーバックエンドです: {self.parser_backend}")
+        
+        # 条件付きGETに対応したHTTPキャッシュ
+        self.http_cache: Optional[HttpCache] = None
+        if os.getenv('SCRAPER_HTTP_CACHE', '1') != '0':
+            self.http_cache = HttpCache(
+                cache_dir=cache_dir or os.getenv('SCRAPER_CACHE_DIR'),
+                max_bytes=int(os.getenv('SCRAPER_CACHE_MAX_MB', '50')) * 1024 * 1024
+            )
+            self.session = CachedSession(self.http_cache)
+        else:
+            self.session = requests.Session()
+        
+        # 本文のハッシュをキーにしたパース結果キャッシュ（SCRAPER_PARSE_CACHE=0 で無効化）
+        self.parse_cache: Optional[ParseCache] = None
+        if os.getenv('SCRAPER_PARSE_CACHE', '1') != '0':
+            self.parse_cache = get_parse_cache(
+                self.PARSER_VERSION,
+                os.getenv('SCRAPER_PARSE_CACHE_DIR') or str(get_data_dir('parse_cache'))
+            )
+        
+        # 正規化したキーワードをキーにした検索結果キャッシュ（SCRAPER_SEARCH_CACHE=0 で無効化）
+        self.search_cache: Optional[SearchResultCache] = None
+        if os.getenv('SCRAPER_SEARCH_CACHE', '1') != '0':
+            self.search_cache = get_search_cache()
+        
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+            'User-Agent': self.USER_AGENT
         })
+        # ホストごとのレート制限を通して送信する（接続プールは並列取得時に不足しない大きさにする）
+        self.rate_limiter_options = {
+            'rate': float(os.getenv('SCRAPER_RATE_LIMIT', self.DEFAULT_RATE_LIMIT)),
+            'burst': self.per_host_limit,
+            'concurrency': self.per_host_limit,
+            'max_concurrency': max(self.per_host_limit, self.max_workers),
+        }
+        adapter = RateLimitedAdapter(
+            limiter_options=self.rate_limiter_options,
+            pool_maxsize=max(self.max_workers, 10)
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # リトライ・サーキットブレーカー
+        # ブレーカーはエンドポイントごとにプロセス内で共有し、落ちているページへの
+        # リクエストを一定時間止めて、前回取得できたキャッシュで応答する
+        self.timeout = timeout or float(os.getenv('SCRAPER_TIMEOUT', self.DEFAULT_TIMEOUT))
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=int(os.getenv('SCRAPER_RETRY_ATTEMPTS', self.DEFAULT_RETRY_ATTEMPTS))
+        )
+        self.circuit_breaker_options = {
+            'failure_threshold': int(os.getenv('SCRAPER_CIRCUIT_THRESHOLD', '3')),
+            'reset_timeout': float(os.getenv('SCRAPER_CIRCUIT_RESET', '60')),
+        }
+        
+        # 処理ステージごとの所要時間（秒）
+        self.stage_timings: Dict[str, float] = {}
     
     def fetch_upcoming_movies(self) -> List[Dict]:
         """
@@ -39,17 +217,14 @@ class MovieScraper:
         
         try:
             print(f"映画情報を取得中: {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
+            html = self._get_html('upcoming', url)
             
-            soup = BeautifulSoup(response.text, 'lxml')
-            movies = self._parse_upcoming_movies(soup)
+            movies = self._parse_html('upcoming', html, self._parse_upcoming_movies)
             
             print(f"✓ {len(movies)}件の映画情報を取得しました")
             return movies
             
-        except requests.RequestException as e:
+        except (requests.RequestException, CircuitOpenError) as e:
             print(f"エラー: 映画情報の取得に失敗しました - {e}")
             return []
     
@@ -64,28 +239,17 @@ class MovieScraper:
         
         try:
             print(f"公開中の映画情報を取得中: {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
+            html = self._get_html('now_showing', url)
             
-            soup = BeautifulSoup(response.text, 'lxml')
-            movies = self._parse_now_showing_movies(soup)
+            movies = self._parse_html('now_showing', html, self._parse_now_showing_movies)
             
             # 過去1週間以内の映画のみにフィルタリング
-            one_week_ago = datetime.now() - timedelta(days=7)
-            recent_movies = []
-            
-            for movie in movies:
-                release_date_str = movie.get('release_date', '')
-                release_date = self._parse_release_date(release_date_str)
-                
-                if release_date and release_date >= one_week_ago:
-                    recent_movies.append(movie)
+            recent_movies = self._filter_released_in_past_week(movies)
             
             print(f"✓ {len(recent_movies)}件の過去1週間以内の映画情報を取得しました")
             return recent_movies
             
-        except requests.RequestException as e:
+        except (requests.RequestException, CircuitOpenError) as e:
             print(f"エラー: 公開中映画情報の取得に失敗しました - {e}")
             return []
     
@@ -101,32 +265,20 @@ class MovieScraper:
         
         try:
             print(f"公開予定の映画情報を取得中: {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
+            html = self._get_html('upcoming', url)
             
-            soup = BeautifulSoup(response.text, 'lxml')
-            movies = self._parse_upcoming_movies(soup)
+            movies = self._parse_html('upcoming', html, self._parse_upcoming_movies)
             
             # 先1週間以内の映画のみにフィルタリング
-            one_week_later = datetime.now() + timedelta(days=7)
-            upcoming_movies = []
+            upcoming_movies = self._filter_coming_in_next_week(movies)
             
-            for movie in movies:
-                release_date_str = movie.get('release_date', '')
-                release_date = self._parse_release_date(release_date_str)
-                
-                if release_date and release_date <= one_week_later:
-                    # 上映館数情報を取得
-                    theater_count = self._fetch_theater_count(movie['url'])
-                    movie['theater_count'] = theater_count
-                    movie['is_limited_release'] = self._is_limited_release(theater_count)
-                    upcoming_movies.append(movie)
+            # 上映館数情報を並列に取得
+            self._enrich_theater_counts(upcoming_movies)
             
             print(f"✓ {len(upcoming_movies)}件の先1週間以内の映画情報を取得しました")
             return upcoming_movies
             
-        except requests.RequestException as e:
+        except (requests.RequestException, CircuitOpenError) as e:
             print(f"エラー: 公開予定映画情報の取得に失敗しました - {e}")
             return []
     
@@ -145,24 +297,222 @@ class MovieScraper:
         
         try:
             print(f"映画を検索中: {keyword}")
-            response = self.session.get(
-                search_url,
-                params={'search': keyword},
-                timeout=30
-            )
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
             
-            soup = BeautifulSoup(response.text, 'lxml')
-            movies = self._parse_search_results(soup)
+            def load() -> List[Dict]:
+                html = self._get_html('search', search_url, params={'search': keyword})
+                return self._parse_html('search', html, self._parse_search_results)
+            
+            # 同じキーワードの検索は共有キャッシュから返し、同時の検索は1回にまとめる
+            movies = self.search_cache.get_or_load(keyword, load) if self.search_cache else load()
             
             print(f"✓ {len(movies)}件の検索結果を取得しました")
             return movies
             
-        except requests.RequestException as e:
+        except (requests.RequestException, CircuitOpenError) as e:
             print(f"エラー: 映画検索に失敗しました - {e}")
             return []
     
+    def _get_html(self, endpoint: str, url: str, params: Optional[Dict] = None) -> str:
+        """
+        リトライ・サーキットブレーカーを通してページ本文を取得
+        
+        一時的な失敗（通信エラー・タイムアウト・429/5xx）はジッター付き指数バックオフで
+        リトライする。それでも取得できない場合やブレーカーが開いている場合は、
+        期限切れでも前回取得できたキャッシュの本文を返す。
+        
+        Args:
+            endpoint: エンドポイント名（サーキットブレーカーの単位）
+            url: リクエストURL
+            params: クエリパラメータ
+        
+        Returns:
+            str: レスポンス本文
+        
+        Raises:
+            requests.RequestException: 取得できず、キャッシュも無い場合
+            CircuitOpenError: ブレーカーが開いていて、キャッシュも無い場合
+        """
+        breaker = get_circuit_breaker(endpoint, **self.circuit_breaker_options)
+        
+        def fetch() -> str:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            response.encoding = response.apparent_encoding
+            return response.text
+        
+        try:
+            return call_with_retry(fetch, breaker, self.retry_policy, self._classify_error)
+        except (requests.RequestException, CircuitOpenError) as e:
+            html = self._read_stale(requests.Request('GET', url, params=params).prepare().url)
+            if html is None:
+                raise
+            print(f"⚠️  取得に失敗したため前回取得したページを使用します: {url} - {e}")
+            return html
+    
+    def _read_stale(self, full_url: str) -> Optional[str]:
+        """
+        期限切れを含めて、HTTPキャッシュに残っている本文を取得
+        
+        Args:
+            full_url: クエリ文字列を含むURL
+        
+        Returns:
+            str: 本文、キャッシュが無い場合はNone
+        """
+        if self.http_cache is None:
+            return None
+        stale = self.http_cache.read_stale(full_url)
+        if stale is None:
+            return None
+        return self._decode_body(*stale)
+    
+    @staticmethod
+    def _decode_body(body: bytes, encoding: Optional[str]) -> str:
+        """
+        キャッシュした本文を文字列に変換
+        
+        Args:
+            body: レスポンス本文
+            encoding: 保存時のエンコーディング
+        
+        Returns:
+            str: デコードした本文
+        """
+        try:
+            return body.decode('utf-8')
+        except UnicodeDecodeError:
+            return body.decode(encoding or 'cp932', errors='replace')
+    
+    @classmethod
+    def _classify_error(cls, error: Exception) -> Tuple[bool, Optional[float]]:
+        """
+        取得エラーがリトライ対象かを判定
+        
+        Args:
+            error: 発生した例外
+        
+        Returns:
+            tuple: (リトライ対象か, Retry-Afterの秒数)
+        """
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            status_code = error.response.status_code
+            retry_after = parse_retry_after(error.response.headers.get('Retry-After'))
+            return status_code in cls.RETRYABLE_STATUS_CODES, retry_after
+        return isinstance(error, (requests.ConnectionError, requests.Timeout)), None
+    
+    def _filter_released_in_past_week(self, movies: List[Dict]) -> List[Dict]:
+        """
+        過去1週間以内に公開された映画のみを抽出
+        
+        Args:
+            movies: 映画情報のリスト
+            
+        Returns:
+            List[Dict]: 過去1週間以内に公開された映画情報のリスト
+        """
+        one_week_ago = datetime.now() - timedelta(days=7)
+        recent_movies = []
+        
+        for movie in movies:
+            release_date_str = movie.get('release_date', '')
+            release_date = self._parse_release_date(release_date_str)
+            
+            if release_date and release_date >= one_week_ago:
+                recent_movies.append(movie)
+        
+        return recent_movies
+    
+    def _filter_coming_in_next_week(self, movies: List[Dict]) -> List[Dict]:
+        """
+        先1週間以内に公開予定の映画のみを抽出
+        
+        Args:
+            movies: 映画情報のリスト
+            
+        Returns:
+            List[Dict]: 先1週間以内に公開予定の映画情報のリスト
+        """
+        one_week_later = datetime.now() + timedelta(days=7)
+        upcoming_movies = []
+        
+        for movie in movies:
+            release_date_str = movie.get('release_date', '')
+            release_date = self._parse_release_date(release_date_str)
+            
+            if release_date and release_date <= one_week_later:
+                upcoming_movies.append(movie)
+        
+        return upcoming_movies
+    
+    def _parse_html(
+        self,
+        kind: str,
+        html: str,
+        parse_func: Callable[[BeautifulSoup], List[Dict]]
+    ) -> List[Dict]:
+        """
+        HTMLをパースして映画情報を取得（パースキャッシュ対応）
+        
+        同じ本文を以前パースしていれば、BeautifulSoupを構築せずに
+        キャッシュ済みの結果を返す。
+        
+        Args:
+            kind: ページの種類（キャッシュキーに使用）
+            html: レスポンス本文
+            parse_func: BeautifulSoupオブジェクトを受け取るパース関数
+            
+        Returns:
+            List[Dict]: パースされた映画情報
+        """
+        if self.parse_cache:
+            movies = self.parse_cache.get(kind, html)
+            if movies is not None:
+                scraped_at = datetime.now().isoformat()
+                for movie in movies:
+                    movie['scraped_at'] = scraped_at
+                print(f"✓ パースキャッシュを使用しました: {kind}")
+                return movies
+        
+        movies = self._parse_with_backend(kind, html, parse_func)
+        
+        if self.parse_cache:
+            self.parse_cache.put(kind, html, movies)
+        
+        return movies
+    
+    def _parse_with_backend(
+        self,
+        kind: str,
+        html: str,
+        parse_func: Callable[[BeautifulSoup], List[Dict]]
+    ) -> List[Dict]:
+        """
+        設定されたパーサーバックエンドでHTMLをパース
+        
+        strainerバックエンドでは映画リストのサブツリーのみを構築する。
+        対象要素が見つからない・映画が取れない場合は、画像リンクなどの
+        フォールバック処理のためにページ全体を再パースする。
+        
+        Args:
+            kind: ページの種類（PARSE_ONLY のキー）
+            html: レスポンス本文
+            parse_func: BeautifulSoupオブジェクトを受け取るパース関数
+            
+        Returns:
+            List[Dict]: パースされた映画情報
+        """
+        parse_only = self.PARSE_ONLY.get(kind)
+        
+        if self.parser_backend == 'strainer' and parse_only is not None:
+            soup = BeautifulSoup(html, 'lxml', parse_only=parse_only)
+            if soup.find(True) is not None:
+                movies = parse_func(soup)
+                if movies:
+                    return movies
+        
+        soup = BeautifulSoup(html, 'lxml')
+        return parse_func(soup)
+    
     def _parse_this_week_movies(self, soup: BeautifulSoup) -> List[Dict]:
         """
         「今週公開の映画」セクションから映画情報をパース
@@ -505,35 +855,7 @@ class MovieScraper:
         Returns:
             datetime: 変換された日付、パースできない場合はNone
         """
-        if not date_str or date_str == "未定":
-            return None
-        
-        try:
-            # パターン1: "10月18日"
-            match = re.search(r'(\d{1,2})月(\d{1,2})日', date_str)
-            if match:
-                month = int(match.group(1))
-                day = int(match.group(2))
-                year = datetime.now().year
-                
-                # 月が現在の月より小さい場合は翌年とする
-                if month < datetime.now().month:
-                    year += 1
-                
-                return datetime(year, month, day)
-            
-            # パターン2: "2025年10月18日"
-            match = re.search(r'(\d{4})年(\d{1,2})月(\d{1,2})日', date_str)
-            if match:
-                year = int(match.group(1))
-                month = int(match.group(2))
-                day = int(match.group(3))
-                return datetime(year, month, day)
-            
-        except Exception as e:
-            print(f"日付のパースに失敗: {date_str} - {e}")
-        
-        return None
+        return parse_release_date(date_str)
     
     def _fetch_theater_count(self, movie_url: str) -> Optional[int]:
         """
@@ -543,39 +865,136 @@ class MovieScraper:
             movie_url: 映画の詳細ページURL
             
         Returns:
-            int: 上映館数、取得できない場合はNone
+            int: 上映館数、詳細ページに館数が無い場合はNone
+        
+        Raises:
+            Exception: 詳細ページを取得・解析できなかった場合
+                （館数が無いページと区別し、呼び出し側で再取得するかを判断する）
         """
-        try:
-            response = self.session.get(movie_url, timeout=30)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
-            
-            soup = BeautifulSoup(response.text, 'lxml')
-            
-            # 上映館数の情報を探す
-            # パターン1: "全国XX館で公開"
-            text = soup.get_text()
-            match = re.search(r'全国[約]?(\d+)館', text)
-            if match:
-                return int(match.group(1))
+        html = self._get_html('detail', movie_url)
+        return self._extract_theater_count(html)
+    
+    def _extract_theater_count(self, html: str) -> Optional[int]:
+        """
+        詳細ページのHTMLから上映館数を抽出
+        
+        ページ全体ではなく公開情報ブロックのみを構築して走査する。
+        「XX館」の緩いパターンは公開情報ブロック内でのみ使い、
+        ブロックが無いページでは本文（main・article）から「全国XX館」のみを探す
+        （ヘッダー・ナビゲーション・サイドバーの他作品の館数を拾わないようにするため）。
+        
+        Args:
+            html: 詳細ページのHTML
             
-            # パターン2: "XX館"
-            match = re.search(r'(\d+)館', text)
+        Returns:
+            int: 上映館数、見つからない場合はNone
+        """
+        soup = BeautifulSoup(html, 'lxml', parse_only=self.THEATER_INFO_ONLY)
+        blocks = soup.find_all(class_=self.RELEASE_INFO_CLASSES)
+        block_texts = [
+            unicodedata.normalize('NFKC', block.get_text(' ', strip=True))
+            for block in blocks
+        ]
+        
+        # パターン1: 公開情報ブロック内の "全国XX館"
+        # パターン2: 公開情報ブロック内の "XX館"
+        for pattern in (self.NATIONWIDE_THEATER_PATTERN, self.THEATER_PATTERN):
+            for text in block_texts:
+                match = pattern.search(text)
+                if match:
+                    return int(match.group(1).replace(',', ''))
+        
+        # パターン3: 上映劇場リストから数える
+        theater_list = soup.find('div', class_='theater-list')
+        if theater_list:
+            theaters = theater_list.find_all('li')
+            if theaters:
+                return len(theaters)
+        
+        # パターン4: 公開情報ブロックが無いページのみ、本文から "全国XX館" を探す
+        if not blocks and '館' in html:
+            content = BeautifulSoup(html, 'lxml', parse_only=self.MAIN_CONTENT_ONLY)
+            for element in content.find_all(self.NON_CONTENT_TAGS):
+                element.decompose()
+            text = unicodedata.normalize('NFKC', content.get_text(' ', strip=True))
+            match = self.NATIONWIDE_THEATER_PATTERN.search(text)
             if match:
-                return int(match.group(1))
-            
-            # パターン3: 上映劇場リストから数える
-            theater_list = soup.find('div', class_='theater-list')
-            if theater_list:
-                theaters = theater_list.find_all('li')
-                if theaters:
-                    return len(theaters)
-            
-        except Exception as e:
-            print(f"上映館数の取得に失敗: {movie_url} - {e}")
+                return int(match.group(1).replace(',', ''))
         
         return None
     
+    def _enrich_theater_counts(
+        self,
+        movies: List[Dict],
+        on_result: Optional[Callable[[Dict, Optional[int], Optional[Exception]], None]] = None
+    ) -> List[Dict]:
+        """
+        映画リストに上映館数情報を並列に付与
+        
+        詳細ページの取得はスレッドプールで並列に行い、同一ホストへの
+        リクエストはレートリミッターで制限する。
+        
+        Args:
+            movies: 映画情報のリスト（その場で更新される）
+            on_result: 1件取得するごとに (映画情報, 上映館数, 取得に失敗した場合の例外) で呼ばれる関数
+                （途中経過の保存などに使う。館数が無いページは上映館数・例外ともにNone）
+            
+        Returns:
+            List[Dict]: 上映館数情報を付与した映画情報のリスト
+        """
+        if not movies:
+            return movies
+        
+        workers = min(self.max_workers, len(movies))
+        start = time.perf_counter()
+        
+        def fetch(movie: Dict) -> Optional[int]:
+            error = None
+            try:
+                theater_count = self._fetch_theater_count(movie['url'])
+            except Exception as e:
+                print(f"上映館数の取得に失敗: {movie['url']} - {e}")
+                theater_count, error = None, e
+            if on_result:
+                on_result(movie, theater_count, error)
+            return theater_count
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            theater_counts = list(executor.map(fetch, movies))
+        
+        for movie, theater_count in zip(movies, theater_counts):
+            self._apply_theater_count(movie, theater_count)
+        
+        elapsed = time.perf_counter() - start
+        self.stage_timings['theater_count_enrichment'] = elapsed
+        print(f"✓ 上映館数を取得しました: {len(movies)}件 / {elapsed:.2f}秒（並列数: {workers}）")
+        print(f"  レート制限: {self.get_rate_limiter().stats()}")
+        
+        return movies
+    
+    def _apply_theater_count(self, movie: Dict, theater_count: Optional[int]) -> None:
+        """
+        映画情報に上映館数と限定公開フラグを設定
+        
+        Args:
+            movie: 映画情報（その場で更新される）
+            theater_count: 上映館数
+        """
+        movie['theater_count'] = theater_count
+        movie['is_limited_release'] = self._is_limited_release(theater_count)
+    
+    def get_rate_limiter(self, host: str = "eiga.com") -> AdaptiveRateLimiter:
+        """
+        ホストのレートリミッターを取得（現在のレート・待機数の確認用）
+        
+        Args:
+            host: ホスト名
+            
+        Returns:
+            AdaptiveRateLimiter: プロセス内で共有されるレートリミッター
+        """
+        return get_host_rate_limiter(host, **self.rate_limiter_options)
+    
     def _is_limited_release(self, theater_count: Optional[int]) -> bool:
         """
         上映館数が少ないかどうかを判定
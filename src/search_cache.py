@@ -0,0 +1,308 @@
+"""映画.comのキーワード検索結果をキャッシュするモジュール"""
+
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from text_normalize import normalize_key
+
+
+class SearchResultCache:
+    """正規化したキーワード（normalize_key）をキーに検索結果を保持するキャッシュ
+    
+    - TTLを過ぎたエントリは使わない
+    - 件数・合計サイズの上限を超えたら最も長く使われていないエントリから削除する（LRU）
+    - 同じキーワードの検索が同時に来た場合は1回だけ取得し、結果を共有する（single-flight）
+    """
+    
+    DEFAULT_TTL = 10 * 60
+    DEFAULT_MAX_ENTRIES = 512
+    DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+    
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        初期化
+        
+        Args:
+            ttl: 検索結果の有効期間（秒）
+            max_entries: 保持する最大件数
+            max_bytes: 保持する検索結果の合計サイズ上限（JSONに変換したバイト数）
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        
+        self._lock = threading.Lock()
+        # キー -> (有効期限, 検索結果, サイズ)
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict], int]]" = OrderedDict()
+        self._bytes = 0
+        # 取得中のキーワード（スレッドから待つFutureと、イベントループで待つTask）
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_tasks: Dict[str, asyncio.Task] = {}
+        
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, query: str) -> Optional[List[Dict]]:
+        """
+        検索結果を取得
+        
+        Args:
+            query: 検索キーワード
+        
+        Returns:
+            List[Dict]: 検索結果のコピー、キャッシュが無いか期限切れの場合はNone
+        """
+        key = normalize_key(query)
+        with self._lock:
+            movies = self._lookup(key)
+            if movies is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(movies)
+    
+    def put(self, query: str, movies: List[Dict]) -> None:
+        """
+        検索結果を保存
+        
+        Args:
+            query: 検索キーワード
+            movies: 検索結果
+        """
+        key = normalize_key(query)
+        movies = copy.deepcopy(movies)
+        size = len(json.dumps(movies, ensure_ascii=False).encode('utf-8'))
+        
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, movies, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+    
+    def _lookup(self, key: str) -> Optional[List[Dict]]:
+        """有効なエントリを取得し、LRUの順序を更新（ロック取得済みで呼ぶこと）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._discard(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def _discard(self, key: str) -> None:
+        """エントリを削除（ロック取得済みで呼ぶこと）"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+    
+    def get_or_load(self, query: str, loader: Callable[[], List[Dict]]) -> List[Dict]:
+        """
+        検索結果を取得し、無い場合は loader で取得して保存
+        
+        同じキーワードを別のスレッドが取得中の場合は、その結果を待って共有する。
+        loader が例外を送出した場合は保存せず、待っていたスレッドにも同じ例外を送出する。
+        
+        Args:
+            query: 検索キーワード
+            loader: 検索結果を取得する関数
+        
+        Returns:
+            List[Dict]: 検索結果
+        """
+        key = normalize_key(query)
+        with self._lock:
+            movies = self._lookup(key)
+            if movies is not None:
+                self.hits += 1
+                return copy.deepcopy(movies)
+            
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            return copy.deepcopy(future.result())
+        
+        try:
+            movies = loader()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(query, movies)
+            future.set_result(movies)
+            return movies
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+    
+    async def get_or_load_async(
+        self,
+        query: str,
+        loader: Callable[[], Awaitable[List[Dict]]]
+    ) -> List[Dict]:
+        """
+        検索結果を取得し、無い場合は loader のコルーチンで取得して保存（非同期版）
+        
+        同じイベントループで同じキーワードを取得中の場合は、そのタスクの結果を共有する。
+        待っている側がキャンセルされても取得自体は続行する。
+        
+        Args:
+            query: 検索キーワード
+            loader: 検索結果を取得するコルーチンを返す関数
+        
+        Returns:
+            List[Dict]: 検索結果
+        """
+        key = normalize_key(query)
+        with self._lock:
+            movies = self._lookup(key)
+            if movies is not None:
+                self.hits += 1
+                return copy.deepcopy(movies)
+            
+            task = self._inflight_tasks.get(key)
+            if task is None:
+                self.misses += 1
+                task = asyncio.ensure_future(self._load_async(key, query, loader))
+                self._inflight_tasks[key] = task
+            else:
+                self.coalesced += 1
+        
+        return copy.deepcopy(await asyncio.shield(task))
+    
+    async def _load_async(
+        self,
+        key: str,
+        query: str,
+        loader: Callable[[], Awaitable[List[Dict]]]
+    ) -> List[Dict]:
+        """検索結果を取得して保存し、取得中の一覧から外す"""
+        try:
+            movies = await loader()
+            self.put(query, movies)
+            return movies
+        finally:
+            with self._lock:
+                self._inflight_tasks.pop(key, None)
+    
+    def clear(self) -> None:
+        """すべてのエントリを削除"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict:
+        """
+        キャッシュの統計情報を取得
+        
+        Returns:
+            Dict: ヒット数・ミス数・ヒット率・相乗り数・LRUでの削除数・期限切れ数・件数・サイズ
+        """
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+
+_shared_cache: Optional[SearchResultCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchResultCache:
+    """
+    プロセス内で共有するSearchResultCacheを取得
+    
+    TTL・最大件数・サイズ上限は環境変数 SEARCH_CACHE_TTL（秒）/
+    SEARCH_CACHE_MAX_ENTRIES / SEARCH_CACHE_MAX_KB で調整可能。
+    
+    Returns:
+        SearchResultCache: 共有インスタンス
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = SearchResultCache(
+                ttl=float(os.getenv('SEARCH_CACHE_TTL', str(SearchResultCache.DEFAULT_TTL))),
+                max_entries=int(os.getenv(
+                    'SEARCH_CACHE_MAX_ENTRIES', str(SearchResultCache.DEFAULT_MAX_ENTRIES)
+                )),
+                max_bytes=int(os.getenv(
+                    'SEARCH_CACHE_MAX_KB', str(SearchResultCache.DEFAULT_MAX_BYTES // 1024)
+                )) * 1024
+            )
+        return _shared_cache
+
+
+def test_search_cache():
+    """検索結果キャッシュのテスト"""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    print("検索結果キャッシュのテスト...\n")
+    
+    cache = SearchResultCache(ttl=0.5, max_entries=2)
+    calls = []
+    
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return [{'title': 'テスト映画', 'url': 'https://eiga.com/movie/1/'}]
+    
+    print("1. 同じキーワードを同時に10件検索")
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(lambda q: cache.get_or_load(q, loader), ['テスト'] * 5 + ['ﾃｽﾄ '] * 5))
+    print(f"   取得回数: {len(calls)}回")
+    
+    print("\n2. キャッシュキー")
+    for query in ['ﾃｽﾄ ', 'ＳＰＹ×ＦＡＭＩＬＹ', 'ビール', 'ビル', '1/2', '12']:
+        print(f"   '{query}' -> '{normalize_key(query)}'")
+    
+    print("\n3. LRUでの削除")
+    cache.put('a', [])
+    cache.put('b', [])
+    print(f"   'テスト'の取得: {cache.get('テスト')}")
+    
+    print("\n4. 期限切れ")
+    time.sleep(0.6)
+    print(f"   'a'の取得: {cache.get('a')}")
+    
+    print(f"\n統計: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    test_search_cache()
@@ -0,0 +1,529 @@
+"""映画タイトルの全文検索インデックス（文字バイグラムの転置インデックス）"""
+
+import bisect
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from movie_database import extract_movie_id
+from text_normalize import normalize_text
+
+
+def ngrams(text: str) -> Set[str]:
+    """
+    インデックスに登録する文字n-gram（1文字と2文字）を取得
+    
+    日本語のタイトルは単語の区切りが無いため、形態素解析ではなく
+    文字バイグラムで部分一致を引けるようにする。
+    
+    Args:
+        text: 正規化済みの文字列
+    
+    Returns:
+        Set[str]: 文字ユニグラムとバイグラムの集合
+    """
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_grams(text: str) -> Set[str]:
+    """
+    検索クエリから照合に使うn-gramを取得（2文字以上はバイグラムのみ）
+    
+    Args:
+        text: 正規化済みの検索クエリ
+    
+    Returns:
+        Set[str]: 照合に使うn-gramの集合
+    """
+    if len(text) < 2:
+        return set(text)
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def max_typos(length: int) -> int:
+    """
+    クエリの長さに応じて許容する誤字の数（編集距離）を取得
+    
+    2文字以下のクエリは誤字を許容すると無関係なタイトルばかりになるため0にする。
+    
+    Args:
+        length: 正規化済みのクエリの長さ
+    
+    Returns:
+        int: 許容する編集距離（3〜6文字は1、7〜10文字は2、11文字以上は3）
+    """
+    if length < 3:
+        return 0
+    return min(3, 1 + (length - 3) // 4)
+
+
+def bounded_edit_distance(pattern: str, text: str, max_distance: int) -> Optional[int]:
+    """
+    text のいずれかの部分文字列と pattern の編集距離の最小値を求める（上限付き）
+    
+    text 側の開始位置・終了位置を自由にした編集距離（近似部分一致）を列ごとに更新し、
+    値が上限を超えた行は計算しない（Ukkonenのカットオフ）。
+    
+    Args:
+        pattern: 正規化済みのクエリ
+        text: 正規化済みのタイトル
+        max_distance: 編集距離の上限
+    
+    Returns:
+        int: 編集距離、上限を超える場合はNone
+    """
+    length = len(pattern)
+    over = max_distance + 1
+    column = [i if i <= max_distance else over for i in range(length + 1)]
+    # 値が上限以下の最後の行
+    last = min(max_distance, length)
+    best = column[length]
+    
+    for char in text:
+        diagonal = 0
+        left = 0
+        limit = min(last + 1, length)
+        for i in range(1, limit + 1):
+            above = column[i]
+            value = diagonal + (pattern[i - 1] != char)
+            if above + 1 < value:
+                value = above + 1
+            if left + 1 < value:
+                value = left + 1
+            if value > over:
+                value = over
+            diagonal = above
+            column[i] = value
+            left = value
+        
+        last = limit
+        while last > 0 and column[last] > max_distance:
+            last -= 1
+        if last == length and column[length] < best:
+            best = column[length]
+    
+    return best if best <= max_distance else None
+
+
+class _IndexState:
+    """検索インデックスの内容（公開した後は変更せず、更新時は新しいものに置き換える）"""
+    
+    __slots__ = ('movies', 'normalized', 'postings', 'sorted_titles')
+    
+    def __init__(
+        self,
+        movies: Dict[str, Dict],
+        normalized: Dict[str, str],
+        postings: Dict[str, List[str]],
+        sorted_titles: List[Tuple[str, str]]
+    ):
+        self.movies = movies
+        self.normalized = normalized
+        # n-gram -> 文書IDのリスト（(正規化したタイトルの長さ, 作品ID) の昇順）
+        self.postings = postings
+        # (正規化したタイトル, 作品ID) の昇順の配列（前方一致の二分探索用）
+        self.sorted_titles = sorted_titles
+
+
+class TitleSearchIndex:
+    """映画タイトルの転置インデックス
+    
+    n-gram -> 文書IDのリスト を保持し、完全一致・前方一致・部分一致の順に上位にする。
+    転置リストはタイトルの短い順に並べておき、上位の件数が揃った時点で走査を打ち切る
+    （「の」のように多くのタイトルに含まれるクエリでも全件を評価しない）。
+    部分一致が足りない場合は、クエリのn-gramを一定数以上含むタイトルを候補にして
+    編集距離（誤字の数）を求め、許容範囲内のものを誤字の少ない順に加える。
+    入力途中のタイトルの補完用に、正規化したタイトルを整列した配列も保持する。
+    
+    更新は現在の内容をコピーして差分を反映した新しい内容を作り、参照を置き換える。
+    検索は更新中も置き換え前の内容を使うため、更新を待たない。
+    """
+    
+    # 編集距離を計算する候補の最大数（n-gramの一致数が多い順）
+    MAX_FUZZY_CANDIDATES = 64
+    # 補完候補を選ぶために走査する前方一致のタイトルの最大数
+    MAX_COMPLETION_SCAN = 256
+    # 1つのリストへの追加・削除がこの件数を超える場合は、挿入ではなく並べ替えで作り直す
+    BULK_THRESHOLD = 32
+    
+    def __init__(self, fuzzy: bool = True):
+        """
+        初期化
+        
+        Args:
+            fuzzy: 誤字を許容した検索を行うかどうか
+        """
+        self.fuzzy = fuzzy
+        self.version: Optional[str] = None
+        
+        self._state = _IndexState({}, {}, {}, [])
+        # 更新同士だけを直列化する（検索はロックを取らない）
+        self._write_lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._state.movies)
+    
+    def add(self, movie: Dict) -> None:
+        """
+        映画を追加（同じ作品IDがあれば置き換え）
+        
+        Args:
+            movie: 映画情報
+        """
+        with self._write_lock:
+            self._state = self._updated(self._state, {extract_movie_id(movie): movie}, set())
+    
+    def remove(self, doc_id: str) -> None:
+        """
+        映画を削除
+        
+        Args:
+            doc_id: 作品ID
+        """
+        with self._write_lock:
+            if doc_id in self._state.movies:
+                self._state = self._updated(self._state, {}, {doc_id})
+    
+    def replace_all(self, movies: Iterable[Dict], version: Optional[str] = None) -> Dict[str, int]:
+        """
+        インデックスの内容を映画一覧に揃える（差分だけを追加・削除する）
+        
+        Args:
+            movies: 保存されている映画一覧
+            version: 一覧のバージョン（保存データの更新検知に使う）
+        
+        Returns:
+            Dict[str, int]: 追加・削除した件数
+        """
+        # 同じ作品IDが複数ある場合は最後のものを使う
+        latest = {extract_movie_id(movie): movie for movie in movies}
+        with self._write_lock:
+            state = self._state
+            stale = state.movies.keys() - latest.keys()
+            new_state = self._updated(state, latest, stale)
+            
+            # 参照の置き換えだけで検索側に反映する
+            self._state = new_state
+            self.version = version
+            return {
+                'added': len(latest.keys() - state.movies.keys()),
+                'removed': len(stale),
+                'total': len(new_state.movies),
+            }
+    
+    def _updated(
+        self,
+        state: _IndexState,
+        movies: Dict[str, Dict],
+        removals: Set[str]
+    ) -> _IndexState:
+        """
+        差分を反映した新しい内容を作成（state は変更しない）
+        
+        Args:
+            state: 現在の内容
+            movies: 追加・置き換える映画情報（作品ID -> 映画情報）
+            removals: 削除する作品IDの集合
+        
+        Returns:
+            _IndexState: 新しい内容
+        """
+        movies_by_id = dict(state.movies)
+        normalized = dict(state.normalized)
+        removed_grams: Dict[str, Set[str]] = {}
+        added_grams: Dict[str, List[str]] = {}
+        removed_titles: Set[Tuple[str, str]] = set()
+        added_titles: List[Tuple[str, str]] = []
+        
+        def drop(doc_id: str) -> None:
+            title = normalized.pop(doc_id)
+            del movies_by_id[doc_id]
+            removed_titles.add((title, doc_id))
+            for gram in ngrams(title):
+                removed_grams.setdefault(gram, set()).add(doc_id)
+        
+        for doc_id in removals:
+            if doc_id in normalized:
+                drop(doc_id)
+        
+        for doc_id, movie in movies.items():
+            current = state.movies.get(doc_id)
+            # タイトルが変わっていない映画は正規化もし直さない
+            if current is not None and current.get('title') == movie.get('title'):
+                movies_by_id[doc_id] = movie
+                continue
+            title = normalize_text(movie.get('title', ''))
+            if doc_id in normalized:
+                if normalized[doc_id] == title:
+                    movies_by_id[doc_id] = movie
+                    continue
+                drop(doc_id)
+            movies_by_id[doc_id] = movie
+            normalized[doc_id] = title
+            added_titles.append((title, doc_id))
+            for gram in ngrams(title):
+                added_grams.setdefault(gram, []).append(doc_id)
+        
+        if not removed_titles and not added_titles:
+            return _IndexState(movies_by_id, normalized, state.postings, state.sorted_titles)
+        
+        def rank(doc_id: str) -> Tuple[int, str]:
+            return len(normalized[doc_id]), doc_id
+        
+        if len(removed_titles) + len(added_titles) > len(normalized) // 4:
+            # 初回の構築など変更が多い場合は、短い順に全件を登録し直す（リストの並べ替えが不要）
+            postings: Dict[str, List[str]] = {}
+            for doc_id in sorted(normalized, key=rank):
+                for gram in ngrams(normalized[doc_id]):
+                    postings.setdefault(gram, []).append(doc_id)
+            sorted_titles = sorted((title, doc_id) for doc_id, title in normalized.items())
+            return _IndexState(movies_by_id, normalized, postings, sorted_titles)
+        
+        # 変更のあったn-gramのリストだけをコピーして更新する
+        postings = dict(state.postings)
+        for gram in removed_grams.keys() | added_grams.keys():
+            removed = removed_grams.get(gram)
+            added = added_grams.get(gram, [])
+            existing = postings.get(gram, [])
+            updated = [doc_id for doc_id in existing if doc_id not in removed] if removed else list(existing)
+            if len(added) > self.BULK_THRESHOLD:
+                updated.extend(added)
+                updated.sort(key=rank)
+            else:
+                for doc_id in added:
+                    bisect.insort(updated, doc_id, key=rank)
+            if updated:
+                postings[gram] = updated
+            else:
+                postings.pop(gram, None)
+        
+        # 整列済みの配列をコピーして削除分・追加分を反映する
+        # （全体の並べ替えは検索スレッドを止めるため、変更が少ない場合は二分探索で反映する）
+        if len(removed_titles) + len(added_titles) > self.BULK_THRESHOLD * 8:
+            sorted_titles = [item for item in state.sorted_titles if item not in removed_titles]
+            sorted_titles.extend(added_titles)
+            sorted_titles.sort()
+        else:
+            sorted_titles = list(state.sorted_titles)
+            for item in removed_titles:
+                del sorted_titles[bisect.bisect_left(sorted_titles, item)]
+            for item in added_titles:
+                bisect.insort(sorted_titles, item)
+        
+        return _IndexState(movies_by_id, normalized, postings, sorted_titles)
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        タイトルを検索
+        
+        Args:
+            query: 検索クエリ
+            limit: 最大件数
+        
+        Returns:
+            List[Dict]: スコアの高い順の映画情報のリスト
+        """
+        return [movie for movie, _ in self.search_with_scores(query, limit=limit)]
+    
+    def complete(self, prefix: str, limit: int = 5) -> List[Dict]:
+        """
+        入力途中のタイトルを補完（正規化したタイトルの前方一致）
+        
+        整列した配列を二分探索し、前方一致するタイトルのうち短いもの
+        （入力済みの部分が占める割合が大きいもの）から返す。
+        
+        Args:
+            prefix: 入力途中のタイトル
+            limit: 最大件数
+        
+        Returns:
+            List[Dict]: 補完候補の映画情報のリスト
+        """
+        normalized_prefix = normalize_text(prefix)
+        if not normalized_prefix:
+            return []
+        
+        state = self._state
+        titles = state.sorted_titles
+        position = bisect.bisect_left(titles, (normalized_prefix,))
+        end = min(position + self.MAX_COMPLETION_SCAN, len(titles))
+        matches = []
+        while position < end and titles[position][0].startswith(normalized_prefix):
+            matches.append(titles[position])
+            position += 1
+        
+        return [
+            state.movies[doc_id]
+            for _, doc_id in heapq.nsmallest(limit, matches, key=lambda item: len(item[0]))
+        ]
+    
+    def search_with_scores(self, query: str, limit: int = 10) -> List[Tuple[Dict, float]]:
+        """
+        タイトルを検索し、スコアも返す
+        
+        スコアはクエリがタイトルに含まれる場合は完全一致4、前方一致3、部分一致2。
+        含まれない場合は誤字を許容した一致で、1 - 編集距離 / クエリの長さ（0〜1）。
+        
+        Args:
+            query: 検索クエリ
+            limit: 最大件数
+        
+        Returns:
+            List[Tuple[Dict, float]]: スコアの高い順の（映画情報, スコア）のリスト
+        """
+        normalized_query = normalize_text(query)
+        grams = query_grams(normalized_query)
+        if not grams:
+            return []
+        
+        state = self._state
+        posting_lists = [state.postings[gram] for gram in grams if gram in state.postings]
+        scored = []
+        
+        # 部分一致するタイトルはクエリのすべてのn-gramを含むため、最も短いリストだけを走査する
+        if len(posting_lists) == len(grams):
+            # 前方一致（完全一致を含む）の件数は整列した配列の二分探索で分かる
+            titles = state.sorted_titles
+            prefix_count = (
+                bisect.bisect_left(titles, (normalized_query + '\U0010ffff',))
+                - bisect.bisect_left(titles, (normalized_query,))
+            )
+            needed_prefix = min(prefix_count, limit)
+            prefix_found = 0
+            contained_found = 0
+            
+            # タイトルの短い順に走査し、前方一致と部分一致の上位が揃ったら打ち切る
+            # （同じスコアなら短いタイトル、クエリの占める割合が大きい方を上位にする）
+            for doc_id in min(posting_lists, key=len):
+                title = state.normalized[doc_id]
+                if title.startswith(normalized_query):
+                    score = 4.0 if title == normalized_query else 3.0
+                    prefix_found += 1
+                elif contained_found < limit and normalized_query in title:
+                    score = 2.0
+                    contained_found += 1
+                else:
+                    continue
+                scored.append((-score, len(title), doc_id))
+                if prefix_found >= needed_prefix and prefix_found + contained_found >= limit:
+                    break
+        
+        if len(scored) < limit and self.fuzzy:
+            matched = {doc_id for _, _, doc_id in scored}
+            scored.extend(self._fuzzy_matches(state, normalized_query, grams, posting_lists, matched))
+        
+        return [
+            (state.movies[doc_id], -negative_score)
+            for negative_score, _, doc_id in heapq.nsmallest(limit, scored)
+        ]
+    
+    def _fuzzy_matches(
+        self,
+        state: _IndexState,
+        normalized_query: str,
+        grams: Set[str],
+        posting_lists: List[List[str]],
+        exclude: Set[str]
+    ) -> List[Tuple[float, int, str]]:
+        """
+        誤字を許容して一致するタイトルを探す
+        
+        Args:
+            state: 検索に使う内容
+            normalized_query: 正規化済みのクエリ
+            grams: クエリのn-gram
+            posting_lists: クエリのn-gramの転置リスト
+            exclude: 部分一致で見つかった文書ID
+        
+        Returns:
+            List[Tuple[float, int, str]]: (-スコア, タイトルの長さ, 文書ID) のリスト
+        """
+        max_distance = max_typos(len(normalized_query))
+        if max_distance == 0:
+            return []
+        
+        # 1文字の誤字で失われるバイグラムは最大2つなので、それより多く失われた候補は除外できる
+        min_hits = max(1, len(grams) - 2 * max_distance)
+        counts: Counter = Counter()
+        for postings in posting_lists:
+            counts.update(postings)
+        
+        candidates = heapq.nlargest(
+            self.MAX_FUZZY_CANDIDATES,
+            (doc_id for doc_id, hits in counts.items() if hits >= min_hits and doc_id not in exclude),
+            key=counts.__getitem__
+        )
+        
+        matches = []
+        for doc_id in candidates:
+            title = state.normalized[doc_id]
+            distance = bounded_edit_distance(normalized_query, title, max_distance)
+            if distance is not None:
+                score = 1 - distance / len(normalized_query)
+                matches.append((-score, len(title), doc_id))
+        return matches
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        インデックスの統計情報を取得
+        
+        Returns:
+            Dict[str, int]: 映画数・n-gram数・転置リストの合計長
+        """
+        state = self._state
+        return {
+            'movies': len(state.movies),
+            'grams': len(state.postings),
+            'postings': sum(len(postings) for postings in state.postings.values()),
+        }
+
+
+_indexes: Dict[str, TitleSearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(name: str) -> TitleSearchIndex:
+    """
+    保存先ごとの検索インデックスを取得（プロセス内で共有）
+    
+    Args:
+        name: 保存先を識別する名前（データディレクトリなど）
+    
+    Returns:
+        TitleSearchIndex: 検索インデックス
+    """
+    with _indexes_lock:
+        if name not in _indexes:
+            _indexes[name] = TitleSearchIndex()
+        return _indexes[name]
+
+
+def test_search_index():
+    """検索インデックスのテスト"""
+    print("検索インデックスのテスト...\n")
+    
+    index = TitleSearchIndex()
+    index.replace_all([
+        {'title': '名探偵コナン 100万ドルの五稜星', 'url': 'https://eiga.com/movie/1/'},
+        {'title': '名探偵コナン 黒鉄の魚影', 'url': 'https://eiga.com/movie/2/'},
+        {'title': 'コナン・ザ・グレート', 'url': 'https://eiga.com/movie/3/'},
+        {'title': 'ＳＰＹ×ＦＡＭＩＬＹ', 'url': 'https://eiga.com/movie/4/'},
+    ])
+    print(f"統計: {index.stats()}\n")
+    
+    for query in ['コナン', 'こなん', '名探偵', 'spy', 'コナソ', '名探偵コマン 黒金の魚影']:
+        results = index.search(query)
+        print(f"'{query}': {[movie['title'] for movie in results]}")
+    
+    print(f"\n補完 '名探偵': {[movie['title'] for movie in index.complete('名探偵')]}")
+    
+    print("\n差分更新（1件削除）")
+    print(f"   {index.replace_all([{'title': 'コナン・ザ・グレート', 'url': 'https://eiga.com/movie/3/'}])}")
+    print(f"   'コナン': {[movie['title'] for movie in index.search('コナン')]}")
+
+
+if __name__ == "__main__":
+    test_search_index()
@@ -0,0 +1,183 @@
+"""ユーザーセッションをSQLiteに保存するモジュール（SessionManager のSQLiteバックエンド）"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from data_paths import get_data_dir
+
+
+class SessionDatabase:
+    """ユーザーセッションをSQLite（WAL）で管理するクラス
+    
+    - ユーザーIDを主キーに1行ずつUPSERT・削除するため、gunicornの複数ワーカーから
+      同時に更新しても他のユーザーのセッションを上書きしない
+    - WALのため、読み取りは書き込み中のワーカーを待たない
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            user_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            last_activity TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at);
+    """
+    
+    COLUMNS = ('state', 'created_at', 'expires_at', 'last_activity')
+    
+    def __init__(self, db_file: Optional[str] = None):
+        """
+        初期化
+        
+        Args:
+            db_file: データベースファイルのパス（Noneの場合は data/sessions.db）
+        """
+        self.db_file = Path(db_file) if db_file else get_data_dir("sessions.db")
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """スレッドごとの接続を取得し、終了時にコミット
+        
+        メッセージごとに使うため、接続を開き直さずにスレッドごとに使い回す。
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        with conn:
+            yield conn
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        """
+        セッションを取得
+        
+        Args:
+            user_id: ユーザーID
+        
+        Returns:
+            Dict: セッション情報、無い場合はNone
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT state, created_at, expires_at, last_activity FROM sessions WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        return dict(row) if row else None
+    
+    def upsert(self, user_id: str, session: Dict) -> None:
+        """
+        セッションを保存
+        
+        Args:
+            user_id: ユーザーID
+            session: セッション情報
+        """
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO sessions (user_id, state, created_at, expires_at, last_activity)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    state = excluded.state,
+                    created_at = excluded.created_at,
+                    expires_at = excluded.expires_at,
+                    last_activity = excluded.last_activity
+                """,
+                (user_id, *(session[column] for column in self.COLUMNS))
+            )
+    
+    def touch_many(self, activities: List[Tuple[str, str]]) -> None:
+        """
+        最終活動時間をまとめて更新
+        
+        Args:
+            activities: (ユーザーID, 最終活動時間) のリスト
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE sessions SET last_activity = ? WHERE user_id = ? AND last_activity < ?",
+                [(last_activity, user_id, last_activity) for user_id, last_activity in activities]
+            )
+    
+    def delete(self, user_id: str) -> bool:
+        """
+        セッションを削除
+        
+        Args:
+            user_id: ユーザーID
+        
+        Returns:
+            bool: 削除した場合True
+        """
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,)).rowcount > 0
+    
+    def delete_expired(self, now: str) -> int:
+        """
+        期限切れのセッションを削除
+        
+        Args:
+            now: 現在時刻（ISO形式）
+        
+        Returns:
+            int: 削除した件数
+        """
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,)).rowcount
+    
+    def count(self) -> int:
+        """
+        セッション数を取得
+        
+        Returns:
+            int: セッション数
+        """
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def test_session_database():
+    """SQLiteバックエンドのテスト"""
+    import tempfile
+    from datetime import datetime, timedelta
+    
+    print("SQLiteバックエンドのテスト...\n")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = SessionDatabase(f"{tmp_dir}/sessions.db")
+        now = datetime.now()
+        session = {
+            'state': 'movie_search',
+            'created_at': now.isoformat(),
+            'expires_at': (now + timedelta(minutes=10)).isoformat(),
+            'last_activity': now.isoformat(),
+        }
+        
+        print("1. 保存・取得")
+        db.upsert('user_1', session)
+        db.upsert('user_2', dict(session, expires_at=(now - timedelta(minutes=1)).isoformat()))
+        print(f"   {db.get('user_1')}")
+        
+        print("\n2. 最終活動時間の更新")
+        db.touch_many([('user_1', (now + timedelta(seconds=5)).isoformat())])
+        print(f"   {db.get('user_1')['last_activity']}")
+        
+        print("\n3. 期限切れの削除")
+        print(f"   削除: {db.delete_expired(now.isoformat())}件 / 件数: {db.count()}")
+
+
+if __name__ == "__main__":
+    test_session_database()
@@ -1,30 +1,85 @@
 """ユーザーセッション管理システム"""
 
+import atexit
 import json
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, Optional
 
+from data_paths import get_data_dir
+from session_database import SessionDatabase
+
 
 class SessionManager:
-    """ユーザーセッション管理クラス"""
+    """ユーザーセッション管理クラス
+    
+    保存先（backend）は2種類。
+    - json: セッションはメモリ上で管理し、変更があった場合だけ一定間隔（flush_interval 秒）で
+      バックグラウンドのスレッドから sessions.json に書き込む（プロセス終了時にも書き込む）。
+      書き込みは一時ファイルからの置き換えで行い、途中で落ちても前回の内容が残るようにする。
+      プロセス内で完結するため、gunicornのワーカーが1つの場合に使う
+    - sqlite: セッションを sessions.db に1行ずつ保存し、gunicornの複数ワーカー・
+      複数プロセスで同じ状態を参照する。最終活動時間の更新だけは一定間隔でまとめて書き込む
+    
+    flush_interval が0以下の場合は変更のたびに書き込む。
+    """
     
-    def __init__(self, data_dir: str = "data"):
+    BACKENDS = ('json', 'sqlite')
+    DEFAULT_FLUSH_INTERVAL = 5.0
+    
+    def __init__(
+        self,
+        data_dir: Optional[str] = None,
+        flush_interval: Optional[float] = None,
+        backend: Optional[str] = None
+    ):
         """
         初期化
         
         Args:
-            data_dir: セッションデータを保存するディレクトリ
+            data_dir: セッションデータを保存するディレクトリ（Noneの場合はリポジトリ直下の data、環境変数 DATA_DIR で上書き可能）
+            flush_interval: 変更をファイルに書き込む間隔（秒）
+                （Noneの場合は環境変数 SESSION_FLUSH_INTERVAL、デフォルト5秒）
+            backend: 保存先（'json' / 'sqlite'、環境変数 SESSION_BACKEND で上書き可能）
         """
-        self.data_dir = Path(data_dir)
+        self.data_dir = Path(data_dir) if data_dir else get_data_dir()
         self.sessions_file = self.data_dir / "sessions.json"
+        if flush_interval is None:
+            flush_interval = float(os.getenv('SESSION_FLUSH_INTERVAL', str(self.DEFAULT_FLUSH_INTERVAL)))
+        self.flush_interval = flush_interval
+        self.backend = backend or os.getenv('SESSION_BACKEND', 'json')
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"未対応のセッションの保存先です: {self.backend}")
         
         # dataディレクトリが存在しない場合は作成
         self.data_dir.mkdir(parents=True, exist_ok=True)
         
-        # セッションデータを読み込み
-        self.sessions = self._load_sessions()
+        # セッションデータを読み込み（SQLiteの場合は都度データベースを参照する）
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self.db: Optional[SessionDatabase] = None
+        if self.backend == 'sqlite':
+            self.db = SessionDatabase(str(self.data_dir / "sessions.db"))
+            self.sessions = {}
+        else:
+            self.sessions = self._load_sessions()
+        
+        # 前回の書き込み以降に変更されたユーザー
+        self._dirty = set()
+        # SQLiteに未反映の最終活動時間（ユーザーID -> 最終活動時間）
+        self._touches: Dict[str, str] = {}
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        
+        self._stop_event = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name='session-flush', daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
     
     def _load_sessions(self) -> Dict:
         """
@@ -53,24 +108,132 @@ class SessionManager:
         """
         セッションデータを保存
         
+        一時ファイルに書き込んでfsyncしてから置き換えるため、
+        書き込み中に落ちても sessions.json が壊れることはない。
+        
         Returns:
             bool: 保存が成功したかどうか
         """
-        try:
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(self.sessions, f, ensure_ascii=False, indent=2)
+        if self.db:
+            return self._save_touches()
+        
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return True
+                data = json.dumps(self.sessions, ensure_ascii=False, separators=(',', ':'))
+                dirty, self._dirty = self._dirty, set()
+            
+            start = time.perf_counter()
+            tmp_file = self.sessions_file.with_suffix(f".{os.getpid()}.tmp")
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.sessions_file)
+                
+            except Exception as e:
+                print(f"セッションデータの保存エラー: {e}")
+                # 次回の書き込みでやり直す
+                with self._lock:
+                    self._dirty |= dirty
+                return False
+            
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
             return True
+    
+    def _save_touches(self) -> bool:
+        """
+        未反映の最終活動時間をSQLiteにまとめて書き込む
+        
+        Returns:
+            bool: 保存が成功したかどうか
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._touches:
+                    return True
+                touches, self._touches = self._touches, {}
             
-        except Exception as e:
-            print(f"セッションデータの保存エラー: {e}")
-            return False
+            start = time.perf_counter()
+            try:
+                self.db.touch_many(list(touches.items()))
+            except Exception as e:
+                print(f"セッションデータの保存エラー: {e}")
+                with self._lock:
+                    for user_id, last_activity in touches.items():
+                        self._touches.setdefault(user_id, last_activity)
+                return False
+            
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            return True
     
-    def _cleanup_expired_sessions(self, sessions: Dict) -> None:
+    def _mark_dirty(self, user_id: str) -> bool:
+        """
+        変更を記録（ロック取得済みで呼ぶこと）
+        
+        Args:
+            user_id: 変更したユーザーID
+        
+        Returns:
+            bool: 書き込みが成功したかどうか（バックグラウンドで書き込む場合は常にTrue）
+        """
+        self._dirty.add(user_id)
+        if self.flush_interval <= 0:
+            return self._save_sessions()
+        return True
+    
+    def _flush_loop(self) -> None:
+        """一定間隔で変更をファイルに書き込む"""
+        while not self._stop_event.wait(self.flush_interval):
+            self._save_sessions()
+    
+    def flush(self) -> bool:
+        """
+        未保存の変更をすぐにファイルに書き込む
+        
+        Returns:
+            bool: 保存が成功したかどうか
+        """
+        return self._save_sessions()
+    
+    def close(self) -> None:
+        """バックグラウンドの書き込みを止め、未保存の変更を書き込む"""
+        self._stop_event.set()
+        if self._flusher and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        self._save_sessions()
+    
+    def stats(self) -> Dict:
+        """
+        セッションの統計情報を取得
+        
+        Returns:
+            Dict: セッション数・未保存のユーザー数・書き込み回数・直近の書き込み時間（ミリ秒）
+        """
+        sessions = self.db.count() if self.db else len(self.sessions)
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'sessions': sessions,
+                'dirty': len(self._touches) if self.db else len(self._dirty),
+                'flushes': self.flushes,
+                'last_flush_ms': round(self.last_flush_ms, 2),
+                'flush_interval': self.flush_interval,
+            }
+    
+    def _cleanup_expired_sessions(self, sessions: Dict) -> list:
         """
         期限切れのセッションをクリーンアップ
         
         Args:
             sessions: セッションデータ
+        
+        Returns:
+            list: 削除したユーザーIDのリスト
         """
         current_time = datetime.now()
         expired_users = []
@@ -83,6 +246,7 @@ class SessionManager:
         
         for user_id in expired_users:
             del sessions[user_id]
+        return expired_users
     
     def set_user_state(
         self,
@@ -103,15 +267,22 @@ class SessionManager:
         """
         try:
             expires_at = datetime.now() + timedelta(minutes=expires_minutes)
-            
-            self.sessions[user_id] = {
+            session_data = {
                 'state': state,
                 'created_at': datetime.now().isoformat(),
                 'expires_at': expires_at.isoformat(),
                 'last_activity': datetime.now().isoformat()
             }
             
-            return self._save_sessions()
+            if self.db:
+                self.db.upsert(user_id, session_data)
+                with self._lock:
+                    self._touches.pop(user_id, None)
+                return True
+            
+            with self._lock:
+                self.sessions[user_id] = session_data
+                return self._mark_dirty(user_id)
             
         except Exception as e:
             print(f"ユーザー状態の設定エラー: {e}")
@@ -127,23 +298,54 @@ class SessionManager:
         Returns:
             str: ユーザーの状態、セッションがない場合はNone
         """
-        if user_id not in self.sessions:
-            return None
-        
-        session_data = self.sessions[user_id]
+        if self.db:
+            return self._get_user_state_from_db(user_id)
         
-        # 期限切れチェック
-        if 'expires_at' in session_data:
-            expires_at = datetime.fromisoformat(session_data['expires_at'])
-            if datetime.now() > expires_at:
-                self.clear_user_state(user_id)
+        with self._lock:
+            if user_id not in self.sessions:
                 return None
+            
+            session_data = self.sessions[user_id]
+            
+            # 期限切れチェック
+            if 'expires_at' in session_data:
+                expires_at = datetime.fromisoformat(session_data['expires_at'])
+                if datetime.now() > expires_at:
+                    self.clear_user_state(user_id)
+                    return None
+            
+            # 最終活動時間を更新（ファイルへの書き込みはまとめて行う）
+            session_data['last_activity'] = datetime.now().isoformat()
+            self._mark_dirty(user_id)
+            
+            return session_data.get('state')
+    
+    def _get_user_state_from_db(self, user_id: str) -> Optional[str]:
+        """
+        ユーザーの状態をSQLiteから取得
         
-        # 最終活動時間を更新
-        session_data['last_activity'] = datetime.now().isoformat()
-        self._save_sessions()
+        Args:
+            user_id: ユーザーID
+            
+        Returns:
+            str: ユーザーの状態、セッションがない場合はNone
+        """
+        session_data = self.db.get(user_id)
+        if session_data is None:
+            return None
+        
+        now = datetime.now()
+        if now > datetime.fromisoformat(session_data['expires_at']):
+            self.clear_user_state(user_id)
+            return None
+        
+        # 最終活動時間の更新はまとめて書き込む
+        with self._lock:
+            self._touches[user_id] = now.isoformat()
+        if self.flush_interval <= 0:
+            self._save_touches()
         
-        return session_data.get('state')
+        return session_data['state']
     
     def clear_user_state(self, user_id: str) -> bool:
         """
@@ -156,10 +358,17 @@ class SessionManager:
             bool: クリアが成功したかどうか
         """
         try:
-            if user_id in self.sessions:
-                del self.sessions[user_id]
-                return self._save_sessions()
-            return True
+            if self.db:
+                self.db.delete(user_id)
+                with self._lock:
+                    self._touches.pop(user_id, None)
+                return True
+            
+            with self._lock:
+                if user_id in self.sessions:
+                    del self.sessions[user_id]
+                    return self._mark_dirty(user_id)
+                return True
             
         except Exception as e:
             print(f"ユーザー状態のクリアエラー: {e}")
@@ -175,19 +384,27 @@ class SessionManager:
         Returns:
             Dict: セッション情報、セッションがない場合はNone
         """
-        if user_id not in self.sessions:
-            return None
-        
-        session_data = self.sessions[user_id]
-        
-        # 期限切れチェック
-        if 'expires_at' in session_data:
-            expires_at = datetime.fromisoformat(session_data['expires_at'])
-            if datetime.now() > expires_at:
+        if self.db:
+            session_data = self.db.get(user_id)
+            if session_data and datetime.now() > datetime.fromisoformat(session_data['expires_at']):
                 self.clear_user_state(user_id)
                 return None
+            return session_data
         
-        return session_data
+        with self._lock:
+            if user_id not in self.sessions:
+                return None
+            
+            session_data = self.sessions[user_id]
+            
+            # 期限切れチェック
+            if 'expires_at' in session_data:
+                expires_at = datetime.fromisoformat(session_data['expires_at'])
+                if datetime.now() > expires_at:
+                    self.clear_user_state(user_id)
+                    return None
+            
+            return dict(session_data)
     
     def get_active_sessions_count(self) -> int:
         """
@@ -197,10 +414,9 @@ class SessionManager:
             int: アクティブなセッション数
         """
         # 期限切れのセッションをクリーンアップ
-        self._cleanup_expired_sessions(self.sessions)
-        self._save_sessions()
+        self.cleanup_all_expired_sessions()
         
-        return len(self.sessions)
+        return self.db.count() if self.db else len(self.sessions)
     
     def cleanup_all_expired_sessions(self) -> int:
         """
@@ -209,12 +425,15 @@ class SessionManager:
         Returns:
             int: クリーンアップしたセッション数
         """
-        before_count = len(self.sessions)
-        self._cleanup_expired_sessions(self.sessions)
-        self._save_sessions()
-        after_count = len(self.sessions)
+        if self.db:
+            return self.db.delete_expired(datetime.now().isoformat())
         
-        return before_count - after_count
+        with self._lock:
+            expired_users = self._cleanup_expired_sessions(self.sessions)
+            for user_id in expired_users:
+                self._mark_dirty(user_id)
+        
+        return len(expired_users)
 
 
 def test_session_manager():
@@ -222,7 +441,7 @@ def test_session_manager():
     print("セッション管理システムのテスト...\n")
     
     # セッションマネージャーを初期化
-    session_manager = SessionManager()
+    session_manager = SessionManager(flush_interval=1)
     
     # テスト用ユーザーID
     test_user_id = "test_user_123"
@@ -265,6 +484,16 @@ def test_session_manager():
     cleaned_count = session_manager.cleanup_all_expired_sessions()
     print(f"   クリーンアップしたセッション数: {cleaned_count}")
     
+    print("\n7. バックグラウンドでの書き込みテスト")
+    for i in range(100):
+        session_manager.set_user_state(f"bulk_user_{i}", "movie_search")
+    print(f"   100件の変更直後: {session_manager.stats()}")
+    time.sleep(1.5)
+    print(f"   書き込み後: {session_manager.stats()}")
+    for i in range(100):
+        session_manager.clear_user_state(f"bulk_user_{i}")
+    session_manager.close()
+    
     print("\n✓ セッション管理システムのテストが完了しました")
 
 
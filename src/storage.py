@@ -2,24 +2,70 @@
 
 import json
 import os
-from datetime import datetime
+import threading
+from datetime import date, datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from data_paths import get_data_dir
+from movie_database import MovieDatabase
+from scraper import parse_release_date
+from search_index import TitleSearchIndex, get_search_index
+
 
 class MovieStorage:
-    """映画情報を保存・読み込みするクラス"""
+    """映画情報を保存・読み込みするクラス
+    
+    保存先は環境変数 MOVIE_STORAGE_BACKEND で切り替える。
+    - json: data/movies.json に一覧をまとめて保存する（デフォルト）
+    - sqlite: data/movies.db にインデックス付きで保存し、差分だけを書き込む
+    """
     
-    def __init__(self, data_dir: str = "data"):
-        self.data_dir = Path(data_dir)
+    BACKENDS = ('json', 'sqlite')
+    
+    def __init__(self, data_dir: Optional[str] = None, backend: Optional[str] = None, auto_import: bool = True):
+        """
+        初期化
+        
+        Args:
+            data_dir: データを保存するディレクトリ（Noneの場合はリポジトリ直下の data、環境変数 DATA_DIR で上書き可能）
+            backend: 保存先（'json' / 'sqlite'、環境変数 MOVIE_STORAGE_BACKEND で上書き可能）
+            auto_import: SQLiteが空の場合に movies.json の内容を取り込むかどうか
+        """
+        self.data_dir = Path(data_dir) if data_dir else get_data_dir()
         self.data_file = self.data_dir / "movies.json"
+        self.backend = backend or os.getenv('MOVIE_STORAGE_BACKEND', 'json')
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"未対応のストレージです: {self.backend}")
         
         # dataディレクトリが存在しない場合は作成
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.db: Optional[MovieDatabase] = None
+        if self.backend == 'sqlite':
+            self.db = MovieDatabase(str(self.data_dir / "movies.db"))
+            # 初回はJSONファイルの内容を取り込む
+            if auto_import and self.db.load_all() is None and self.data_file.exists():
+                self.import_json()
+    
+    def import_json(self) -> int:
+        """
+        movies.json の内容をSQLiteに取り込み
+        
+        Returns:
+            int: 取り込んだ件数
+        """
+        with open(self.data_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        movies = data.get('movies', [])
+        counts = self.db.upsert_movies(movies)
+        print(f"✓ {self.data_file} から{len(movies)}件を取り込みました: {counts}")
+        return len(movies)
     
     def save_movies(self, movies: List[Dict]) -> bool:
         """
-        映画情報をJSONファイルに保存
+        映画情報を保存
         
         Args:
             movies: 映画情報のリスト
@@ -27,6 +73,16 @@ class MovieStorage:
         Returns:
             bool: 保存が成功したかどうか
         """
+        if self.db:
+            try:
+                counts = self.db.upsert_movies(movies)
+                print(f"✓ {len(movies)}件の映画情報を保存しました: {self.db.db_file} {counts}")
+                self._update_search_index(movies)
+                return True
+            except Exception as e:
+                print(f"エラー: データの保存に失敗しました - {e}")
+                return False
+        
         try:
             data = {
                 'updated_at': datetime.now().isoformat(),
@@ -34,10 +90,14 @@ class MovieStorage:
                 'movies': movies
             }
             
-            with open(self.data_file, 'w', encoding='utf-8') as f:
+            # 一時ファイルに書き込んでから置き換え、他のプロセスが書き込み途中のファイルを読まないようにする
+            tmp_file = self.data_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.data_file)
             
             print(f"✓ {len(movies)}件の映画情報を保存しました: {self.data_file}")
+            self._update_search_index(movies)
             return True
             
         except Exception as e:
@@ -46,11 +106,17 @@ class MovieStorage:
     
     def load_movies(self) -> Optional[Dict]:
         """
-        JSONファイルから映画情報を読み込み
+        保存されている映画情報を読み込み
         
         Returns:
             Dict: 映画情報（updated_at, count, moviesを含む）。ファイルが存在しない場合はNone
         """
+        if self.db:
+            data = self.db.load_all()
+            if data is None:
+                print(f"ℹ️  前回のデータが見つかりません: {self.db.db_file}")
+            return data
+        
         if not self.data_file.exists():
             print(f"ℹ️  前回のデータファイルが見つかりません: {self.data_file}")
             return None
@@ -80,12 +146,123 @@ class MovieStorage:
             set: 映画タイトルのセット
         """
         if data is None:
+            if self.db:
+                return self.db.titles()
             data = self.load_movies()
         
         if data is None or 'movies' not in data:
             return set()
         
         return {movie['title'] for movie in data['movies']}
+    
+    def data_version(self) -> Optional[str]:
+        """
+        保存データのバージョン（保存のたびに変わる値）を取得
+        
+        JSONはファイルの更新時刻、SQLiteは最終保存時刻を使う。
+        
+        Returns:
+            str: バージョン、データが無い場合はNone
+        """
+        if self.db:
+            return self.db.updated_at()
+        try:
+            return str(self.data_file.stat().st_mtime_ns)
+        except FileNotFoundError:
+            return None
+    
+    def _update_search_index(self, movies: List[Dict]) -> None:
+        """保存した一覧との差分を検索インデックスに反映"""
+        index = get_search_index(str(self.data_dir.resolve()))
+        index.replace_all(movies, version=self.data_version())
+    
+    def search_index(self) -> TitleSearchIndex:
+        """
+        保存データの検索インデックスを取得
+        
+        インデックスはプロセス内で共有し、保存データが他のプロセスで
+        更新されていた場合（バージョンが変わった場合）だけ差分を反映する。
+        
+        Returns:
+            TitleSearchIndex: 検索インデックス
+        """
+        index = get_search_index(str(self.data_dir.resolve()))
+        version = self.data_version()
+        if version is not None and index.version != version:
+            data = self.load_movies() or {}
+            counts = index.replace_all(data.get('movies', []), version=version)
+            print(f"✓ 検索インデックスを更新しました: {counts}")
+        return index
+    
+    def search_titles(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        保存されている映画をタイトルで全文検索
+        
+        Args:
+            query: 検索クエリ
+            limit: 最大件数
+            
+        Returns:
+            List[Dict]: 関連度の高い順の映画情報のリスト
+        """
+        return self.search_index().search(query, limit=limit)
+    
+    def complete_titles(self, prefix: str, limit: int = 5) -> List[Dict]:
+        """
+        入力途中のタイトルを保存されている映画で補完
+        
+        Args:
+            prefix: 入力途中のタイトル
+            limit: 最大件数
+            
+        Returns:
+            List[Dict]: 補完候補の映画情報のリスト
+        """
+        return self.search_index().complete(prefix, limit=limit)
+    
+    def find_by_title(self, title: str, prefix: bool = False, limit: int = 20) -> List[Dict]:
+        """
+        タイトルで映画を検索（完全一致・前方一致）
+        
+        Args:
+            title: タイトル
+            prefix: Trueの場合は前方一致
+            limit: 最大件数
+            
+        Returns:
+            List[Dict]: 映画情報のリスト
+        """
+        if self.db:
+            return self.db.find_by_title(title, prefix=prefix, limit=limit)
+        
+        data = self.load_movies() or {}
+        matches = [
+            movie for movie in data.get('movies', [])
+            if (movie['title'].startswith(title) if prefix else movie['title'] == title)
+        ]
+        return matches[:limit]
+    
+    def find_by_release_date(self, start: date, end: date) -> List[Dict]:
+        """
+        公開日の範囲で映画を検索
+        
+        Args:
+            start: 開始日（含む）
+            end: 終了日（含む）
+            
+        Returns:
+            List[Dict]: 公開日順の映画情報のリスト
+        """
+        if self.db:
+            return self.db.find_by_release_date(start, end)
+        
+        data = self.load_movies() or {}
+        matches = []
+        for movie in data.get('movies', []):
+            release_date = parse_release_date(movie.get('release_date', ''))
+            if release_date and start <= release_date.date() <= end:
+                matches.append((release_date, movie))
+        return [movie for _, movie in sorted(matches, key=lambda item: item[0])]
 
 
 def test_storage():
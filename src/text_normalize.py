@@ -0,0 +1,89 @@
+"""検索・キャッシュキー用の文字列正規化モジュール"""
+
+import unicodedata
+from functools import lru_cache
+
+# カタカナ（ァ〜ヶ）-> ひらがな（ぁ〜ゖ）
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord('ァ'), ord('ヶ') + 1)}
+
+# 長音記号・波ダッシュ（表記ゆれが多いため削除する）
+_LONG_VOWEL_MARKS = {ord(c): None for c in 'ー〜〰'}
+
+_TRANSLATION_TABLE = {**_KATAKANA_TO_HIRAGANA, **_LONG_VOWEL_MARKS}
+
+# 残す文字の種類（文字・数字・結合文字）。句読点・記号・空白・制御文字は削除する
+_KEPT_CATEGORIES = ('L', 'N', 'M')
+
+
+@lru_cache(maxsize=4096)
+def normalize_key(text: str) -> str:
+    """
+    キャッシュキー用に文字列を正規化
+    
+    normalize_text のうち、映画.comの検索結果が変わらない表記ゆれの統一だけを行う。
+    1. NFKC正規化（全角英数字・半角カナ・互換文字を統一）
+    2. 大文字小文字の統一（casefold）
+    3. 前後の空白の削除・連続する空白を1つに統一
+    
+    長音記号・記号の削除やかなの統一は「ビール」と「ビル」、「1/2」と「12」のように
+    別の作品を探すキーワードを同じキーにしてしまうため行わない。
+    
+    Args:
+        text: 検索キーワード
+    
+    Returns:
+        str: 正規化した文字列
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text or '').casefold().split())
+
+
+@lru_cache(maxsize=4096)
+def normalize_text(text: str) -> str:
+    """
+    検索用に文字列を正規化
+    
+    1. NFKC正規化（全角英数字・半角カナ・互換文字を統一）
+    2. 大文字小文字の統一（casefold）
+    3. カタカナをひらがなに変換
+    4. 長音記号の削除
+    5. 句読点・記号・空白の削除
+    
+    例: 'ＳＰＹ×ＦＡＭＩＬＹ' -> 'spyfamily'、'ｽﾊﾟｲﾀﾞｰﾏﾝ' -> 'すぱいだまん'
+    
+    Args:
+        text: タイトルまたは検索クエリ
+    
+    Returns:
+        str: 正規化した文字列
+    """
+    text = normalize_key(text).translate(_TRANSLATION_TABLE)
+    return ''.join(c for c in text if unicodedata.category(c)[0] in _KEPT_CATEGORIES)
+
+
+def test_text_normalize():
+    """文字列正規化のテスト"""
+    print("文字列正規化のテスト...\n")
+    
+    samples = [
+        ('ＳＰＹ×ＦＡＭＩＬＹ', 'spy family'),
+        ('スパイダーマン', 'ｽﾊﾟｲﾀﾞｰﾏﾝ'),
+        ('名探偵コナン 100万ドルの五稜星', '名探偵こなん100万ドルの五稜星'),
+        ('ラーメン', 'らめん'),
+        ('劇場版「鬼滅の刃」無限列車編', '劇場版 鬼滅の刃 無限列車編'),
+    ]
+    for left, right in samples:
+        left_normalized = normalize_text(left)
+        right_normalized = normalize_text(right)
+        mark = '✓' if left_normalized == right_normalized else '❌'
+        print(f"{mark} '{left}' -> '{left_normalized}' / '{right}' -> '{right_normalized}'")
+    
+    print("\nキャッシュキー（別の作品を探すキーワードは同じにしない）")
+    for left, right in [('ＳＰＹ×ＦＡＭＩＬＹ', 'spy×family'), ('ビール', 'ビル'), ('1/2', '12')]:
+        mark = '=' if normalize_key(left) == normalize_key(right) else '≠'
+        print(f"   '{left}' -> '{normalize_key(left)}' {mark} '{right}' -> '{normalize_key(right)}'")
+    
+    print(f"\nキャッシュ: {normalize_text.cache_info()}")
+
+
+if __name__ == "__main__":
+    test_text_normalize()
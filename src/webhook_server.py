@@ -1,21 +1,47 @@
 """LINE Webhook サーバー"""
 
+import atexit
 import json
 import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-from flask import Flask, abort, request
+from flask import Flask, abort, jsonify, request
+from werkzeug.exceptions import HTTPException
 
-from line_notifier import LineNotifier
+from async_scraper import get_shared_async_scraper, run_sync
+from background_refresh import BackgroundRefresher
+from event_dedup import EventDeduplicator
+from line_notifier import LineNotifier, get_line_notifier
+from movie_search import get_movie_search
 from movie_theater_search import TheaterSearchManager
-from scraper import MovieScraper
+from reply_snapshot import ReplySnapshotStore, build_reply_messages
+from search_cache import get_search_cache
 from session_manager import SessionManager
-from storage import MovieStorage
+from work_queue import EventWorkQueue
 
 app = Flask(__name__)
 
 # グローバルセッションマネージャー
 session_manager = SessionManager()
 
+# リッチメニュー（今週公開・上映中）の作成済み応答
+reply_snapshots = ReplySnapshotStore()
+
+# 今週公開・上映中の一覧と検索インデックスを定期的に更新（gunicornのワーカー間で1つだけ実行）
+background_refresher = BackgroundRefresher(reply_snapshots, get_movie_search().storage)
+background_refresher.start()
+
+# LINEから再送されたイベント（処理済みのwebhookEventId）の検出
+event_dedup = EventDeduplicator()
+
+# Webhookの処理方式（sync: 受信したリクエスト内で処理 / queue: キューに入れてすぐに応答）
+WEBHOOK_MODE = os.getenv('WEBHOOK_MODE', 'sync')
+if WEBHOOK_MODE not in ('sync', 'queue'):
+    raise ValueError(f"不明なWebhookの処理方式です: {WEBHOOK_MODE}（sync, queue のいずれか）")
+
+# スナップショットが無い場合に映画.comからの取得を待つ最大秒数（超えたら古いスナップショットで応答）
+WEBHOOK_FETCH_TIMEOUT = float(os.getenv('WEBHOOK_FETCH_TIMEOUT', '25'))
+
 
 def is_movie_search_query(text: str) -> bool:
     """
@@ -49,8 +75,8 @@ def webhook():
     print(f"Signature: {signature[:20]}..." if signature else "Signature: なし")
     
     try:
-        notifier = LineNotifier()
-        print("✓ LineNotifier初期化成功")
+        notifier = get_line_notifier()
+        print("✓ LineNotifier取得成功")
         
         # 署名を検証
         if notifier.channel_secret:
@@ -70,37 +96,42 @@ def webhook():
         events = json.loads(body)['events']
         print(f"イベント数: {len(events)}")
         
-        for i, event in enumerate(events, 1):
-            event_type = event.get('type')
-            print(f"\n--- イベント {i}/{len(events)} ---")
-            print(f"タイプ: {event_type}")
-            
-            # メッセージイベント
-            if event_type == 'message':
-                message_type = event['message'].get('type')
-                print(f"メッセージタイプ: {message_type}")
-                
-                if message_type == 'text':
-                    handle_text_message(event, notifier)
-                elif message_type in ['image', 'sticker', 'location', 'video', 'audio']:
-                    handle_unsupported_message(event, notifier)
-            
-            # Postbackイベント（リッチメニューボタンなど）
-            elif event_type == 'postback':
-                print(f"Postback data: {event['postback'].get('data')}")
-                handle_postback_event(event, notifier)
+        # 処理済み・処理中のイベント（応答が遅れてLINEが再送したもの）は処理の前に破棄する
+        claimed = [event for event in events if event_dedup.claim(event)]
+        if len(claimed) < len(events):
+            print(f"ℹ️  処理済みのイベントを{len(events) - len(claimed)}件スキップしました")
+        # 確保したが処理済みとして確定していないイベント（503/500の場合は確保を取り消す）
+        pending = list(claimed)
+        
+        try:
+            if WEBHOOK_MODE == 'queue':
+                # キューに入れてすぐに応答し、処理はワーカースレッドで行う
+                # （すべてのイベントが入る空きが無い場合は1件も入れずに503を返し、LINEの再送に任せる）
+                if not work_queue.submit_batch([
+                    ((event, notifier), event.get('source', {}).get('userId')) for event in claimed
+                ]):
+                    abort(503)
+                while pending:
+                    event_dedup.commit(pending.pop(0))
+                print(f"✓ {len(claimed)}件のイベントをキューに追加しました（待ち: {work_queue.stats()['depth']}件）")
+                return 'OK', 200
             
-            # Follow/Unfollowイベント
-            elif event_type == 'follow':
-                handle_follow_event(event, notifier)
-            elif event_type == 'unfollow':
-                handle_unfollow_event(event)
+            for i, event in enumerate(claimed, 1):
+                print(f"\n--- イベント {i}/{len(claimed)} ---")
+                handle_event(event, notifier)
+                event_dedup.commit(pending.pop(0))
+        finally:
+            # LINEの再送で処理できるよう、処理できなかったイベントの確保を取り消す
+            for event in pending:
+                event_dedup.release(event)
         
         print("\n" + "=" * 60)
         print("Webhook処理完了")
         print("=" * 60)
         return 'OK', 200
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Webhookエラー: {e}")
         import traceback
@@ -108,6 +139,45 @@ def webhook():
         abort(500)
 
 
+def handle_event(event: dict, notifier: LineNotifier):
+    """
+    イベントの種類に応じて処理を振り分け
+    
+    Args:
+        event: LINEイベント
+        notifier: LineNotifierインスタンス
+    """
+    event_type = event.get('type')
+    print(f"タイプ: {event_type}")
+    
+    # メッセージイベント
+    if event_type == 'message':
+        message_type = event['message'].get('type')
+        print(f"メッセージタイプ: {message_type}")
+        
+        if message_type == 'text':
+            handle_text_message(event, notifier)
+        elif message_type in ['image', 'sticker', 'location', 'video', 'audio']:
+            handle_unsupported_message(event, notifier)
+    
+    # Postbackイベント（リッチメニューボタンなど）
+    elif event_type == 'postback':
+        print(f"Postback data: {event['postback'].get('data')}")
+        handle_postback_event(event, notifier)
+    
+    # Follow/Unfollowイベント
+    elif event_type == 'follow':
+        handle_follow_event(event, notifier)
+    elif event_type == 'unfollow':
+        handle_unfollow_event(event)
+
+
+# WEBHOOK_MODE=queue の場合にイベントを処理するワークキュー
+work_queue = EventWorkQueue(handle_event)
+# ワーカープロセスの終了時（gunicornの再起動など）に、キューに残っているイベントを処理し終えるまで待つ
+atexit.register(work_queue.shutdown)
+
+
 def handle_text_message(event: dict, notifier: LineNotifier):
     """
     テキストメッセージを処理（セッション管理統合版）
@@ -131,7 +201,8 @@ def handle_text_message(event: dict, notifier: LineNotifier):
     if user_state == 'movie_search':
         # 映画検索モード
         print(f"  → 映画検索モード")
-        handle_movie_search(message_text, reply_token, user_id, notifier)
+        # 検索結果に入力途中のタイトルの補完候補を付ける（候補を選ぶと通常モードでそのタイトルを検索する）
+        handle_movie_search(message_text, reply_token, user_id, notifier, suggest=True)
         session_manager.clear_user_state(user_id)
     
     elif user_state == 'theater_search':
@@ -199,55 +270,74 @@ def handle_postback_event(event: dict, notifier: LineNotifier):
     elif postback_data == 'action=weekly_new':
         print("  → 今週公開映画を表示")
         # 今週公開映画を表示
-        try:
-            scraper = MovieScraper()
-            movies = scraper.fetch_upcoming_movies()
-            
-            if movies:
-                print(f"  今週公開映画: {len(movies)}件")
-                success = notifier.reply_movie_info(reply_token, movies)
-                print(f"  Reply結果: {'成功' if success else '失敗'}")
-            else:
-                print("  今週公開映画なし")
-                quick_reply_items = notifier._get_main_menu_quick_reply_items()
-                success = notifier.reply_text_message_with_quick_reply(
-                    reply_token,
-                    "今週公開予定の映画はありません",
-                    quick_reply_items
-                )
-                print(f"  Reply結果: {'成功' if success else '失敗'}")
-        except Exception as e:
-            print(f"  ❌ エラー: 今週公開映画の処理に失敗 - {e}")
-            import traceback
-            traceback.print_exc()
+        handle_movie_list_postback(
+            'weekly_new',
+            reply_token,
+            notifier,
+            lambda scraper: scraper.fetch_upcoming_movies()
+        )
     
     elif postback_data == 'action=now_showing':
         print("  → 上映中映画を表示")
         # 上映中映画を表示
-        try:
-            scraper = MovieScraper()
-            movies = scraper.fetch_movies_released_in_past_week()
+        handle_movie_list_postback(
+            'now_showing',
+            reply_token,
+            notifier,
+            lambda scraper: scraper.fetch_movies_released_in_past_week()
+        )
+
+
+def handle_movie_list_postback(name: str, reply_token: str, notifier: LineNotifier, fetch) -> None:
+    """
+    今週公開・上映中の映画一覧をReply
+    
+    作成済みの応答スナップショットがあればそのまま返し、
+    無いか古い場合だけ映画.comから取得してスナップショットを作り直す。
+    
+    Args:
+        name: スナップショット名（'weekly_new' / 'now_showing'）
+        reply_token: リプライトークン
+        notifier: LineNotifierインスタンス
+        fetch: 共有スクレイパーを受け取り、映画一覧を取得するコルーチンを返す関数
+    """
+    try:
+        messages = reply_snapshots.get(name)
+        if messages is not None:
+            print(f"  応答スナップショットを使用（{reply_snapshots.age(name):.0f}秒前に作成）")
+        else:
+            print("  応答スナップショットが無いか古いため、映画.comから取得します")
+            try:
+                movies = run_sync(fetch(get_shared_async_scraper()), timeout=WEBHOOK_FETCH_TIMEOUT)
+            except FutureTimeoutError:
+                print(f"  ⚠️  映画.comからの取得が{WEBHOOK_FETCH_TIMEOUT:.0f}秒以内に終わりませんでした")
+                movies = []
+            print(f"  取得結果: {len(movies)}件")
             
             if movies:
-                print(f"  上映中映画: {len(movies)}件")
-                success = notifier.reply_movie_info(reply_token, movies)
-                print(f"  Reply結果: {'成功' if success else '失敗'}")
+                messages = build_reply_messages(notifier, name, movies)
+                reply_snapshots.save(name, messages, len(movies))
             else:
-                print("  上映中映画なし")
-                quick_reply_items = notifier._get_main_menu_quick_reply_items()
-                success = notifier.reply_text_message_with_quick_reply(
-                    reply_token,
-                    "現在上映中の映画はありません",
-                    quick_reply_items
-                )
-                print(f"  Reply結果: {'成功' if success else '失敗'}")
-        except Exception as e:
-            print(f"  ❌ エラー: 上映中映画の処理に失敗 - {e}")
-            import traceback
-            traceback.print_exc()
-
-
-def handle_movie_search(query: str, reply_token: str, user_id: str, notifier: LineNotifier):
+                # 取得に失敗した場合も考え、古いスナップショットがあればそちらを返す
+                messages = reply_snapshots.get(name, allow_stale=True)
+                if messages is None:
+                    messages = build_reply_messages(notifier, name, [])
+        
+        success = notifier.reply_messages(reply_token, messages)
+        print(f"  Reply結果: {'成功' if success else '失敗'}")
+    except Exception as e:
+        print(f"  ❌ エラー: 映画一覧の処理に失敗（{name}） - {e}")
+        import traceback
+        traceback.print_exc()
+
+
+def handle_movie_search(
+    query: str,
+    reply_token: str,
+    user_id: str,
+    notifier: LineNotifier,
+    suggest: bool = False
+):
     """
     映画検索を実行
     
@@ -256,33 +346,24 @@ def handle_movie_search(query: str, reply_token: str, user_id: str, notifier: Li
         reply_token: リプライトークン
         user_id: ユーザーID
         notifier: LineNotifierインスタンス
+        suggest: 入力途中のタイトルの補完候補を検索結果のQuick Replyに付けるかどうか
     """
     print(f"  [handle_movie_search] 映画検索実行: {query}")
     print(f"  [handle_movie_search] Reply Token: {reply_token[:20]}...")
     
-    # 映画を検索
-    scraper = MovieScraper()
-    search_results = scraper.search_movie_by_keyword(query)
-    print(f"  [handle_movie_search] Web検索結果: {len(search_results)}件")
-    
-    # ローカルストレージからも検索（過去/未来の映画情報）
-    storage = MovieStorage()
-    stored_data = storage.load_movies()
-    
-    # ストレージからも候補を探す
-    if stored_data and 'movies' in stored_data:
-        stored_movies = stored_data['movies']
-        for movie in stored_movies:
-            if query.lower() in movie['title'].lower():
-                # 重複チェック
-                if not any(m['title'] == movie['title'] for m in search_results):
-                    search_results.append(movie)
-        print(f"  [handle_movie_search] ストレージ追加後: {len(search_results)}件")
+    # 保存済みデータの検索インデックスで答えられない場合だけ映画.comを検索する
+    search_results = get_movie_search().search(query)
     
     print(f"  [handle_movie_search] 最終検索結果: {len(search_results)}件")
+    print(f"  [handle_movie_search] 検索キャッシュ: {get_search_cache().stats()}")
+    
+    # 補完候補は保存済みデータのインデックスから取得する（映画.comには問い合わせない）
+    suggestions = get_movie_search().suggest_titles(query) if suggest else []
+    if suggestions:
+        print(f"  [handle_movie_search] 補完候補: {len(suggestions)}件")
     
     # 結果をReply
-    notifier.reply_movie_info(reply_token, search_results)
+    notifier.reply_movie_info(reply_token, search_results, suggestions)
 
 
 def handle_theater_search(query: str, reply_token: str, user_id: str, notifier: LineNotifier):
@@ -393,6 +474,28 @@ def health():
     return 'OK', 200
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    メトリクスエンドポイント（ワークキュー・重複検出・セッション・LINE API・検索・キャッシュ・バックグラウンド更新の統計情報）
+    """
+    try:
+        line_api = get_line_notifier().stats()
+    except ValueError:
+        line_api = None
+    
+    return jsonify({
+        'webhook_mode': WEBHOOK_MODE,
+        'work_queue': work_queue.stats(),
+        'event_dedup': event_dedup.stats(),
+        'sessions': session_manager.stats(),
+        'line_api': line_api,
+        'movie_search': get_movie_search().stats(),
+        'search_cache': get_search_cache().stats(),
+        'background_refresh': background_refresher.stats(),
+    }), 200
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
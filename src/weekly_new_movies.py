@@ -5,66 +5,14 @@ import sys
 from datetime import datetime
 
 from line_notifier import LineNotifier
+from pipeline import run_pipeline
 from scraper import MovieScraper
 
 
 def main():
     """今週公開映画の週次通知メイン処理"""
-    print("=" * 60)
-    print("今週公開映画 週次通知 - 実行開始")
-    print("=" * 60)
-    print()
-    
-    # 1. スクレイパーを初期化
-    scraper = MovieScraper()
-    
-    # 2. 今週公開の映画を取得
-    print("--- 今週公開映画の取得 ---")
-    movies = scraper.fetch_upcoming_movies()
-    print(f"取得件数: {len(movies)}件")
-    print()
-    
-    # 3. 映画がない場合は通知をスキップ
-    if not movies:
-        print("ℹ️  今週公開の映画がないため、通知をスキップします")
-        print("=" * 60)
-        print("処理が完了しました")
-        print("=" * 60)
-        return
-    
-    # 4. 通知を送信
-    print("--- LINE通知 ---")
-    if os.getenv('LINE_CHANNEL_ACCESS_TOKEN') and os.getenv('LINE_USER_ID'):
-        try:
-            notifier = LineNotifier()
-            success = notifier.send_weekly_new_movies_notification(movies)
-            
-            if success:
-                print("✓ 今週公開映画の通知を送信しました")
-                print()
-                print("【今週公開の映画】")
-                for i, movie in enumerate(movies[:10], 1):  # 最大10件まで表示
-                    print(f"  {i}. {movie['title']} ({movie['release_date']})")
-                if len(movies) > 10:
-                    print(f"  ...他 {len(movies) - 10}件")
-                print()
-            else:
-                print("⚠️  今週公開映画の通知送信に失敗しました")
-                
-        except Exception as e:
-            print(f"エラー: 今週公開映画の通知でエラーが発生しました - {e}")
-            import traceback
-            traceback.print_exc()
-    else:
-        print("ℹ️  LINE通知は環境変数が設定されていないためスキップされました")
-        print("   以下の環境変数を設定してください:")
-        print("   - LINE_CHANNEL_ACCESS_TOKEN")
-        print("   - LINE_USER_ID")
-    print()
-    
-    print("=" * 60)
-    print("処理が完了しました")
-    print("=" * 60)
+    # 取得・通知の処理は pipeline.BatchPipeline にまとめている
+    run_pipeline(['weekly_new'], "今週公開映画 週次通知")
 
 
 def test_weekly_new_movies():
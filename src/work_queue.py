@@ -0,0 +1,290 @@
+"""Webhookのイベントを受信後に非同期で処理するワークキューのモジュール"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class EventWorkQueue:
+    """上限付きのキューとワーカースレッドでイベントを処理するクラス
+    
+    Webhookは署名検証後にイベントをキューに入れてすぐに200を返し、
+    映画.comの取得やLINEへのReplyはワーカースレッドで行う。
+    同じユーザーのイベントは同じワーカーのキューに入れ、受信した順に処理する
+    （セッションの状態を変えるイベントの順序が入れ替わらないようにするため）。
+    キューが満杯の場合の動作（バックプレッシャー）は full_policy で選ぶ。
+    - inline: 受信したスレッドでそのまま処理する（従来の同期処理と同じ動作になる）
+    - reject: 受け付けずにFalseを返す（Webhookは503を返し、LINEの再送に任せる）
+    1回のWebhookの複数のイベントは submit_batch でまとめて投入し、すべて入る空きがある場合だけキューに入れる。
+    """
+    
+    FULL_POLICIES = ('inline', 'reject')
+    
+    DEFAULT_WORKERS = 4
+    DEFAULT_MAX_SIZE = 100
+    DEFAULT_DRAIN_TIMEOUT = 20
+    
+    def __init__(
+        self,
+        handler: Callable[..., None],
+        workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+        full_policy: Optional[str] = None
+    ):
+        """
+        初期化
+        
+        Args:
+            handler: イベントを処理する関数（submit に渡した引数で呼ばれる）
+            workers: ワーカースレッド数（Noneの場合は環境変数 WEBHOOK_WORKERS、デフォルト4）
+            max_size: キューの最大件数（ワーカー全体の合計、Noneの場合は環境変数 WEBHOOK_QUEUE_SIZE、デフォルト100）
+            full_policy: キューが満杯の場合の動作
+                （Noneの場合は環境変数 WEBHOOK_QUEUE_FULL、デフォルト inline）
+        """
+        self.handler = handler
+        self.workers = workers or int(os.getenv('WEBHOOK_WORKERS', str(self.DEFAULT_WORKERS)))
+        self.max_size = max_size or int(os.getenv('WEBHOOK_QUEUE_SIZE', str(self.DEFAULT_MAX_SIZE)))
+        self.full_policy = full_policy or os.getenv('WEBHOOK_QUEUE_FULL', 'inline')
+        if self.full_policy not in self.FULL_POLICIES:
+            raise ValueError(
+                f"不明なキュー満杯時の動作です: {self.full_policy}（{', '.join(self.FULL_POLICIES)} のいずれか）"
+            )
+        
+        # ワーカーごとのキュー（キューに入れた時刻, 引数）
+        shard_size = max(1, -(-self.max_size // self.workers))
+        self._queues: "List[queue.Queue[Tuple[float, tuple]]]" = [
+            queue.Queue(maxsize=shard_size) for _ in range(self.workers)
+        ]
+        self._threads: List[Optional[threading.Thread]] = [None] * self.workers
+        self._next_shard = 0
+        self._lock = threading.Lock()
+        # 空きの確認からキューへの投入までを他の投入と重ねないためのロック
+        self._submit_lock = threading.Lock()
+        
+        self._counts = {'enqueued': 0, 'processed': 0, 'failed': 0, 'inline': 0, 'rejected': 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._processing_total = 0.0
+        self._processing_max = 0.0
+    
+    def _ensure_started(self) -> None:
+        """ワーカースレッドを起動（gunicornのワーカープロセスごとに最初の投入時に起動する）"""
+        with self._lock:
+            for i, thread in enumerate(self._threads):
+                if thread is None or not thread.is_alive():
+                    thread = threading.Thread(
+                        target=self._worker, args=(self._queues[i],), name=f'webhook-worker-{i + 1}', daemon=True
+                    )
+                    thread.start()
+                    self._threads[i] = thread
+    
+    def _shard(self, key: Optional[str]) -> int:
+        """イベントを入れるキューの番号を選ぶ（キーが無い場合は順番に振り分ける）"""
+        if key is None:
+            with self._lock:
+                index = self._next_shard
+                self._next_shard = (self._next_shard + 1) % self.workers
+            return index
+        return hash(key) % self.workers
+    
+    def submit(self, *args, key: Optional[str] = None) -> bool:
+        """
+        イベントをキューに入れる
+        
+        Args:
+            *args: handler に渡す引数
+            key: 順序を保つ単位（同じキーのイベントは同じワーカーが順に処理する）
+        
+        Returns:
+            bool: 処理を受け付けた場合True（reject でキューが満杯の場合はFalse）
+        """
+        return self.submit_batch([(args, key)])
+    
+    def submit_batch(self, items: List[Tuple[tuple, Optional[str]]]) -> bool:
+        """
+        複数のイベントをまとめてキューに入れる（すべて入れるか、1件も入れない）
+        
+        キューの空きが足りない場合、reject では1件も入れずにFalseを返し、
+        inline では受信したスレッドですべてを順に処理する（一部だけ先に処理されて順序が入れ替わらないように）。
+        キューが空でも入りきらない件数の場合は、再送しても受け付けられないため reject でも受信したスレッドで処理する。
+        
+        Args:
+            items: (handler に渡す引数, 順序を保つキー) のリスト
+        
+        Returns:
+            bool: 処理を受け付けた場合True（reject でキューが満杯の場合はFalse）
+        """
+        if not items:
+            return True
+        
+        self._ensure_started()
+        shards = [self._shard(key) for _, key in items]
+        with self._submit_lock:
+            # 取り出しはワーカーが並行して行うが、空きは減らないため確認後の投入は必ず入る
+            needed = Counter(shards)
+            fits = all(
+                self._queues[index].maxsize - self._queues[index].qsize() >= count
+                for index, count in needed.items()
+            )
+            oversized = any(count > self._queues[index].maxsize for index, count in needed.items())
+            if fits:
+                enqueued_at = time.perf_counter()
+                for index, (args, _) in zip(shards, items):
+                    self._queues[index].put_nowait((enqueued_at, args))
+        
+        if fits:
+            with self._lock:
+                self._counts['enqueued'] += len(items)
+            return True
+        
+        if self.full_policy == 'reject' and not oversized:
+            print(f"⚠️  ワークキューに{len(items)}件の空きが無いため受け付けませんでした（{self.max_size}件）")
+            with self._lock:
+                self._counts['rejected'] += len(items)
+            return False
+        
+        print(f"⚠️  ワークキューに{len(items)}件の空きが無いため、受信したスレッドで処理します（{self.max_size}件）")
+        for args, _ in items:
+            self._count('inline')
+            self._process(time.perf_counter(), args)
+        return True
+    
+    def _worker(self, work_queue: "queue.Queue[Tuple[float, tuple]]") -> None:
+        """キューからイベントを取り出して処理"""
+        while True:
+            enqueued_at, args = work_queue.get()
+            try:
+                self._process(enqueued_at, args)
+            finally:
+                work_queue.task_done()
+    
+    def _process(self, enqueued_at: float, args: tuple) -> None:
+        """イベントを処理し、待ち時間と処理時間を記録"""
+        start = time.perf_counter()
+        failed = False
+        try:
+            self.handler(*args)
+        except Exception as e:
+            failed = True
+            print(f"❌ イベントの処理でエラーが発生しました: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        elapsed = time.perf_counter() - start
+        wait = start - enqueued_at
+        with self._lock:
+            self._counts['failed' if failed else 'processed'] += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._processing_total += elapsed
+            self._processing_max = max(self._processing_max, elapsed)
+    
+    def _count(self, name: str) -> None:
+        """件数を加算"""
+        with self._lock:
+            self._counts[name] += 1
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        キューに入っているイベントの処理が終わるまで待つ
+        
+        Args:
+            timeout: 待つ最大秒数（Noneの場合は終わるまで待つ）
+        
+        Returns:
+            bool: すべての処理が終わった場合True（timeout を過ぎた場合はFalse）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for work_queue in self._queues:
+            with work_queue.all_tasks_done:
+                while work_queue.unfinished_tasks:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    work_queue.all_tasks_done.wait(remaining)
+        return True
+    
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """
+        終了時にキューに残っているイベントを処理し終えるまで待つ
+        
+        ワーカースレッドはデーモンのため、待たずにプロセスが終了すると処理中・待機中のイベントが失われる。
+        
+        Args:
+            timeout: 待つ最大秒数（Noneの場合は環境変数 WEBHOOK_DRAIN_TIMEOUT、デフォルト20秒）
+        
+        Returns:
+            bool: すべての処理が終わった場合True
+        """
+        if timeout is None:
+            timeout = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', str(self.DEFAULT_DRAIN_TIMEOUT)))
+        pending = sum(work_queue.unfinished_tasks for work_queue in self._queues)
+        if not pending:
+            return True
+        
+        print(f"ℹ️  ワークキューの{pending}件の処理を待っています（最大{timeout:g}秒）")
+        if self.join(timeout):
+            print("✓ ワークキューの処理が完了しました")
+            return True
+        
+        remaining = sum(work_queue.unfinished_tasks for work_queue in self._queues)
+        print(f"⚠️  ワークキューの{remaining}件が処理されないまま終了します")
+        return False
+    
+    def stats(self) -> Dict:
+        """
+        ワークキューの統計情報を取得
+        
+        Returns:
+            Dict: キューの件数・各件数・待ち時間と処理時間の平均と最大（ミリ秒）
+        """
+        with self._lock:
+            done = self._counts['processed'] + self._counts['failed']
+            return {
+                'depth': sum(work_queue.qsize() for work_queue in self._queues),
+                'max_size': self.max_size,
+                'workers': sum(1 for thread in self._threads if thread is not None and thread.is_alive()),
+                'full_policy': self.full_policy,
+                **self._counts,
+                'wait_avg_ms': round(self._wait_total / done * 1000, 2) if done else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 2),
+                'processing_avg_ms': round(self._processing_total / done * 1000, 2) if done else 0.0,
+                'processing_max_ms': round(self._processing_max * 1000, 2),
+            }
+
+
+def test_work_queue():
+    """ワークキューのテスト"""
+    print("ワークキューのテスト...\n")
+    
+    def handler(event: Dict) -> None:
+        time.sleep(0.1)
+        if event.get('fail'):
+            raise RuntimeError("テスト用のエラー")
+    
+    for policy in EventWorkQueue.FULL_POLICIES:
+        work_queue = EventWorkQueue(handler, workers=2, max_size=3, full_policy=policy)
+        start = time.perf_counter()
+        accepted = [work_queue.submit({'id': i, 'fail': i == 0}, key=f'user{i % 3}') for i in range(10)]
+        submit_time = time.perf_counter() - start
+        work_queue.join()
+        
+        print(f"\n[{policy}] 受け付け: {sum(accepted)}/10件（投入にかかった時間: {submit_time:.2f}秒）")
+        print(f"統計: {work_queue.stats()}\n")
+    
+    print("まとめて投入（空きが足りない場合は1件も入れない）")
+    work_queue = EventWorkQueue(handler, workers=2, max_size=8, full_policy='reject')
+    batch = [(({'id': i},), 'user1') for i in range(5)]
+    print(f"   同じユーザーの3件（容量4件）: 受け付け={work_queue.submit_batch(batch[:3])}")
+    print(f"   続けて同じユーザーの3件: 受け付け={work_queue.submit_batch(batch[:3])}（深さ: {work_queue.stats()['depth']}件）")
+    print(f"   終了時の待機（最大0.05秒）: 完了={work_queue.shutdown(timeout=0.05)}")
+    print(f"   終了時の待機（最大1秒）: 完了={work_queue.shutdown(timeout=1)}")
+    print(f"   同じユーザーの5件（容量4件）: 受け付け={work_queue.submit_batch(batch)}")
+    print(f"統計: {work_queue.stats()}")
+
+
+if __name__ == "__main__":
+    test_work_queue()
@@ -0,0 +1,141 @@
+"""パーサーバックエンドの等価性チェックとベンチマーク
+
+tools/fixtures/eiga/ 以下に保存したHTMLを各バックエンドでパースし、
+結果が一致するかを確認したうえで、1ページあたりのパース時間と
+ピークメモリ使用量を比較します。
+
+使い方:
+    python tools/benchmark_parser.py          # 保存済みフィクスチャで比較
+    python tools/benchmark_parser.py --save   # 映画.comから現在のページを保存してから比較
+"""
+
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# キャッシュを使わずに毎回パースさせる
+os.environ['SCRAPER_HTTP_CACHE'] = '0'
+os.environ['SCRAPER_PARSE_CACHE'] = '0'
+
+from scraper import MovieScraper
+
+FIXTURES_DIR = Path(os.path.dirname(__file__)) / 'fixtures' / 'eiga'
+RUNS = 20
+
+# フィクスチャのファイル名の接頭辞 -> (ページ種類, パース関数名)
+PAGE_KINDS = {
+    'upcoming': ('upcoming', '_parse_upcoming_movies'),
+    'now_showing': ('now_showing', '_parse_now_showing_movies'),
+    'search': ('search', '_parse_search_results'),
+}
+
+# --save で保存するページ
+LIVE_PAGES = {
+    'upcoming_live.html': f"{MovieScraper.BASE_URL}/upcoming/",
+    'now_showing_live.html': f"{MovieScraper.BASE_URL}/now/",
+    'search_live.html': f"{MovieScraper.BASE_URL}/search/?search=%E3%82%B3%E3%83%8A%E3%83%B3",
+}
+
+
+def save_live_pages():
+    """映画.comの現在のページをフィクスチャとして保存"""
+    scraper = MovieScraper()
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    
+    for filename, url in LIVE_PAGES.items():
+        print(f"保存中: {url}")
+        response = scraper.session.get(url, timeout=30)
+        response.raise_for_status()
+        response.encoding = response.apparent_encoding
+        (FIXTURES_DIR / filename).write_text(response.text, encoding='utf-8')
+    print()
+
+
+def strip_volatile(movies):
+    """比較用に実行ごとに変わる項目を除外"""
+    return [{k: v for k, v in movie.items() if k != 'scraped_at'} for movie in movies]
+
+
+def measure(scraper, kind, html, parse_func):
+    """
+    1ページあたりのパース時間（中央値）とピークメモリを計測
+    
+    Returns:
+        tuple: (パース結果, 中央値ミリ秒, ピークKB)
+    """
+    durations = []
+    movies = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        movies = scraper._parse_with_backend(kind, html, parse_func)
+        durations.append((time.perf_counter() - start) * 1000)
+    
+    tracemalloc.start()
+    scraper._parse_with_backend(kind, html, parse_func)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return movies, statistics.median(durations), peak / 1024
+
+
+def main():
+    """メイン処理"""
+    if len(sys.argv) > 1 and sys.argv[1] == '--save':
+        save_live_pages()
+    
+    fixtures = sorted(FIXTURES_DIR.glob('*.html'))
+    if not fixtures:
+        print(f"フィクスチャが見つかりません: {FIXTURES_DIR}")
+        return False
+    
+    scrapers = {
+        backend: MovieScraper(parser_backend=backend)
+        for backend in MovieScraper.PARSER_BACKENDS
+    }
+    reference = scrapers['full']
+    
+    print("=" * 78)
+    print(f"{'フィクスチャ':<32}{'backend':<10}{'件数':>6}{'時間(ms)':>12}{'ピーク(KB)':>14}  一致")
+    print("=" * 78)
+    
+    all_equal = True
+    for path in fixtures:
+        prefix = next((p for p in PAGE_KINDS if path.name.startswith(p)), None)
+        if prefix is None:
+            continue
+        kind, parse_func_name = PAGE_KINDS[prefix]
+        html = path.read_text(encoding='utf-8')
+        
+        expected = None
+        for backend, scraper in scrapers.items():
+            parse_func = getattr(scraper, parse_func_name)
+            # パース関数内のログ出力は計測対象外にする
+            sys.stdout = open(os.devnull, 'w')
+            try:
+                movies, median_ms, peak_kb = measure(scraper, kind, html, parse_func)
+            finally:
+                sys.stdout.close()
+                sys.stdout = sys.__stdout__
+            
+            result = strip_volatile(movies)
+            if scraper is reference:
+                expected = result
+            equal = result == expected
+            all_equal = all_equal and equal
+            
+            print(f"{path.name:<32}{backend:<10}{len(movies):>6}{median_ms:>12.2f}{peak_kb:>14.0f}  "
+                  f"{'✓' if equal else '❌'}")
+    
+    print("=" * 78)
+    print("✓ すべてのバックエンドの結果が一致しました" if all_equal else "❌ 結果が一致しないフィクスチャがあります")
+    return all_equal
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,241 @@
+"""タイトル検索インデックスのベンチマーク
+
+合成した映画タイトル（デフォルト10万件）に対して、
+従来の線形走査（query in title）と検索インデックスを比較します。
+Web検索と保存済みデータの検索結果の結合も、従来のタイトルでの重複排除と比較します。
+インデックスの構築時間・メモリ、差分更新中の検索時間、1クエリあたりの検索時間（中央値・p95）を出力し、
+線形走査で見つかるタイトルがインデックスの結果にすべて含まれることを確認します。
+
+使い方:
+    python tools/benchmark_search.py
+    python tools/benchmark_search.py --size 20000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from movie_search import merge_search_results
+from search_index import TitleSearchIndex
+from text_normalize import normalize_text
+
+# 合成タイトルの部品
+WORDS = [
+    '名探偵', 'コナン', '劇場版', '君の', '名は', '天気の子', '鬼滅の刃', '無限列車', '呪術廻戦',
+    'ワンピース', 'スパイファミリー', 'SPY×FAMILY', 'ドラえもん', 'のび太', '宇宙', '小戦争',
+    'ゴジラ', '怪獣', '八月', 'の杜', '夏の', '約束', '東京', '物語', '旅', 'はじまり',
+    'ミッション', 'インポッシブル', 'Mission', 'Impossible', 'THE', 'MOVIE', '第一章', '完結編',
+    '愛', '青春', '銀河', '鉄道', '夜', '星', 'の時', '運命', '戦士', 'ラスト', 'サマー', '100万ドル',
+]
+SEPARATORS = ['', ' ', '・', '：', ' ～', '　']
+# 実際のタイトルに近い語彙の多様さにするため、ランダムな文字で語を作って混ぜる
+CHARACTERS = (
+    'あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん'
+    'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン'
+    '山川海空風花雪月星光影夢恋心命刃剣城島国町家門道森湖雨火水木金土日春秋冬朝昼晩白黒赤青'
+)
+
+QUERIES = [
+    'コナン', '名探偵コナン', '劇場版', '鬼滅', 'スパイ', 'spy', 'ゴジラ', '八月の', '東京物語',
+    'ミッション', 'mission', '第一章', '愛', '銀河鉄道', 'サマー', 'ドラえもん のび太', '夢の', 'の',
+]
+
+
+def generate_corpus(size: int, seed: int = 1, first_id: int = 100000) -> list:
+    """合成の映画一覧を作成"""
+    rng = random.Random(seed)
+    vocabulary = WORDS + [
+        ''.join(rng.choice(CHARACTERS) for _ in range(rng.randint(2, 4)))
+        for _ in range(20000)
+    ]
+    movies = []
+    for i in range(size):
+        parts = [rng.choice(WORDS)] + rng.sample(vocabulary, rng.randint(1, 3))
+        rng.shuffle(parts)
+        title = rng.choice(SEPARATORS).join(parts)
+        movies.append({
+            'title': f"{title} {i}" if rng.random() < 0.3 else title,
+            'url': f"https://eiga.com/movie/{first_id + i}/",
+            'release_date': f"{rng.randint(1, 12)}月{rng.randint(1, 28)}日",
+        })
+    return movies
+
+
+def make_typo(title: str, rng: random.Random) -> str:
+    """タイトルの1文字を別の文字に置き換えた検索クエリを作成"""
+    position = rng.randrange(len(title))
+    return title[:position] + rng.choice(CHARACTERS) + title[position + 1:]
+
+
+def linear_search(movies: list, query: str) -> list:
+    """従来の線形走査"""
+    return [movie for movie in movies if query.lower() in movie['title'].lower()]
+
+
+def title_merge(web_results: list, stored_movies: list) -> list:
+    """従来のタイトルでの重複排除（保存済みの1件ごとに結合済みの全件と比較する）"""
+    results = list(web_results)
+    for movie in stored_movies:
+        if not any(m['title'] == movie['title'] for m in results):
+            results.append(movie)
+    return results
+
+
+def benchmark_merge() -> bool:
+    """検索結果の結合を従来の方法と比較"""
+    print("=" * 78)
+    print(f"{'検索結果の件数':<20}{'結合後':>8}{'従来(ms)':>12}{'ID(ms)':>12}")
+    print("=" * 78)
+    
+    all_merged = True
+    for size in (100, 1000, 5000):
+        # Web検索と保存済みデータで半分の作品が重複し、保存済みの方は上映館数を持つ
+        web_results = generate_corpus(size, seed=4)
+        stored_movies = web_results[size // 2:] + generate_corpus(size // 2, seed=5, first_id=900000)
+        stored_movies = [dict(movie, theater_count=100 + i) for i, movie in enumerate(stored_movies)]
+        
+        legacy_ms, _ = measure(lambda: title_merge(web_results, stored_movies), 3)
+        merge_ms, _ = measure(lambda: merge_search_results(web_results, stored_movies), 3)
+        merged = merge_search_results(web_results, stored_movies)
+        
+        expected_ids = {movie['url'] for movie in web_results + stored_movies}
+        enriched = sum(1 for movie in merged if 'theater_count' in movie)
+        ok = len(merged) == len(expected_ids) and enriched == len(stored_movies)
+        all_merged = all_merged and ok
+        print(f"{f'{size} + {size}':<20}{len(merged):>8}{legacy_ms:>12.2f}{merge_ms:>12.2f}  "
+              f"{'✓' if ok else '❌'}")
+    
+    print("=" * 78)
+    print("✓ 作品IDで重複排除し、上映館数を持つ情報を残しました" if all_merged
+          else "❌ 結合結果が想定と異なります")
+    return all_merged
+
+
+def measure(func, runs: int) -> tuple:
+    """処理時間の中央値とp95（ミリ秒）を取得"""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return statistics.median(durations), durations[int(len(durations) * 0.95) - 1]
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="タイトル検索インデックスのベンチマーク")
+    parser.add_argument('--size', type=int, default=100_000, help="合成タイトルの件数")
+    parser.add_argument('--runs', type=int, default=20, help="クエリごとの計測回数")
+    args = parser.parse_args()
+    
+    movies = generate_corpus(args.size)
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = TitleSearchIndex()
+    index.replace_all(movies)
+    build_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(f"件数: {args.size}件")
+    print(f"インデックス構築: {build_seconds:.2f}秒 / ピークメモリ {peak / 1024 / 1024:.1f}MB")
+    print(f"統計: {index.stats()}")
+    
+    start = time.perf_counter()
+    index.replace_all(movies[:-100] + generate_corpus(100, seed=2))
+    print(f"差分更新（100件入れ替え）: {(time.perf_counter() - start) * 1000:.1f}ms")
+    
+    # 差分更新を別スレッドで行いながら検索し、検索が更新の完了を待たされないかを確認
+    updater = threading.Thread(target=index.replace_all, args=(movies,))
+    durations = []
+    updater.start()
+    while updater.is_alive():
+        start = time.perf_counter()
+        index.search('コナン')
+        durations.append((time.perf_counter() - start) * 1000)
+    updater.join()
+    durations.sort()
+    print(f"差分更新中の検索: {len(durations)}回 / 中央値 {statistics.median(durations):.3f}ms / "
+          f"最大 {durations[-1]:.3f}ms")
+    print()
+    
+    print("=" * 78)
+    print(f"{'クエリ':<20}{'一致':>8}{'線形(ms)':>12}{'索引(ms)':>12}{'索引p95':>10}  再現")
+    print("=" * 78)
+    
+    normalized_titles = {movie['url']: normalize_text(movie['title']) for movie in movies}
+    all_recalled = True
+    linear_total = 0.0
+    index_total = 0.0
+    for query in QUERIES:
+        expected = linear_search(movies, query)
+        # 再現性の確認は件数の上限を外して行う
+        found = {movie['url'] for movie in index.search(query, limit=len(movies))}
+        normalized_query = normalize_text(query)
+        substring_matches = {
+            url for url, title in normalized_titles.items() if normalized_query in title
+        }
+        recalled = {movie['url'] for movie in expected} <= substring_matches <= found
+        all_recalled = all_recalled and recalled
+        
+        linear_ms, _ = measure(lambda: linear_search(movies, query), max(3, args.runs // 4))
+        index_ms, index_p95 = measure(lambda: index.search(query), args.runs)
+        linear_total += linear_ms
+        index_total += index_ms
+        
+        print(f"{query:<20}{len(expected):>8}{linear_ms:>12.2f}{index_ms:>12.3f}{index_p95:>10.3f}  "
+              f"{'✓' if recalled else '❌'}")
+    
+    print("=" * 78)
+    print(f"平均: 線形走査 {linear_total / len(QUERIES):.2f}ms / "
+          f"インデックス {index_total / len(QUERIES):.3f}ms")
+    print("✓ 線形走査の一致はすべてインデックスの結果に含まれます" if all_recalled
+          else "❌ インデックスで見つからないタイトルがあります")
+    print()
+    
+    # 誤字を含むクエリ（タイトルの1文字を置き換え）で元のタイトルが見つかるか
+    rng = random.Random(3)
+    samples = [movie for movie in rng.sample(movies, 200) if len(normalize_text(movie['title'])) >= 5]
+    typo_queries = [(make_typo(movie['title'], rng), movie['url']) for movie in samples]
+    found_count = 0
+    durations = []
+    for query, url in typo_queries:
+        start = time.perf_counter()
+        results = index.search(query)
+        durations.append((time.perf_counter() - start) * 1000)
+        found_count += any(movie['url'] == url for movie in results)
+    durations.sort()
+    print(f"誤字を含むクエリ: {len(typo_queries)}件 / 元のタイトルが上位10件に含まれた割合 "
+          f"{found_count / len(typo_queries):.1%}")
+    print(f"   検索時間: 中央値 {statistics.median(durations):.3f}ms / "
+          f"p95 {durations[int(len(durations) * 0.95) - 1]:.3f}ms")
+    print()
+    
+    # 入力途中のタイトル（先頭の1〜4文字）の補完
+    prefixes = [movie['title'][:rng.randint(1, 4)] for movie in rng.sample(movies, 200)]
+    durations = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.complete(prefix)
+        durations.append((time.perf_counter() - start) * 1_000_000)
+    durations.sort()
+    print(f"タイトルの補完: {len(prefixes)}件 / 中央値 {statistics.median(durations):.1f}μs / "
+          f"p95 {durations[int(len(durations) * 0.95) - 1]:.1f}μs")
+    print()
+    
+    merged = benchmark_merge()
+    return all_recalled and merged
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,193 @@
+"""セッション管理のベンチマーク
+
+1. セッション数を変えながら、Webhookの1メッセージ分の処理（状態の取得と設定）を繰り返し、
+   1秒あたりに処理できるメッセージ数を計測します。変更のたびに sessions.json を
+   書き込む場合（従来の動作）、メモリ上で管理してまとめて書き込む場合（json）、
+   SQLiteに1行ずつ保存する場合（sqlite）を比較します。
+2. gunicornのワーカーを想定して1/4/8プロセスで同時にメッセージを処理し、
+   全体のスループットと、すべてのプロセスの変更が保存に残っているか（整合性）を確認します。
+
+使い方:
+    python tools/benchmark_sessions.py
+    python tools/benchmark_sessions.py --sessions 100 1000 10000 --messages 2000 --workers 1 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from session_manager import SessionManager
+
+STATES = ['movie_search', 'theater_search', 'idle']
+
+
+def user_id(worker: int, index: int) -> str:
+    """ベンチマーク用のユーザーID"""
+    return f"U{worker:02d}{index:030d}"
+
+
+def populate(data_dir: str, backend: str, session_count: int, workers: int = 1) -> None:
+    """セッションを作成して保存"""
+    manager = SessionManager(data_dir, flush_interval=3600, backend=backend)
+    for worker in range(workers):
+        for i in range(session_count):
+            manager.set_user_state(user_id(worker, i), random.choice(STATES))
+    manager.close()
+
+
+def run_messages(manager: SessionManager, session_count: int, messages: int, worker: int = 0) -> float:
+    """
+    メッセージを処理し、1秒あたりのメッセージ数を返す
+    
+    Args:
+        manager: セッションマネージャー
+        session_count: セッション数
+        messages: 処理するメッセージ数
+        worker: ワーカー番号（ワーカーごとに別のユーザーを使う）
+    
+    Returns:
+        float: 1秒あたりのメッセージ数
+    """
+    rng = random.Random(worker)
+    start = time.perf_counter()
+    for _ in range(messages):
+        target = user_id(worker, rng.randrange(session_count))
+        # 状態を確認し、メニューの操作に応じて状態を変更する
+        manager.get_user_state(target)
+        manager.set_user_state(target, rng.choice(STATES), expires_minutes=10)
+    return messages / (time.perf_counter() - start)
+
+
+def measure(session_count: int, messages: int, backend: str, flush_interval: float) -> float:
+    """
+    1つの設定で計測
+    
+    Args:
+        session_count: セッション数
+        messages: 処理するメッセージ数
+        backend: セッションの保存先
+        flush_interval: 書き込み間隔（0以下の場合は変更のたびに書き込む）
+    
+    Returns:
+        float: 1秒あたりのメッセージ数
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        populate(tmp_dir, backend, session_count)
+        manager = SessionManager(tmp_dir, flush_interval=flush_interval, backend=backend)
+        throughput = run_messages(manager, session_count, messages)
+        manager.close()
+        return throughput
+
+
+def worker_main(args: Tuple) -> Tuple[float, float]:
+    """
+    1つのワーカープロセスでメッセージを処理
+    
+    Returns:
+        Tuple[float, float]: (開始時刻, 終了時刻)
+    """
+    data_dir, backend, flush_interval, session_count, messages, worker, barrier = args
+    manager = SessionManager(data_dir, flush_interval=flush_interval, backend=backend)
+    barrier.wait()
+    start = time.time()
+    run_messages(manager, session_count, messages, worker)
+    # 整合性の確認用に、このワーカーのユーザー全員に目印の状態を設定する
+    for i in range(session_count):
+        manager.set_user_state(user_id(worker, i), f"done_{worker}")
+    manager.close()
+    return start, time.time()
+
+
+def measure_workers(
+    workers: int,
+    backend: str,
+    session_count: int,
+    messages: int,
+    flush_interval: float
+) -> Tuple[float, bool]:
+    """
+    複数のプロセスで同時に計測
+    
+    Returns:
+        Tuple[float, bool]: (全体の1秒あたりのメッセージ数, すべてのプロセスの変更が残っているか)
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        populate(tmp_dir, backend, session_count, workers)
+        
+        with multiprocessing.Manager() as sync_manager:
+            barrier = sync_manager.Barrier(workers)
+            with multiprocessing.Pool(workers) as pool:
+                results = pool.map(worker_main, [
+                    (tmp_dir, backend, flush_interval, session_count, messages, worker, barrier)
+                    for worker in range(workers)
+                ])
+        
+        elapsed = max(end for _, end in results) - min(start for start, _ in results)
+        
+        checker = SessionManager(tmp_dir, flush_interval=0, backend=backend)
+        consistent = all(
+            checker.get_user_state(user_id(worker, i)) == f"done_{worker}"
+            for worker in range(workers)
+            for i in range(session_count)
+        )
+        return workers * messages / elapsed, consistent
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="セッション管理のベンチマーク")
+    parser.add_argument(
+        '--sessions', type=int, nargs='+', default=[100, 1000, 10000, 50000], help="セッション数"
+    )
+    parser.add_argument('--messages', type=int, default=2000, help="処理するメッセージ数")
+    parser.add_argument(
+        '--sync-messages', type=int, default=200, help="処理するメッセージ数（変更のたびに書き込む場合）"
+    )
+    parser.add_argument('--flush-interval', type=float, default=1.0, help="まとめて書き込む間隔（秒）")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8], help="プロセス数")
+    parser.add_argument('--worker-sessions', type=int, default=1000, help="プロセスごとのセッション数")
+    args = parser.parse_args()
+    
+    print("1秒あたりのメッセージ数（1プロセス）")
+    print("=" * 72)
+    print(f"{'セッション数':<12}{'毎回書き込み':>14}{'json':>14}{'sqlite':>14}")
+    print("=" * 72)
+    
+    for session_count in args.sessions:
+        sync = measure(session_count, args.sync_messages, 'json', flush_interval=0)
+        batched = measure(session_count, args.messages, 'json', args.flush_interval)
+        sqlite = measure(session_count, args.messages, 'sqlite', args.flush_interval)
+        print(f"{session_count:<18,}{sync:>14,.0f}{batched:>14,.0f}{sqlite:>14,.0f}")
+    print()
+    
+    print(f"複数プロセスでの1秒あたりのメッセージ数（プロセスごとに{args.worker_sessions:,}セッション）")
+    print("=" * 72)
+    print(f"{'プロセス数':<10}{'json':>14}{'整合性':>8}{'sqlite':>16}{'整合性':>8}")
+    print("=" * 72)
+    
+    all_consistent = True
+    for workers in args.workers:
+        row = f"{workers:<15}"
+        for backend in SessionManager.BACKENDS:
+            throughput, consistent = measure_workers(
+                workers, backend, args.worker_sessions, args.messages, args.flush_interval
+            )
+            row += f"{throughput:>14,.0f}{'✓' if consistent else '❌':>8}"
+            if backend == 'sqlite':
+                all_consistent = all_consistent and consistent
+        print(row)
+    print("=" * 72)
+    
+    return all_consistent
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,137 @@
+"""上映館数抽出の精度と速度の比較
+
+tools/fixtures/eiga/detail/ 以下に保存した詳細ページに対して、
+従来のページ全体を対象にした抽出と、公開情報ブロックに絞った抽出を実行し、
+expected.json の正解値との一致率と1ページあたりの処理時間を比較します。
+
+使い方:
+    python tools/benchmark_theater_count.py
+    python tools/benchmark_theater_count.py --save <movie_url> <expected_count>
+"""
+
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+os.environ['SCRAPER_HTTP_CACHE'] = '0'
+
+from bs4 import BeautifulSoup
+
+from scraper import MovieScraper
+
+FIXTURES_DIR = Path(os.path.dirname(__file__)) / 'fixtures' / 'eiga' / 'detail'
+EXPECTED_FILE = FIXTURES_DIR / 'expected.json'
+RUNS = 20
+
+
+def legacy_extract_theater_count(html):
+    """従来の抽出処理（ページ全体の get_text に正規表現を適用）"""
+    soup = BeautifulSoup(html, 'lxml')
+    
+    text = soup.get_text()
+    match = re.search(r'全国[約]?(\d+)館', text)
+    if match:
+        return int(match.group(1))
+    
+    match = re.search(r'(\d+)館', text)
+    if match:
+        return int(match.group(1))
+    
+    theater_list = soup.find('div', class_='theater-list')
+    if theater_list:
+        theaters = theater_list.find_all('li')
+        if theaters:
+            return len(theaters)
+    
+    return None
+
+
+def load_expected():
+    """正解値を読み込み"""
+    if not EXPECTED_FILE.exists():
+        return {}
+    with open(EXPECTED_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_fixture(movie_url, expected_count):
+    """詳細ページを保存して正解値を登録"""
+    scraper = MovieScraper()
+    response = scraper.session.get(movie_url, timeout=30)
+    response.raise_for_status()
+    response.encoding = response.apparent_encoding
+    
+    movie_id = movie_url.rstrip('/').split('/')[-1]
+    filename = f"live_{movie_id}.html"
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    (FIXTURES_DIR / filename).write_text(response.text, encoding='utf-8')
+    
+    expected = load_expected()
+    expected[filename] = None if expected_count == 'none' else int(expected_count)
+    with open(EXPECTED_FILE, 'w', encoding='utf-8') as f:
+        json.dump(expected, f, ensure_ascii=False, indent=2)
+    print(f"✓ 保存しました: {filename}（正解値: {expected[filename]}）")
+
+
+def measure(extract_func, html):
+    """抽出結果と処理時間の中央値（ミリ秒）を取得"""
+    durations = []
+    result = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = extract_func(html)
+        durations.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(durations)
+
+
+def main():
+    """メイン処理"""
+    if len(sys.argv) > 3 and sys.argv[1] == '--save':
+        save_fixture(sys.argv[2], sys.argv[3])
+    
+    expected = load_expected()
+    if not expected:
+        print(f"正解値が見つかりません: {EXPECTED_FILE}")
+        return False
+    
+    scraper = MovieScraper()
+    extractors = {
+        'legacy': legacy_extract_theater_count,
+        'targeted': scraper._extract_theater_count,
+    }
+    correct = {name: 0 for name in extractors}
+    total_ms = {name: 0.0 for name in extractors}
+    
+    print("=" * 78)
+    print(f"{'フィクスチャ':<30}{'正解':>6}{'legacy':>10}{'(ms)':>8}{'targeted':>10}{'(ms)':>8}")
+    print("=" * 78)
+    
+    for filename, expected_count in expected.items():
+        html = (FIXTURES_DIR / filename).read_text(encoding='utf-8')
+        row = f"{filename:<30}{str(expected_count):>6}"
+        for name, extract_func in extractors.items():
+            result, median_ms = measure(extract_func, html)
+            total_ms[name] += median_ms
+            if result == expected_count:
+                correct[name] += 1
+            mark = '' if result == expected_count else '❌'
+            row += f"{mark + str(result):>10}{median_ms:>8.2f}"
+        print(row)
+    
+    print("=" * 78)
+    for name in extractors:
+        print(f"{name:<10} 正解率: {correct[name]}/{len(expected)}  "
+              f"平均処理時間: {total_ms[name] / len(expected):.2f}ms/ページ")
+    
+    return correct['targeted'] >= correct['legacy']
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
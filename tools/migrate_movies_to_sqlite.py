@@ -0,0 +1,79 @@
+"""data/movies.json をSQLiteバックエンド（data/movies.db）に移行するツール
+
+JSONファイルの映画情報をSQLiteに取り込み、件数とタイトルが一致するかを確認します。
+SQLiteは作品IDごとに1行で保存するため、JSONに同じ作品が複数ある場合は最初の1件と比較します。
+移行後は環境変数 MOVIE_STORAGE_BACKEND=sqlite でSQLiteバックエンドを使用します。
+
+使い方:
+    python tools/migrate_movies_to_sqlite.py
+    python tools/migrate_movies_to_sqlite.py --data-dir path/to/data
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# srcディレクトリをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from movie_database import extract_movie_id
+from storage import MovieStorage
+
+
+def unique_movies(movies):
+    """作品IDが重複する映画を除く（SQLiteへの保存と同じく最初の1件を残す）"""
+    seen = set()
+    result = []
+    for movie in movies:
+        movie_id = extract_movie_id(movie)
+        if movie_id not in seen:
+            seen.add(movie_id)
+            result.append(movie)
+    return result
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="movies.json をSQLiteに移行")
+    parser.add_argument(
+        '--data-dir', default=None, help="データディレクトリ（デフォルト: リポジトリ直下の data、環境変数 DATA_DIR で上書き可能）"
+    )
+    args = parser.parse_args()
+    
+    json_storage = MovieStorage(args.data_dir, backend='json')
+    if not json_storage.data_file.exists():
+        print(f"❌ 移行元のファイルが見つかりません: {json_storage.data_file}")
+        return False
+    
+    # 初回の自動取り込みは行わず、ここで1回だけ取り込む
+    sqlite_storage = MovieStorage(args.data_dir, backend='sqlite', auto_import=False)
+    
+    start = time.perf_counter()
+    sqlite_storage.import_json()
+    print(f"   所要時間: {(time.perf_counter() - start) * 1000:.1f}ms")
+    print()
+    
+    # 移行結果の確認
+    json_data = json_storage.load_movies() or {'movies': []}
+    sqlite_data = sqlite_storage.load_movies() or {'movies': []}
+    
+    json_titles = [movie['title'] for movie in unique_movies(json_data['movies'])]
+    sqlite_titles = [movie['title'] for movie in sqlite_data['movies']]
+    
+    if json_titles != sqlite_titles:
+        print("❌ 移行元と移行先の内容が一致しません")
+        print(f"   JSON: {len(json_titles)}件 / SQLite: {len(sqlite_titles)}件")
+        return False
+    
+    duplicates = len(json_data['movies']) - len(json_titles)
+    if duplicates:
+        print(f"ℹ️  JSONで作品IDが重複していた{duplicates}件を除いて比較しました")
+    
+    print(f"✓ 移行が完了しました: {len(sqlite_titles)}件 -> {sqlite_storage.db.db_file}")
+    print("   MOVIE_STORAGE_BACKEND=sqlite を設定するとSQLiteバックエンドを使用します")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)